@@ -0,0 +1,272 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from flask import Blueprint, Response, current_app, g, request
+from models import db, Venue, Artist, Show
+from pagination import parse_limit, decode_cursor
+from facets import parse_genres, genre_facets
+from queries import (
+  VENUE_FIELDS,
+  ARTIST_FIELDS,
+  SHOW_FIELDS,
+  VENUE_DETAIL_FIELDS,
+  ARTIST_DETAIL_FIELDS,
+  VENUE_PAGE_KEYS,
+  ARTIST_PAGE_KEYS,
+  SHOW_PAGE_KEYS,
+  venue_page,
+  artist_page,
+  show_page,
+  venue_detail,
+  artist_detail,
+  show_detail,
+  nearby_venues
+)
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+#----------------------------------------------------------------------------#
+# Responses.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+@api.before_request
+def read_from_replica():
+  # every API resource is read-only (see replicas.py)
+  g.replica_reads = True
+
+def dumps(data):
+  # orjson when installed, otherwise the compact stdlib encoder
+  if orjson is not None:
+    return orjson.dumps(data)
+  return json.dumps(data, separators=(',', ':'), default=lambda value: value.isoformat()).encode()
+
+def json_response(data, status=200):
+  return Response(dumps(data), status=status, mimetype='application/json')
+
+def error_response(message, status):
+  return json_response({'error': message}, status)
+
+#----------------------------------------------------------------------------#
+# Arguments.
+#----------------------------------------------------------------------------#
+
+# Arguments are checked before a resource's version is compared, so a bad
+# request is answered with 400 rather than 304. Errors raised while building
+# a response are bugs and are left to the 500 handler.
+
+class RequestError(Exception):
+  # a missing or malformed request argument
+  pass
+
+@api.errorhandler(RequestError)
+def request_error(e):
+  return error_response(str(e), 400)
+
+def requested_fields(available, default=None):
+  # ?fields=id,name narrows the response to those of the available fields
+  fields = request.args.get('fields')
+  if not fields:
+    return tuple(available if default is None else default)
+  fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+  unknown = [name for name in fields if name not in available]
+  if unknown:
+    raise RequestError(f'Unknown fields: {", ".join(unknown)}')
+  return fields
+
+def requested_cursor(keys):
+  # ?cursor= as handed out with the previous page of a listing keyed by keys
+  cursor = request.args.get('cursor')
+  if cursor and decode_cursor(cursor, keys) is None:
+    raise RequestError('Malformed cursor')
+  return cursor
+
+def requested_genres():
+  # ?genre= (repeatable) and ?match=any|all
+  try:
+    return parse_genres(request.args.getlist('genre'), request.args.get('match'))
+  except ValueError as e:
+    raise RequestError(str(e))
+
+def coordinate(name, bound):
+  # ?lat= and ?lon= must be numbers within [-bound, bound]
+  try:
+    value = float(request.args[name])
+  except (KeyError, ValueError):
+    raise RequestError(f'{name} must be a number')
+  if not -bound <= value <= bound:
+    raise RequestError(f'{name} must be between {-bound} and {bound}')
+  return value
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+# Each resource's version is read with one aggregate query (row counts and
+# the latest updated_at of everything it displays) before any data is built,
+# so unchanged resources are answered with 304 without being serialized.
+
+def validators(version):
+  # returns (etag, last_modified) for a version tuple whose last items are
+  # updated_at values; the request path covers fields and paging arguments
+  etag = hashlib.sha1(repr((request.full_path, version)).encode()).hexdigest()
+  stamps = [value for value in version if isinstance(value, datetime)]
+  last_modified = max(stamps).replace(microsecond=0) if stamps else None
+  return etag, last_modified
+
+def not_modified(etag, last_modified):
+  if request.if_none_match:
+    return etag in request.if_none_match
+  since = request.if_modified_since
+  if since is None or last_modified is None:
+    return False
+  if since.tzinfo is not None:
+    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+  return last_modified <= since
+
+def conditional(version, build):
+  # answer 304 if the client's copy matches version, else serialize build()
+  etag, last_modified = validators(version)
+  if not_modified(etag, last_modified):
+    response = Response(status=304)
+  else:
+    response = json_response(build())
+  response.set_etag(etag)
+  if last_modified is not None:
+    response.last_modified = last_modified
+  return response
+
+def collection_version(*models):
+  # row count of the first model and the latest write across all of them
+  query = db.session.query(db.func.count(models[0].id), *(db.func.max(model.updated_at) for model in models))
+  if Show in models and len(models) > 1:
+    query = query.join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id)
+  # deleted venues and artists are hidden, with their shows
+  query = query.filter(*(model.deleted_at.is_(None) for model in models if model is not Show))
+  return tuple(query.one())
+
+def entity_version(model, entity_id):
+  # the entity, its shows and the artists/venues they list; upcoming shows
+  # are counted too since the past/upcoming split moves with time. shows are
+  # counted through the related row, so those of a deleted artist/venue drop
+  # out of the counts as they drop out of the payload
+  related, show_fk, other_fk = (Artist, Show.venue_id, Show.artist_id) if model is Venue \
+    else (Venue, Show.artist_id, Show.venue_id)
+  return db.session.query(
+      model.updated_at,
+      db.func.count(related.id),
+      db.func.count(related.id).filter(Show.start_time >= datetime.now()),
+      db.func.max(Show.updated_at),
+      db.func.max(related.updated_at)
+    ).outerjoin(Show, show_fk == model.id) \
+    .outerjoin(related, db.and_(related.id == other_fk, related.deleted_at.is_(None))) \
+    .filter(model.id == entity_id, model.deleted_at.is_(None)) \
+    .group_by(model.id) \
+    .first()
+
+#----------------------------------------------------------------------------#
+# Resources.
+#----------------------------------------------------------------------------#
+
+def page_response(builder, available, keys, version):
+  fields = requested_fields(available)
+  cursor = requested_cursor(keys)
+  limit = parse_limit(request.args.get('limit'))
+
+  def build():
+    data, next_cursor, prev_cursor = builder(cursor, limit, fields)
+    return {
+      'data': data,
+      'next_cursor': next_cursor,
+      'prev_cursor': prev_cursor
+    }
+
+  return conditional(version, build)
+
+def detail_response(model, entity_id, builder, available):
+  fields = requested_fields(available)
+  version = entity_version(model, entity_id)
+  if version is None:
+    return error_response(f'{model.__tablename__} not found', 404)
+  return conditional(tuple(version), lambda: builder(entity_id, fields))
+
+def filtered_page_response(model, builder, available, keys):
+  # a listing narrowed to ?genre=
+  genres, match = requested_genres()
+  return page_response(
+    lambda cursor, limit, fields: builder(cursor, limit, fields, genres, match),
+    available,
+    keys,
+    collection_version(model)
+  )
+
+def facets_response(model):
+  # genre counts of the entities matching ?genre=, most common first
+  genres, match = requested_genres()
+  return conditional(collection_version(model), lambda: {'data': genre_facets(model, genres, match)})
+
+@api.route('/venues')
+def venues():
+  return filtered_page_response(Venue, venue_page, VENUE_FIELDS, VENUE_PAGE_KEYS)
+
+@api.route('/venues/genres')
+def venue_genres():
+  return facets_response(Venue)
+
+@api.route('/venues/nearby')
+def venues_nearby():
+  # ?lat=&lon= with an optional ?radius= in km, nearest first
+  max_radius = current_app.config.get('NEARBY_MAX_RADIUS_KM', 200)
+  latitude = coordinate('lat', 90)
+  longitude = coordinate('lon', 180)
+  try:
+    radius = float(request.args.get('radius', current_app.config.get('NEARBY_RADIUS_KM', 25)))
+  except ValueError:
+    raise RequestError('radius must be a number')
+  if not 0 < radius <= max_radius:
+    raise RequestError(f'radius must be above 0 and at most {max_radius}')
+  fields = requested_fields(VENUE_FIELDS, ('id', 'name', 'city', 'state', 'num_upcoming_shows'))
+  limit = parse_limit(request.args.get('limit'))
+  return conditional(collection_version(Venue), lambda: {
+    'data': nearby_venues(latitude, longitude, radius, limit, fields)
+  })
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+  return detail_response(Venue, venue_id, venue_detail, VENUE_DETAIL_FIELDS)
+
+@api.route('/artists')
+def artists():
+  return filtered_page_response(Artist, artist_page, ARTIST_FIELDS, ARTIST_PAGE_KEYS)
+
+@api.route('/artists/genres')
+def artist_genres():
+  return facets_response(Artist)
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+  return detail_response(Artist, artist_id, artist_detail, ARTIST_DETAIL_FIELDS)
+
+@api.route('/shows')
+def shows():
+  return page_response(show_page, SHOW_FIELDS, SHOW_PAGE_KEYS, collection_version(Show, Venue, Artist))
+
+@api.route('/shows/<int:show_id>')
+def show(show_id):
+  fields = requested_fields(SHOW_FIELDS)
+  version = db.session.query(Show.updated_at, Venue.updated_at, Artist.updated_at) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .filter(Show.id == show_id, Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)) \
+    .first()
+  if version is None:
+    return error_response('Show not found', 404)
+  return conditional(tuple(version), lambda: show_detail(show_id, fields))
@@ -2,50 +2,92 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import io
 import json
-import dateutil.parser
-import babel
+import uuid
+from datetime import date, datetime, time, timedelta
+import babel.dates
+from functools import lru_cache
 from flask import (
   Flask, 
+  Blueprint,
+  current_app,
   render_template, 
   request, 
   Response, 
   flash, 
   redirect, 
   url_for, 
-  jsonify
+  jsonify,
+  stream_with_context
 )
+import click
 import logging
 from logging import Formatter, FileHandler
+from flask.cli import with_appcontext
+from flask_migrate import stamp
 from flask_wtf import FlaskForm
 from forms import *
 from models import *
+from pagination import parse_limit
+from facets import parse_genres, genre_facets
+from queries import venue_areas, venue_detail, artist_detail, artist_page, show_page, show_calendar, search_results
+from cache import ResponseCache
+from counters import counters_cli
+from importer import ENTITIES, guess_format, import_command, import_rows, read_rows, check_show_references
+from schedule import check_show_conflicts
+import exporter
+import pool
+import replicas
+import profiling
+import fragments
+import geo
+from replicas import replica_reads
+from writebehind import ShowWriter, QueueFull, KeyReused
+from reaper import Reaper, request_deletion, deletion_status, reaper_cli
+from api import api
 
 #----------------------------------------------------------------------------#
 # Initialize.
 #----------------------------------------------------------------------------#
 
-db.create_all()
+# Extensions are bound to an app by create_app() below; importing this module
+# neither connects to the database nor reads the config.
+main = Blueprint('main', __name__)
+cache = ResponseCache()
+show_writer = ShowWriter()
+reaper = Reaper()
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+# babel re-parses the format string and locale on every call, so both are
+# resolved once, on first use, and reused for every show tile
+@lru_cache(maxsize=None)
+def datetime_locale():
+  return babel.Locale.parse(babel.dates.LC_TIME)
+
+@lru_cache(maxsize=None)
+def datetime_pattern(format):
+  return babel.dates.parse_pattern(format)
+
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
+  # views pass native datetimes; strings are still accepted
+  if isinstance(value, str):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
   if format == 'full':
       format="EEEE MMMM, d, y 'at' h:mma"
   elif format == 'medium':
       format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
-
-app.jinja_env.filters['datetime'] = format_datetime
+  return datetime_pattern(format).apply(value, datetime_locale())
 
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
-@app.route('/')
+@main.route('/')
 def index():
   return render_template('pages/home.html')
 
@@ -53,107 +95,57 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+def requested_genres():
+  # ?genre= (repeatable) and ?match=any|all, from the query string or a
+  # search form
+  try:
+    return parse_genres(request.values.getlist('genre'), request.values.get('match'))
+  except ValueError as e:
+    flash(str(e))
+    return [], 'any'
+
+@main.route('/venues')
+@replica_reads
+@cache.cached('venues')
 def venues():
-  data = []
-  # first retrieve locations that host venues, cities ordered by state
-  locations_with_venues = Venue.query.order_by(Venue.state, Venue.city).distinct(Venue.state, Venue.city)
-  # For each location, create a json object containing data
-  for location in locations_with_venues:
-    # find venues that are in the current location
-    venues_in_location = Venue.query.order_by(Venue.name).filter_by(state=location.state, city=location.city).all()
-    venue_jsons = []
-    # create json object for each venue
-    for venue in venues_in_location:
-      venue_jsons.append({
-        'id': venue.id,
-        'name': venue.name,
-        'num_upcoming_shows': len(Show.query.filter(Show.venue_id==venue.id).filter(Show.start_time>datetime.now()).all())
-      })
-    # location json object
-    data.append({
-      'city': location.city,
-      'state': location.state,
-      'venues': venue_jsons
-    })
-  return render_template('pages/venues.html', areas=data)
-
-@app.route('/venues/search', methods=['POST'])
+  genres, match = requested_genres()
+  data = venue_areas(genres, match)
+  facets = genre_facets(Venue, genres, match)
+  return render_template('pages/venues.html', areas=data, facets=facets, genres=genres, match=match)
+
+@main.route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
   # retrieve search term and query for matching venues
   search_term = request.form.get('search_term', '')
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  # build json objects containing relevant data for each result
-  data = []
-  for venue in venues:
-    data.append({
-      'id': venue.id,
-      'name': venue.name,
-      'num_upcoming_shows': len(Show.query.filter(Show.venue_id==venue.id).filter(Show.start_time>datetime.now()).all())
-    })
-
-  # create response object
-  response={
-    'count': len(venues),
-    'data': data
-  }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/venues/<int:venue_id>')
+  genres, match = requested_genres()
+  # retrieve matching venues along with their upcoming show counts
+  response = search_results(Venue, search_term, genres, match)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, genres=genres, match=match)
+
+@main.route('/venues/<int:venue_id>')
+@replica_reads
+@cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  venue = Venue.query.get(venue_id)
+  data = venue_detail(venue_id)
   # check if venue id exists. If true, continue. If not, render error page
-  if venue:
-    all_shows = Show.query.join(Artist, Artist.id == Show.artist_id).filter(Show.venue_id==venue_id).all()
-    past_shows = []
-    upcoming_shows = []
-
-    for show in all_shows:
-      artist_info = {
-        'artist_id': show.artist_id,
-        'artist_name': show.artist.name,
-        'artist_image_link': show.artist.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-      }
-
-      if (show.start_time >= datetime.now()):
-        upcoming_shows.append(artist_info)
-      else:
-        past_shows.append(artist_info)
-
-    data = {
-      'id': venue.id,
-      'name': venue.name,
-      'genres': venue.genres,
-      'address': venue.address,
-      'city': venue.city,
-      'state': venue.state,
-      'phone': venue.phone,
-      'website': venue.website,
-      'facebook_link': venue.facebook_link,
-      'seeking_talent': venue.seeking_talent,
-      'seeking_description': venue.seeking_description,
-      'image_link': venue.image_link,
-      'past_shows': past_shows,
-      'upcoming_shows': upcoming_shows,
-      'past_shows_count': len(past_shows),
-      'upcoming_shows_count': len(upcoming_shows),
-    }
-    
+  if data:
+    # this page also goes stale when any listed artist changes
+    cache.tag(*(f'artist:{show["artist_id"]}' for show in data['past_shows'] + data['upcoming_shows']))
     return render_template('pages/show_venue.html', venue=data)
-  # if no such artist exists, show error page
+  # if no such venue exists, show error page
   return render_template('errors/404.html')
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   error = False
   form = VenueForm(request.form)
@@ -174,13 +166,15 @@ def create_venue_submission():
         image_link = form.image_link.data
       )
       db.session.add(new_venue)
+      db.session.flush()
+      venue_id = new_venue.id
       db.session.commit()
     except:
       error = True
       db.session.rollback()
     finally:
-      db.session.close()
       if not error:
+        cache.invalidate('venues', f'venue:{venue_id}')
         # on successful db insert, flash success
         flash('Venue ' + form.name.data + ' was successfully listed!')
         return render_template('pages/home.html')
@@ -193,112 +187,83 @@ def create_venue_submission():
             flash(error + '  Please fix entry and resubmit.')
   return render_template('forms/new_venue.html', form=form)
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
   error = False
   # response body containing the url for the home page
-  # note: using redirect(url_for('index')) causes a 405 error
-  body = { 'redirect': url_for('index') }
+  # note: using redirect(url_for('main.index')) causes a 405 error
+  body = { 'redirect': url_for('main.index') }
   try:
-    db.session.query(Venue).filter(Venue.id == venue_id).delete()
+    # hidden now, removed with its shows by the reaper (see reaper.py)
+    deletion = request_deletion('venue', venue_id)
+    if deletion is None:
+      error = True
     db.session.commit()
   except:
     error = True
     db.session.rollback()
   finally:
-    db.session.close()
     if not error:
+      cache.invalidate('shows', 'venues', f'venue:{venue_id}')
+      reaper.wake()
+      body['deletion'] = url_for('main.venue_deletion', venue_id=deletion.entity_id)
       flash('Venue was successfully deleted!')
     else:
       flash('An error occurred. Venue could not be deleted.')
   return jsonify(body)
 
+@main.route('/venues/<int:venue_id>/deletion')
+def venue_deletion(venue_id):
+  # progress of the reaper on a deleted venue
+  deletion = Deletion.query.filter_by(entity='venue', entity_id=venue_id).first()
+  if deletion is None:
+    return jsonify({'error': 'Unknown deletion.'}), 404
+  return jsonify(deletion_status(deletion))
+
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@replica_reads
+@cache.cached('artists')
 def artists():
-  data = []
-  artists = Artist.query.order_by(Artist.name).all()
-  for artist in artists:
-    data.append({
-      'id': artist.id,
-      'name': artist.name
-    })
-
-  return render_template('pages/artists.html', artists=data)
-
-@app.route('/artists/search', methods=['POST'])
+  # retrieve one page of artists, seeking past the cursor's name/id
+  limit = parse_limit(request.args.get('limit'))
+  genres, match = requested_genres()
+  data, next_cursor, prev_cursor = artist_page(request.args.get('cursor'), limit, genres=genres, match=match)
+  facets = genre_facets(Artist, genres, match)
+  return render_template('pages/artists.html', artists=data, next_cursor=next_cursor, prev_cursor=prev_cursor, limit=limit,
+    facets=facets, genres=genres, match=match)
+
+@main.route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
   # retrieve search term and query for matching venues
   search_term = request.form.get('search_term', '')
-  artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-  # build json objects containing relevant data for each result
-  data = []
-  for artist in artists:
-    data.append({
-      'id': artist.id,
-      'name': artist.name,
-      'num_upcoming_shows': len(Show.query.filter(Show.artist_id==artist.id).filter(Show.start_time>datetime.now()).all())
-    })
-
-  # create response object
-  response={
-    'count': len(artists),
-    'data': data
-  }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/artists/<int:artist_id>')
+  genres, match = requested_genres()
+  # retrieve matching artists along with their upcoming show counts
+  response = search_results(Artist, search_term, genres, match)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term, genres=genres, match=match)
+
+@main.route('/artists/<int:artist_id>')
+@replica_reads
+@cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  artist = Artist.query.get(artist_id)
-  # check if venue id exists. If true, continue. If not, render error page
-  if artist:
-    all_shows = Show.query.join(Venue, Venue.id == Show.venue_id).filter(Show.artist_id==artist_id).all()
-    past_shows = []
-    upcoming_shows = []
-
-    for show in all_shows:
-      venue_info = {
-        'venue_id': show.venue_id,
-        'venue_name': show.venue.name,
-        'venue_image_link': show.venue.image_link,
-        'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-      }
-
-      if (show.start_time >= datetime.now()):
-        upcoming_shows.append(venue_info)
-      else:
-        past_shows.append(venue_info)
-
-    data = {
-      'id': artist.id,
-      'name': artist.name,
-      'genres': artist.genres,
-      'city': artist.city,
-      'state': artist.state,
-      'phone': artist.phone,
-      'website': artist.website,
-      'facebook_link': artist.facebook_link,
-      'seeking_venue': artist.seeking_venue,
-      'seeking_description': artist.seeking_description,
-      'image_link': artist.image_link,
-      'past_shows': past_shows,
-      'upcoming_shows': upcoming_shows,
-      'past_shows_count': len(past_shows),
-      'upcoming_shows_count': len(upcoming_shows),
-    }
-    
+  # shows the artist page with the given artist_id
+  data = artist_detail(artist_id)
+  # check if artist id exists. If true, continue. If not, render error page
+  if data:
+    # this page also goes stale when any listed venue changes
+    cache.tag(*(f'venue:{show["venue_id"]}' for show in data['past_shows'] + data['upcoming_shows']))
     return render_template('pages/show_artist.html', artist=data)
   # if no such artist exists, show error page
   return render_template('errors/404.html')
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.filter_by(id=artist_id, deleted_at=None).first()
   if artist:
     form.name.data = artist.name
     form.genres.data = artist.genres
@@ -314,11 +279,11 @@ def edit_artist(artist_id):
   # if no such artist exists, show error page
   return render_template('errors/404.html')
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
   error = False
   form = ArtistForm(request.form)
-  artist = Artist.query.get(artist_id)
+  artist = Artist.query.filter_by(id=artist_id, deleted_at=None).first()
   if artist:
     if form.validate():
       try:
@@ -338,9 +303,9 @@ def edit_artist_submission(artist_id):
         error = True
         db.session.rollback()
       finally:
-        db.session.close()
         if not error:
-          return redirect(url_for('show_artist', artist_id=artist_id))
+          cache.invalidate('shows', 'artists', f'artist:{artist_id}')
+          return redirect(url_for('main.show_artist', artist_id=artist_id))
         else:
           return render_template('errors/500.html')
     else:
@@ -352,10 +317,10 @@ def edit_artist_submission(artist_id):
     flash('Artist ID not valid.')
     return render_template('errors/404.html')
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.filter_by(id=venue_id, deleted_at=None).first()
   if venue:
     form.name.data = venue.name
     form.genres.data = venue.genres
@@ -372,11 +337,11 @@ def edit_venue(venue_id):
   # if no such venue exists, show error page
   return render_template('errors/404.html')
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
   error = False
   form = VenueForm(request.form)
-  venue = Venue.query.get(venue_id)
+  venue = Venue.query.filter_by(id=venue_id, deleted_at=None).first()
   if venue:
     if form.validate():
       try:
@@ -397,9 +362,9 @@ def edit_venue_submission(venue_id):
         error = True
         db.session.rollback()
       finally:
-        db.session.close()
         if not error:
-          return redirect(url_for('show_venue', venue_id=venue_id))
+          cache.invalidate('shows', 'venues', f'venue:{venue_id}')
+          return redirect(url_for('main.show_venue', venue_id=venue_id))
         else:
           return render_template('errors/500.html')
     else:
@@ -414,12 +379,12 @@ def edit_venue_submission(venue_id):
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
   error = False
   form = ArtistForm(request.form)
@@ -439,13 +404,15 @@ def create_artist_submission():
         image_link = form.image_link.data
       )
       db.session.add(new_artist)
+      db.session.flush()
+      artist_id = new_artist.id
       db.session.commit()
     except:
       error = True
       db.session.rollback()
     finally:
-      db.session.close()
       if not error:
+        cache.invalidate('artists', f'artist:{artist_id}')
         # on successful db insert, flash success
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
         return render_template('pages/home.html')
@@ -458,66 +425,105 @@ def create_artist_submission():
             flash(error + '  Please fix entry and resubmit.')
   return render_template('forms/new_artist.html', form=form)
 
-@app.route('/artists/<artist_id>', methods=['DELETE'])
+@main.route('/artists/<artist_id>', methods=['DELETE'])
 def delete_artist(artist_id):
   error = False
   # response body containing the url for the home page
-  # note: using redirect(url_for('index')) causes a 405 error
-  body = { 'redirect': url_for('index') }
+  # note: using redirect(url_for('main.index')) causes a 405 error
+  body = { 'redirect': url_for('main.index') }
   try:
-    db.session.query(Artist).filter(Artist.id == artist_id).delete()
+    # hidden now, removed with its shows by the reaper (see reaper.py)
+    deletion = request_deletion('artist', artist_id)
+    if deletion is None:
+      error = True
     db.session.commit()
   except:
     error = True
     db.session.rollback()
   finally:
-    db.session.close()
     if not error:
+      cache.invalidate('shows', 'artists', 'venues', f'artist:{artist_id}')
+      reaper.wake()
+      body['deletion'] = url_for('main.artist_deletion', artist_id=deletion.entity_id)
       flash('Artist was successfully deleted!')
     else:
       flash('An error occurred. Artist could not be deleted.')
   return jsonify(body)
 
+@main.route('/artists/<int:artist_id>/deletion')
+def artist_deletion(artist_id):
+  # progress of the reaper on a deleted artist
+  deletion = Deletion.query.filter_by(entity='artist', entity_id=artist_id).first()
+  if deletion is None:
+    return jsonify({'error': 'Unknown deletion.'}), 404
+  return jsonify(deletion_status(deletion))
+
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@replica_reads
+@cache.cached('shows')
 def shows():
   # displays list of shows at /shows
-  data = []
-  shows = Show.query.order_by(Show.start_time.desc()).join(Artist, Artist.id == Show.artist_id).join(Venue, Venue.id == Show.venue_id).all()
-
-  for show in shows:
-    data.append({
-      'venue_id': show.venue.id,
-      'venue_name': show.venue.name,
-      'artist_id': show.artist.id,
-      'artist_name': show.artist.name,
-      'artist_image_link': show.artist.image_link,
-      'start_time': show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-  
-  return render_template('pages/shows.html', shows=data)
-
-@app.route('/shows/create')
+  if any(request.args.get(name) for name in ('from', 'to', 'city', 'state', 'genre')):
+    return show_calendar_page()
+  # retrieve one page of shows, latest first, seeking past the cursor's start_time/id
+  limit = parse_limit(request.args.get('limit'))
+  data, next_cursor, prev_cursor = show_page(request.args.get('cursor'), limit)
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, prev_cursor=prev_cursor, limit=limit)
+
+def parse_day(value, default):
+  if not value:
+    return default
+  try:
+    return date.fromisoformat(value)
+  except ValueError:
+    flash(f'{value} is not a valid date (YYYY-MM-DD).')
+    return default
+
+def show_calendar_page():
+  # /shows?from=&to=&city=&state=&genre= lists the matching shows by day.
+  # from defaults to today and to (inclusive) to a week later
+  start = parse_day(request.args.get('from'), date.today())
+  end = parse_day(request.args.get('to'), start + timedelta(days=6))
+  max_days = current_app.config.get('CALENDAR_MAX_DAYS', 31)
+  end = min(max(end, start), start + timedelta(days=max_days - 1))
+  filters = {
+    'city': request.args.get('city', '').strip() or None,
+    'state': request.args.get('state', '').strip().upper() or None,
+    'genre': request.args.get('genre', '').strip() or None,
+  }
+  days, truncated = show_calendar(
+    datetime.combine(start, time.min),
+    datetime.combine(end + timedelta(days=1), time.min),
+    limit=current_app.config.get('CALENDAR_MAX_SHOWS', 500),
+    **filters
+  )
+  return render_template('pages/shows_calendar.html', days=days, truncated=truncated, start=start, end=end, **filters)
+
+@main.route('/shows/create')
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
-@app.route('/shows/create', methods=['POST'])
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
   error = False
   form = ShowForm(request.form)
+  if current_app.config.get('SHOW_WRITE_BEHIND'):
+    return queue_show_submission(form)
   if form.validate():
+    values = show_values(form)
+    errors = show_errors(values)
+    if errors:
+      flash_errors(errors)
+      return render_template('forms/new_show.html', form=form)
     try:
       # assign attribute values
-      new_show = Show(
-        venue_id = form.venue_id.data,
-        artist_id = form.artist_id.data,
-        start_time = form.start_time.data
-      )
+      new_show = Show(**values)
 
       db.session.add(new_show)
       db.session.commit()
@@ -525,37 +531,252 @@ def create_show_submission():
       error = True
       db.session.rollback()
     finally:
-      db.session.close()
       if not error:
+        cache.invalidate('shows', 'venues', f'venue:{form.venue_id.data}', f'artist:{form.artist_id.data}')
         flash('Show was successfully listed!')
         return render_template('pages/home.html')
       else:
         flash('An error occurred. Show could not be listed.')
         return render_template('errors/500.html')
   else:
-    for field, errors in form.errors.items():
-        for error in errors:
-            flash(error + '  Please fix entry and resubmit.')
+    flash_errors(form.errors)
   return render_template('forms/new_show.html', form=form)
 
-@app.errorhandler(404)
+def show_values(form):
+  return {
+    'venue_id': form.venue_id.data,
+    'artist_id': form.artist_id.data,
+    'start_time': form.start_time.data,
+    'duration': form.duration.data
+  }
+
+def show_errors(values, show_id=None):
+  # unknown venue/artist ids, or a venue or artist already booked at the
+  # time (besides by show_id, when editing it)
+  errors = check_show_references({'show': values})
+  if not errors:
+    errors = check_show_conflicts({'show': values}, exclude_id=show_id)
+  return errors.get('show', {})
+
+def flash_errors(errors):
+  for field, messages in errors.items():
+      for message in messages:
+          flash(message + '  Please fix entry and resubmit.')
+
+#  Edit Show
+#  ----------------------------------------------------------------
+
+def live_show(show_id):
+  # shows of a deleted venue or artist are hidden until they are reaped
+  return Show.query.join(Show.venue).join(Show.artist) \
+    .filter(Show.id == show_id, Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)) \
+    .first()
+
+@main.route('/shows/<int:show_id>/edit', methods=['GET'])
+def edit_show(show_id):
+  form = ShowForm()
+  show = live_show(show_id)
+  if show:
+    form.artist_id.data = show.artist_id
+    form.venue_id.data = show.venue_id
+    form.start_time.data = show.start_time
+    form.duration.data = show.duration
+    return render_template('forms/edit_show.html', form=form, show=show)
+  # if no such show exists, show error page
+  return render_template('errors/404.html')
+
+@main.route('/shows/<int:show_id>/edit', methods=['POST'])
+def edit_show_submission(show_id):
+  error = False
+  form = ShowForm(request.form)
+  show = live_show(show_id)
+  if show:
+    if form.validate():
+      values = show_values(form)
+      errors = show_errors(values, show_id)
+      if errors:
+        flash_errors(errors)
+        return render_template('forms/edit_show.html', form=form, show=show)
+      # the pages listing the show before the edit go stale too
+      tags = {'shows', 'venues', f'venue:{show.venue_id}', f'artist:{show.artist_id}'}
+      try:
+        show.venue_id = values['venue_id']
+        show.artist_id = values['artist_id']
+        show.start_time = values['start_time']
+        show.duration = values['duration']
+
+        db.session.commit()
+      except:
+        error = True
+        db.session.rollback()
+      finally:
+        if not error:
+          cache.invalidate(*tags, f'venue:{values["venue_id"]}', f'artist:{values["artist_id"]}')
+          return redirect(url_for('main.show_venue', venue_id=values['venue_id']))
+        else:
+          return render_template('errors/500.html')
+    else:
+      flash_errors(form.errors)
+      return render_template('forms/edit_show.html', form=form, show=show)
+  else:
+    flash('Show ID not valid.')
+    return render_template('errors/404.html')
+
+def wants_json():
+  return request.accept_mimetypes.best == 'application/json'
+
+def queue_show_submission(form):
+  # write-behind mode: validate now, insert later (see writebehind.py).
+  # clients pass an Idempotency-Key header to safely retry a submission; keys
+  # are shared by all clients, so they should be random (e.g. a UUID).
+  if not form.validate():
+    if wants_json():
+      return jsonify({'errors': form.errors}), 400
+    flash_errors(form.errors)
+    return render_template('forms/new_show.html', form=form)
+  key = request.headers.get('Idempotency-Key') or uuid.uuid4().hex
+  try:
+    # overlaps with other shows are checked as the batch is written
+    result = show_writer.submit(key, show_values(form))
+  except QueueFull:
+    if wants_json():
+      return jsonify({'error': 'Too many pending shows, retry later.'}), 503, {'Retry-After': '1'}
+    flash('Too many shows are being listed right now. Please try again shortly.')
+    return render_template('forms/new_show.html', form=form), 503
+  except KeyReused:
+    if wants_json():
+      return jsonify({'error': 'Idempotency-Key was already used for another show.'}), 409
+    flash('This submission was already used for another show. Please submit the form again.')
+    return render_template('forms/new_show.html', form=form), 409
+  if wants_json():
+    return jsonify(dict(result, status_url=url_for('main.show_submission_status', key=key))), 202
+  flash('Show was submitted and will be listed shortly!')
+  return render_template('pages/home.html'), 202
+
+@main.route('/shows/submissions/<key>')
+def show_submission_status(key):
+  # queued, created (with show_id) or failed (with errors)
+  result = show_writer.status(key)
+  if result is None:
+    return jsonify({'error': 'Unknown submission.'}), 404
+  return jsonify(result)
+
+#  Import
+#  ----------------------------------------------------------------
+
+@main.route('/api/import', methods=['POST'])
+def import_data():
+  # streams a CSV or NDJSON request body into the entity given by ?entity=
+  entity = request.args.get('entity')
+  if entity not in ENTITIES:
+    return jsonify({'error': f'entity must be one of {", ".join(sorted(ENTITIES))}'}), 400
+  format = request.args.get('format') or guess_format(request.mimetype)
+  rows = read_rows(io.TextIOWrapper(request.stream, encoding='utf-8'), format)
+  inserted = 0
+  errors = []
+  for report in import_rows(entity, rows, current_app.config['IMPORT_CHUNK_SIZE']):
+    inserted += report['inserted']
+    errors.extend(report['errors'])
+  if inserted:
+    cache.clear()
+  return jsonify({
+    'inserted': inserted,
+    'errors': errors
+  })
+
+#  Export
+#  ----------------------------------------------------------------
+
+@main.route('/api/export/<entity>')
+def export_data(entity):
+  # streams every row of the entity in the ?format= given (ndjson by default)
+  format = request.args.get('format', 'ndjson')
+  if entity not in exporter.ENTITIES or format not in exporter.FORMATS:
+    return render_template('errors/404.html'), 404
+  chunks, mimetype = exporter.export(entity, format, current_app.config['EXPORT_CHUNK_SIZE'])
+  extension = 'csv' if format == 'csv' else 'ndjson'
+  return Response(
+    stream_with_context(chunks),
+    mimetype=mimetype,
+    headers={'Content-Disposition': f'attachment; filename={entity}.{extension}'}
+  )
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+@main.route('/metrics')
+def metrics():
+  # Prometheus text format; each worker process reports its own figures
+  pools = [('primary', db.engine.pool)]
+  if 'replicas' in current_app.extensions:
+    pools += current_app.extensions['replicas'].pools()
+  lines = pool.prometheus_lines(pools) + profiling.prometheus_lines()
+  return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+  '''Create the tables of a new database and mark it as migrated.'''
+  db.create_all()
+  # later `flask db upgrade` runs start from the current schema
+  stamp()
+  click.echo('Initialized the database.')
+
+#----------------------------------------------------------------------------#
+# App.
+#----------------------------------------------------------------------------#
+
+def create_app(config='config'):
+  # config is an import path or object, as taken by app.config.from_object
+  app = Flask(__name__)
+  app.config.from_object(config)
+
+  db.init_app(app)
+  pool.init_app(app, db)
+  replicas.init_app(app)
+  moment.init_app(app)
+  migrate.init_app(app, db)
+  cache.init_app(app)
+  profiling.init_app(app)
+  show_writer.init_app(app, cache)
+  reaper.init_app(app)
+
+  app.jinja_env.filters['datetime'] = format_datetime
+  fragments.init_app(app)
+  app.register_blueprint(main)
+  app.register_blueprint(api)
+
+  app.cli.add_command(init_db_command)
+  app.cli.add_command(counters_cli)
+  app.cli.add_command(import_command)
+  app.cli.add_command(exporter.export_command)
+  app.cli.add_command(geo.geocode_command)
+  app.cli.add_command(reaper_cli)
+
+  if not app.debug:
+      file_handler = FileHandler('error.log')
+      file_handler.setFormatter(
+          Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+      )
+      app.logger.setLevel(logging.INFO)
+      file_handler.setLevel(logging.INFO)
+      app.logger.addHandler(file_handler)
+      app.logger.info('errors')
+
+  return app
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -563,11 +784,11 @@ if not app.debug:
 
 # Default port:
 if __name__ == '__main__':
-    app.run()
+    create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
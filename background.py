@@ -0,0 +1,44 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import threading
+
+#----------------------------------------------------------------------------#
+# Background threads.
+#----------------------------------------------------------------------------#
+
+# The show writer and the reaper each work on a daemon thread, started the
+# first time it is needed. Threads don't survive a fork, so each worker
+# process starts its own.
+
+class BackgroundThread:
+
+  def __init__(self, target, name):
+    self.target = target
+    self.name = name
+    self.lock = threading.Lock()
+    # set to ask target to return, which it checks between units of work
+    self.stopping = threading.Event()
+    self.thread = None
+    self.pid = None
+
+  def running(self):
+    return self.thread is not None and self.thread.is_alive() and self.pid == os.getpid()
+
+  def start(self):
+    if self.running():
+      return
+    with self.lock:
+      if self.running():
+        return
+      self.pid = os.getpid()
+      self.stopping.clear()
+      self.thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+      self.thread.start()
+
+  def join(self, timeout):
+    # only this process's own thread can be waited for
+    if self.thread is not None and self.pid == os.getpid():
+      self.thread.join(timeout)
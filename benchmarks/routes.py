@@ -0,0 +1,299 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import getpass
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import create_app
+import profiling
+from seed import VOLUMES, seed, seeded_counts
+
+#----------------------------------------------------------------------------#
+# Route benchmark.
+#----------------------------------------------------------------------------#
+
+# Seeds a dedicated database (it is wiped), then requests every route of the
+# app through the test client and reports latency percentiles, queries per
+# request and peak Python memory per route. With a baseline file, a route
+# that runs more queries, or gets slower or hungrier than the tolerance
+# allows, fails the run.
+#
+#   $ python3 benchmarks/routes.py --volume 10k --save-baseline
+#   $ python3 benchmarks/routes.py --volume 10k
+
+DEFAULT_DATABASE = 'postgres://{}@{}/{}'.format(getpass.getuser(), '127.0.0.1:5432', 'fyyur_bench')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+class BenchmarkConfig:
+  # measures the views themselves, so the page cache is off
+  DEBUG = False
+  SECRET_KEY = 'benchmark'
+  SQLALCHEMY_TRACK_MODIFICATIONS = False
+  CACHE_BACKEND = 'null'
+  REQUEST_PROFILING = True
+  IMPORT_CHUNK_SIZE = 1000
+  EXPORT_CHUNK_SIZE = 1000
+
+#----------------------------------------------------------------------------#
+# Routes.
+#----------------------------------------------------------------------------#
+
+# Each route is (name, endpoint, request builder). Builders get the seeded
+# counts and the iteration number and return (method, path, client kwargs);
+# writes pick a different row on every iteration.
+
+def venue_form(n):
+  return {
+    'name': f'Benchmark Venue {n}',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'address': '1015 Folsom Street',
+    'phone': '415-555-0100',
+    'genres': ['Jazz', 'Funk'],
+    'facebook_link': 'https://www.facebook.com/benchmark',
+  }
+
+def artist_form(n):
+  return {
+    'name': f'Benchmark Artist {n}',
+    'city': 'San Francisco',
+    'state': 'CA',
+    'phone': '415-555-0100',
+    'genres': ['Jazz'],
+    'facebook_link': 'https://www.facebook.com/benchmark',
+  }
+
+def entity_id(counts, entity, n):
+  # spread requests over the table, deterministically
+  return n * 7919 % counts[entity] + 1
+
+def import_body(n):
+  return '\n'.join(json.dumps(row) for row in (
+    dict(artist_form(f'import {n} {i}'), genres='Jazz') for i in range(10)
+  )) + '\n'
+
+ROUTES = (
+  ('home', 'main.index', lambda counts, n: ('GET', '/', {})),
+  ('venues', 'main.venues', lambda counts, n: ('GET', '/venues', {})),
+  ('venues by genre', 'main.venues', lambda counts, n: ('GET', '/venues?genre=Jazz&genre=Blues', {})),
+  ('search venues', 'main.search_venues',
+    lambda counts, n: ('POST', '/venues/search', {'data': {'search_term': 'hall 1'}})),
+  ('venue', 'main.show_venue',
+    lambda counts, n: ('GET', f'/venues/{entity_id(counts, "venues", n)}', {})),
+  ('new venue form', 'main.create_venue_form', lambda counts, n: ('GET', '/venues/create', {})),
+  ('create venue', 'main.create_venue_submission',
+    lambda counts, n: ('POST', '/venues/create', {'data': venue_form(n)})),
+  ('edit venue form', 'main.edit_venue',
+    lambda counts, n: ('GET', f'/venues/{entity_id(counts, "venues", n)}/edit', {})),
+  ('edit venue', 'main.edit_venue_submission',
+    lambda counts, n: ('POST', f'/venues/{entity_id(counts, "venues", n)}/edit', {'data': venue_form(n)})),
+  ('artists', 'main.artists', lambda counts, n: ('GET', '/artists', {})),
+  ('artists by genre', 'main.artists', lambda counts, n: ('GET', '/artists?genre=Jazz&genre=Blues&match=all', {})),
+  ('search artists', 'main.search_artists',
+    lambda counts, n: ('POST', '/artists/search', {'data': {'search_term': 'band 1'}})),
+  ('artist', 'main.show_artist',
+    lambda counts, n: ('GET', f'/artists/{entity_id(counts, "artists", n)}', {})),
+  ('new artist form', 'main.create_artist_form', lambda counts, n: ('GET', '/artists/create', {})),
+  ('create artist', 'main.create_artist_submission',
+    lambda counts, n: ('POST', '/artists/create', {'data': artist_form(n)})),
+  ('edit artist form', 'main.edit_artist',
+    lambda counts, n: ('GET', f'/artists/{entity_id(counts, "artists", n)}/edit', {})),
+  ('edit artist', 'main.edit_artist_submission',
+    lambda counts, n: ('POST', f'/artists/{entity_id(counts, "artists", n)}/edit', {'data': artist_form(n)})),
+  ('shows', 'main.shows', lambda counts, n: ('GET', '/shows', {})),
+  ('shows calendar', 'main.shows', lambda counts, n: ('GET', '/shows?from={}&to={}&city=Austin'.format(
+    date.today() + timedelta(days=n % 7), date.today() + timedelta(days=n % 7 + 2)), {})),
+  ('new show form', 'main.create_shows', lambda counts, n: ('GET', '/shows/create', {})),
+  ('create show', 'main.create_show_submission', lambda counts, n: ('POST', '/shows/create', {'data': {
+    'venue_id': entity_id(counts, 'venues', n),
+    'artist_id': entity_id(counts, 'artists', n + 1),
+    'start_time': (datetime.now() + timedelta(days=30, hours=n)).strftime('%Y-%m-%d %H:%M:%S'),
+  }})),
+  ('edit show form', 'main.edit_show',
+    lambda counts, n: ('GET', f'/shows/{entity_id(counts, "shows", n)}/edit', {})),
+  ('edit show', 'main.edit_show_submission',
+    lambda counts, n: ('POST', f'/shows/{entity_id(counts, "shows", n)}/edit', {'data': {
+      'venue_id': entity_id(counts, 'venues', n),
+      'artist_id': entity_id(counts, 'artists', n + 1),
+      'start_time': (datetime.now() + timedelta(days=60, hours=n)).strftime('%Y-%m-%d %H:%M:%S'),
+      'duration': 90,
+    }})),
+  ('show submission', 'main.show_submission_status',
+    lambda counts, n: ('GET', f'/shows/submissions/benchmark-{n}', {})),
+  ('import', 'main.import_data', lambda counts, n: ('POST', '/api/import?entity=artists&format=ndjson', {
+    'data': import_body(n),
+    'content_type': 'application/x-ndjson',
+  })),
+  ('export', 'main.export_data', lambda counts, n: ('GET', '/api/export/venues?format=csv', {})),
+  ('metrics', 'main.metrics', lambda counts, n: ('GET', '/metrics', {})),
+  ('api venues', 'api_v1.venues', lambda counts, n: ('GET', '/api/v1/venues', {})),
+  ('api venues nearby', 'api_v1.venues_nearby',
+    lambda counts, n: ('GET', '/api/v1/venues/nearby?lat=30.27&lon=-97.74&radius=10', {})),
+  ('api venue', 'api_v1.venue',
+    lambda counts, n: ('GET', f'/api/v1/venues/{entity_id(counts, "venues", n)}', {})),
+  ('api artists', 'api_v1.artists', lambda counts, n: ('GET', '/api/v1/artists', {})),
+  ('api venue genres', 'api_v1.venue_genres', lambda counts, n: ('GET', '/api/v1/venues/genres?genre=Jazz', {})),
+  ('api artist genres', 'api_v1.artist_genres',
+    lambda counts, n: ('GET', '/api/v1/artists/genres?genre=Rock+n+Roll&match=all', {})),
+  ('api artist', 'api_v1.artist',
+    lambda counts, n: ('GET', f'/api/v1/artists/{entity_id(counts, "artists", n)}', {})),
+  ('api shows', 'api_v1.shows', lambda counts, n: ('GET', '/api/v1/shows', {})),
+  ('api show', 'api_v1.show',
+    lambda counts, n: ('GET', f'/api/v1/shows/{entity_id(counts, "shows", n)}', {})),
+  # deletes run last, on the highest ids, so earlier routes keep their rows
+  ('delete venue', 'main.delete_venue',
+    lambda counts, n: ('DELETE', f'/venues/{counts["venues"] - n}', {})),
+  ('delete artist', 'main.delete_artist',
+    lambda counts, n: ('DELETE', f'/artists/{counts["artists"] - n}', {})),
+  ('venue deletion', 'main.venue_deletion',
+    lambda counts, n: ('GET', f'/venues/{counts["venues"] - n}/deletion', {})),
+  ('artist deletion', 'main.artist_deletion',
+    lambda counts, n: ('GET', f'/artists/{counts["artists"] - n}/deletion', {})),
+)
+
+def untested_endpoints(app):
+  # routes added to the app without a benchmark
+  covered = {endpoint for name, endpoint, build in ROUTES}
+  return sorted(rule.endpoint for rule in app.url_map.iter_rules()
+    if rule.endpoint != 'static' and rule.endpoint not in covered)
+
+#----------------------------------------------------------------------------#
+# Measurement.
+#----------------------------------------------------------------------------#
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def csrf_token(client):
+  # forms are posted like a browser would, with the token of a rendered form
+  page = client.get('/venues/create').get_data(as_text=True)
+  return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+
+def build_request(build, counts, n, token):
+  method, path, kwargs = build(counts, n)
+  if isinstance(kwargs.get('data'), dict):
+    kwargs['data'] = dict(kwargs['data'], csrf_token=token)
+  return method, path, kwargs
+
+def measure(client, token, counts, build, requests):
+  profiling.metrics.reset()
+  timings = []
+  statuses = set()
+  for n in range(requests):
+    method, path, kwargs = build_request(build, counts, n, token)
+    started = time.perf_counter()
+    response = client.open(path, method=method, **kwargs)
+    response.get_data()
+    timings.append((time.perf_counter() - started) * 1000)
+    statuses.add(response.status_code)
+  queries = sum(totals['queries'] for totals in profiling.metrics.totals.values())
+
+  # one more request under tracemalloc, which would skew the timings above
+  method, path, kwargs = build_request(build, counts, requests, token)
+  tracemalloc.start()
+  client.open(path, method=method, **kwargs).get_data()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  return {
+    'status': sorted(statuses),
+    'p50_ms': round(percentile(timings, 0.50), 2),
+    'p95_ms': round(percentile(timings, 0.95), 2),
+    'p99_ms': round(percentile(timings, 0.99), 2),
+    'queries': round(queries / requests, 2),
+    'peak_kb': round(peak / 1024, 1),
+  }
+
+def regressions(results, baseline, tolerance, slack_ms=5):
+  # query counts must not grow at all; latency and memory within tolerance,
+  # and latency by at least slack_ms, below which timings are mostly noise
+  failures = []
+  for name, result in results.items():
+    if any(status >= 500 for status in result['status']):
+      failures.append(f'{name}: server error')
+    before = baseline.get(name)
+    if before is None:
+      continue
+    if result['queries'] > before['queries']:
+      failures.append(f'{name}: {result["queries"]} queries per request, baseline {before["queries"]}')
+    if result['p95_ms'] > max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + slack_ms):
+      failures.append(f'{name}: p95 {result["p95_ms"]} ms, baseline {before["p95_ms"]} ms')
+    if result['peak_kb'] > before['peak_kb'] * (1 + tolerance):
+      failures.append(f'{name}: peak {result["peak_kb"]} KB, baseline {before["peak_kb"]} KB')
+  return failures
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark every route against a seeded database.')
+  parser.add_argument('--volume', choices=sorted(VOLUMES), default='1k', help='Rows to seed.')
+  parser.add_argument('--database', default=os.environ.get('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE),
+    help='Database to seed. Its tables are dropped and recreated.')
+  parser.add_argument('--requests', type=int, default=50, help='Requests per route.')
+  parser.add_argument('--route', action='append', help='Only benchmark the named route(s).')
+  parser.add_argument('--reuse', action='store_true', help='Keep the data of an earlier run at this volume.')
+  parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline file to compare against.')
+  parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline.')
+  parser.add_argument('--tolerance', type=float, default=0.5,
+    help='Allowed p95 latency and memory growth over the baseline (0.5 = 50%%).')
+  args = parser.parse_args()
+
+  config = type('Config', (BenchmarkConfig,), {'SQLALCHEMY_DATABASE_URI': args.database})
+  app = create_app(config)
+  volume = VOLUMES[args.volume]
+  with app.app_context():
+    # earlier runs add and delete a few rows, hence the approximate match
+    counts = seeded_counts() if args.reuse else {}
+    if not all(abs(counts.get(entity, 0) - rows) <= rows // 10 for entity, rows in volume.items()):
+      started = time.perf_counter()
+      seed(**volume)
+      print(f'Seeded {args.volume} in {time.perf_counter() - started:.1f}s')
+    counts = seeded_counts()
+
+  # the per-request log lines would flood error.log
+  app.logger.getChild('requests').disabled = True
+  client = app.test_client()
+  token = csrf_token(client)
+
+  missing = untested_endpoints(app)
+  if missing:
+    print(f'Not benchmarked: {", ".join(missing)}')
+
+  results = {}
+  print(f'{"route":<18} {"status":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8} {"peak KB":>9}')
+  for name, endpoint, build in ROUTES:
+    if args.route and name not in args.route:
+      continue
+    result = results[name] = measure(client, token, counts, build, args.requests)
+    status = ','.join(map(str, result['status']))
+    print(f'{name:<18} {status:>8} {result["p50_ms"]:>9} {result["p95_ms"]:>9} {result["p99_ms"]:>9} '
+      f'{result["queries"]:>8} {result["peak_kb"]:>9}')
+
+  baselines = {}
+  if os.path.exists(args.baseline):
+    with open(args.baseline) as f:
+      baselines = json.load(f)
+  if args.save_baseline:
+    baselines[args.volume] = dict(baselines.get(args.volume, {}), **results)
+    with open(args.baseline, 'w') as f:
+      json.dump(baselines, f, indent=2, sort_keys=True)
+    print(f'Saved the {args.volume} baseline to {args.baseline}')
+    return 0
+
+  failures = regressions(results, baselines.get(args.volume, {}), args.tolerance)
+  for failure in failures:
+    print(f'REGRESSION {failure}')
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit(main())
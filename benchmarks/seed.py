@@ -0,0 +1,132 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_MINUTES
+from counters import get_watermark
+from forms import state_choices, genres_choices
+from geo import encode
+
+#----------------------------------------------------------------------------#
+# Seed data.
+#----------------------------------------------------------------------------#
+
+# Deterministic fake venues, artists and shows, inserted with one executemany
+# per chunk. Show counts are a multiple of the venue count (100 per venue at
+# 10m, for the calendar's 10M-row target); a third of the shows are upcoming.
+
+VOLUMES = {
+  '1k': {'venues': 1000, 'artists': 1000, 'shows': 5000},
+  '10k': {'venues': 10000, 'artists': 10000, 'shows': 50000},
+  '100k': {'venues': 100000, 'artists': 100000, 'shows': 500000},
+  '10m': {'venues': 100000, 'artists': 100000, 'shows': 10000000},
+}
+
+STATES = [state for state, label in state_choices]
+GENRES = [genre for genre, label in genres_choices]
+WORDS = ('Blue', 'Red', 'Velvet', 'Echo', 'Iron', 'Golden', 'Midnight', 'Silver', 'Wild', 'Electric',
+  'Stone', 'Neon', 'Lucky', 'Hollow', 'Paper', 'Crystal', 'Static', 'Rolling', 'Broken', 'Northern')
+CITIES = {
+  'San Francisco': (37.77, -122.42),
+  'New York': (40.71, -74.01),
+  'Austin': (30.27, -97.74),
+  'Chicago': (41.88, -87.63),
+  'Seattle': (47.61, -122.33),
+  'Nashville': (36.16, -86.78),
+  'Denver': (39.74, -104.99),
+  'Boston': (42.36, -71.06),
+}
+
+def fake_name(rng, kind, number):
+  return f'{rng.choice(WORDS)} {rng.choice(WORDS)} {kind} {number}'
+
+def venue_rows(rng, count):
+  cities = list(CITIES)
+  for number in range(1, count + 1):
+    city = rng.choice(cities)
+    # scattered over about 40 km around the city centre
+    latitude = CITIES[city][0] + rng.uniform(-0.2, 0.2)
+    longitude = CITIES[city][1] + rng.uniform(-0.2, 0.2)
+    yield {
+      'name': fake_name(rng, 'Hall', number),
+      'city': city,
+      'state': rng.choice(STATES),
+      'address': f'{rng.randint(1, 9999)} Main St',
+      'phone': f'{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}',
+      'genres': rng.sample(GENRES, rng.randint(1, 3)),
+      'seeking_talent': rng.random() < 0.3,
+      'latitude': latitude,
+      'longitude': longitude,
+      'geohash': encode(latitude, longitude),
+      'upcoming_shows_count': 0,
+    }
+
+def artist_rows(rng, count):
+  cities = list(CITIES)
+  for number in range(1, count + 1):
+    yield {
+      'name': fake_name(rng, 'Band', number),
+      'city': rng.choice(cities),
+      'state': rng.choice(STATES),
+      'phone': f'{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}',
+      'genres': rng.sample(GENRES, rng.randint(1, 3)),
+      'seeking_venue': rng.random() < 0.3,
+      'upcoming_shows_count': 0,
+    }
+
+def show_rows(rng, count, venues, artists, now):
+  # two years back to one year ahead, on the hour. the time is cut into one
+  # slot per show of a venue; within a slot each venue plays once and, with
+  # as many artists as venues, each artist at most once, so no shows overlap
+  # (see schedule.py).
+  slots = -(-count // venues)
+  span = 3 * 365 * 24 // slots
+  first = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=2 * 365 * 24)
+  hours = DEFAULT_SHOW_MINUTES // 60
+  for number in range(count):
+    slot, venue = divmod(number, venues)
+    yield {
+      'venue_id': venue + 1,
+      'artist_id': (venue + slot * 7919) % artists + 1,
+      'start_time': first + timedelta(hours=slot * span + rng.randrange(max(1, span - hours))),
+      'duration': DEFAULT_SHOW_MINUTES,
+    }
+
+def insert(model, rows, chunk_size):
+  rows = iter(rows)
+  while True:
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+      break
+    db.session.execute(model.__table__.insert(), chunk)
+
+def recount_upcoming_shows():
+  # Core inserts bypass the counter events, so the counters are set here
+  rolled_over_at = get_watermark(db.session).rolled_over_at
+  for model, show_fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    count = db.session.query(db.func.count(Show.id)) \
+      .filter(show_fk == model.id, Show.start_time > rolled_over_at) \
+      .correlate(model) \
+      .as_scalar()
+    db.session.query(model).update({model.upcoming_shows_count: count}, synchronize_session=False)
+
+def seed(venues, artists, shows, seed=0, chunk_size=5000):
+  # recreate every table and fill it. needs an app context.
+  rng = random.Random(seed)
+  db.drop_all()
+  db.create_all()
+  insert(Venue, venue_rows(rng, venues), chunk_size)
+  insert(Artist, artist_rows(rng, artists), chunk_size)
+  insert(Show, show_rows(rng, shows, venues, artists, datetime.now()), chunk_size)
+  recount_upcoming_shows()
+  db.session.commit()
+
+def seeded_counts():
+  return {
+    'venues': db.session.query(db.func.count(Venue.id)).scalar(),
+    'artists': db.session.query(db.func.count(Artist.id)).scalar(),
+    'shows': db.session.query(db.func.count(Show.id)).scalar(),
+  }
@@ -0,0 +1,70 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+#----------------------------------------------------------------------------#
+# Startup benchmark.
+#----------------------------------------------------------------------------#
+
+# Measures what each gunicorn worker pays before serving its first request:
+# importing the app module, building the app with create_app() and answering
+# one request. Every run is a fresh interpreter, so nothing is warm.
+#
+#   $ python3 benchmarks/startup.py --runs 10 --path /venues
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(sys.argv[2] or 'config')
+created = time.perf_counter()
+response = app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+  'status': response.status_code,
+  'import': imported - start,
+  'create_app': created - imported,
+  'first_request': served - created,
+  'total': served - start,
+}))
+'''
+
+PHASES = ('import', 'create_app', 'first_request', 'total')
+
+def run_worker(path, config):
+  # one cold start in a new interpreter; returns the timings in seconds
+  output = subprocess.run(
+    [sys.executable, '-c', WORKER, path, config or ''],
+    cwd=ROOT,
+    check=True,
+    stdout=subprocess.PIPE,
+    universal_newlines=True
+  ).stdout
+  return json.loads(output.splitlines()[-1])
+
+def main():
+  parser = argparse.ArgumentParser(description='Time import-to-first-request of a fresh worker.')
+  parser.add_argument('--runs', type=int, default=5, help='Cold starts to measure.')
+  parser.add_argument('--path', default='/', help='Path of the first request.')
+  parser.add_argument('--config', help='Config object passed to create_app().')
+  args = parser.parse_args()
+
+  runs = [run_worker(args.path, args.config) for _ in range(args.runs)]
+  statuses = sorted({run['status'] for run in runs})
+  print(f'{args.runs} cold starts, GET {args.path} -> {", ".join(map(str, statuses))}')
+  for phase in PHASES:
+    timings = [run[phase] * 1000 for run in runs]
+    print(f'{phase:>14}: median {statistics.median(timings):8.1f} ms, max {max(timings):8.1f} ms')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,107 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wtforms.validators import ValidationError
+from forms import state_choices, genres_choices, validate_state, validate_genres, validate_phone, \
+  validate_facebook_link
+
+#----------------------------------------------------------------------------#
+# Validator microbenchmark.
+#----------------------------------------------------------------------------#
+
+# Runs the state, genres, phone and facebook validators over generated rows
+# (one in twenty invalid), as the former per-call implementations, as the
+# current validators called by WTForms, and through their .validate().
+#
+#   $ python3 benchmarks/validators.py --rows 1000000
+
+def legacy_state(form, field):
+  if field.data:
+    valid_choices = [state[1] for state in state_choices]
+    if field.data not in valid_choices:
+      raise ValidationError('Not a valid State.')
+
+def legacy_genres(form, field):
+  if field.data:
+    valid_choices = [genre[1] for genre in genres_choices]
+    for value in field.data:
+      if value not in valid_choices:
+        raise ValidationError('Not a valid genre.')
+
+def legacy_phone(form, field):
+  if field.data:
+    if not re.search(r'^(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}$', field.data):
+      raise ValidationError('Not a valid phone number.')
+
+def legacy_facebook_link(form, field):
+  if field.data:
+    if not re.search(r'((http|https)://)?(www[.])?facebook.com/.+', field.data):
+      raise ValidationError('Not a valid facebook profile.')
+
+def generate_rows(count, seed=0):
+  rng = random.Random(seed)
+  states = [value for value, label in state_choices]
+  genres = [value for value, label in genres_choices]
+  for number in range(count):
+    bad = number % 20 == 0
+    yield {
+      'state': 'XX' if bad else rng.choice(states),
+      'genres': rng.sample(genres, rng.randint(1, 4)) + (['Polka'] if bad else []),
+      'phone': '12-34' if bad else f'{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}',
+      'facebook_link': 'myspace.com/band' if bad else f'https://www.facebook.com/band{number}',
+    }
+
+def run_form_validators(rows, validators):
+  # call each validator the way WTForms does, counting failed values
+  failures = 0
+  field = SimpleNamespace(data=None)
+  for row in rows:
+    for name, validator in validators:
+      field.data = row[name]
+      try:
+        validator(None, field)
+      except ValidationError:
+        failures += 1
+  return failures
+
+def run_validate(rows, validators):
+  # check the plain values, counting the error messages returned
+  return sum(validator.validate(row[name]) is not None for row in rows for name, validator in validators)
+
+def main():
+  parser = argparse.ArgumentParser(description='Time the field validators over generated rows.')
+  parser.add_argument('--rows', type=int, default=1000000, help='Rows to validate.')
+  args = parser.parse_args()
+
+  rows = list(generate_rows(args.rows))
+  validators = (
+    ('state', validate_state), ('genres', validate_genres),
+    ('phone', validate_phone), ('facebook_link', validate_facebook_link))
+  runs = (
+    ('legacy validators', lambda: run_form_validators(rows, (
+      ('state', legacy_state), ('genres', legacy_genres),
+      ('phone', legacy_phone), ('facebook_link', legacy_facebook_link)))),
+    ('form validators', lambda: run_form_validators(rows, validators)),
+    ('validate()', lambda: run_validate(rows, validators)),
+  )
+  print(f'{args.rows} rows')
+  for name, run in runs:
+    started = time.perf_counter()
+    failures = run()
+    elapsed = time.perf_counter() - started
+    print(f'{name:>18}: {elapsed:6.2f}s, {elapsed / args.rows * 1e6:5.2f} us/row, {failures} invalid values')
+
+if __name__ == '__main__':
+  main()
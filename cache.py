@@ -0,0 +1,225 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import pickle
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from threading import Lock
+from flask import g, request, session, _request_ctx_stack
+from replicas import pinned_to_primary, used_replica
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# Every backend stores rendered pages under a key and files each key under a
+# set of tags (e.g. 'venues', 'venue:3'), so writes can evict exactly the
+# pages that display the entity they changed.
+
+class MemoryCache:
+  # in-process LRU with a per-entry TTL. Each worker holds its own copy, so
+  # use a shared backend when running several workers.
+
+  def __init__(self, max_entries=1024, ttl=300):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.entries = OrderedDict()
+    self.tags = defaultdict(set)
+    self.lock = Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      value, expires, tags = entry
+      if expires < time.monotonic():
+        self._remove(key)
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, tags=()):
+    with self.lock:
+      self._remove(key)
+      self.entries[key] = (value, time.monotonic() + self.ttl, tuple(tags))
+      for tag in tags:
+        self.tags[tag].add(key)
+      while len(self.entries) > self.max_entries:
+        self._remove(next(iter(self.entries)))
+
+  def invalidate(self, *tags):
+    with self.lock:
+      for tag in tags:
+        for key in list(self.tags.get(tag, ())):
+          self._remove(key)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.tags.clear()
+
+  def _remove(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is None:
+      return
+    for tag in entry[2]:
+      keys = self.tags.get(tag)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self.tags[tag]
+
+class RedisCache:
+  # shared cache on any client speaking the redis-py API (get, set, delete,
+  # sadd, smembers, expire, scan_iter); tags are stored as sets of keys
+
+  def __init__(self, client, ttl=300, prefix='fyyur:cache:'):
+    self.client = client
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return None if value is None else pickle.loads(value)
+
+  def set(self, key, value, tags=()):
+    self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+    for tag in tags:
+      tag_key = self.prefix + 'tag:' + tag
+      self.client.sadd(tag_key, key)
+      # a tag only needs to outlive the entries filed under it
+      self.client.expire(tag_key, self.ttl)
+
+  def invalidate(self, *tags):
+    for tag in tags:
+      tag_key = self.prefix + 'tag:' + tag
+      keys = [self.prefix + key.decode() for key in self.client.smembers(tag_key)]
+      self.client.delete(tag_key, *keys)
+
+  def clear(self):
+    keys = list(self.client.scan_iter(self.prefix + '*'))
+    if keys:
+      self.client.delete(*keys)
+
+class FakeRedis:
+  # in-memory stand-in for a redis client covering what RedisCache uses,
+  # for running the shared backend locally and in tests
+
+  def __init__(self):
+    self.values = {}
+    self.expires = {}
+
+  def _alive(self, key):
+    expires = self.expires.get(key)
+    if expires is not None and expires < time.monotonic():
+      self.values.pop(key, None)
+      self.expires.pop(key, None)
+    return key in self.values
+
+  def get(self, key):
+    return self.values[key] if self._alive(key) else None
+
+  def set(self, key, value, ex=None):
+    self.values[key] = value
+    self.expires.pop(key, None)
+    if ex is not None:
+      self.expire(key, ex)
+
+  def expire(self, key, seconds):
+    if self._alive(key):
+      self.expires[key] = time.monotonic() + seconds
+
+  def sadd(self, key, *members):
+    if not self._alive(key):
+      self.values[key] = set()
+    self.values[key].update(member.encode() for member in members)
+
+  def smembers(self, key):
+    return set(self.values[key]) if self._alive(key) else set()
+
+  def delete(self, *keys):
+    for key in keys:
+      self.values.pop(key, None)
+      self.expires.pop(key, None)
+
+  def scan_iter(self, match):
+    prefix = match.rstrip('*')
+    return [key for key in list(self.values) if key.startswith(prefix) and self._alive(key)]
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+def flashed():
+  # whether this request flashed messages, still pending in the session or
+  # already taken out by get_flashed_messages() to render them
+  return bool(session.get('_flashes')) or bool(_request_ctx_stack.top.flashes)
+
+class ResponseCache:
+
+  def __init__(self, app=None):
+    self.backend = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    # CACHE_BACKEND is 'memory', 'redis', 'fakeredis' or 'null' (disabled)
+    name = app.config.get('CACHE_BACKEND', 'memory')
+    ttl = app.config.get('CACHE_TTL', 300)
+    if name == 'memory':
+      self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+    elif name == 'redis':
+      try:
+        import redis
+      except ImportError:
+        raise RuntimeError('CACHE_BACKEND = "redis" requires the redis package')
+      self.backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']), ttl)
+    elif name == 'fakeredis':
+      self.backend = RedisCache(FakeRedis(), ttl)
+    elif name == 'null':
+      self.backend = None
+    else:
+      raise ValueError(f'Unknown CACHE_BACKEND: {name}')
+
+  def cached(self, *tags):
+    # read-through cache for GET views rendering a page. tags may use the
+    # view's arguments, e.g. 'venue:{venue_id}'; views can file the page
+    # under more tags while rendering with tag().
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        # pages carrying flashed messages are specific to one visitor
+        if self.backend is None or request.method != 'GET' or '_flashes' in session:
+          return view(*args, **kwargs)
+        key = request.full_path
+        # a client reading its own writes skips pages cached before them
+        if not pinned_to_primary():
+          page = self.backend.get(key)
+          if page is not None:
+            return page
+        g.cache_tags = {tag.format(**kwargs) for tag in tags}
+        page = view(*args, **kwargs)
+        # only plain rendered pages are stored, not redirects or responses,
+        # nor pages showing messages the view flashed itself. neither are
+        # pages read from a replica, which may not have seen the latest
+        # writes yet and would outlive the invalidation those made
+        if isinstance(page, str) and not flashed() and not used_replica():
+          self.backend.set(key, page, g.cache_tags)
+        return page
+      return wrapper
+    return decorator
+
+  def tag(self, *tags):
+    if 'cache_tags' in g:
+      g.cache_tags.update(tags)
+
+  def invalidate(self, *tags):
+    if self.backend is not None:
+      self.backend.invalidate(*tags)
+
+  def clear(self):
+    if self.backend is not None:
+      self.backend.clear()
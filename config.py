@@ -1,5 +1,6 @@
 import os
 import getpass
+import tempfile
 SECRET_KEY = os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -9,4 +10,76 @@ DEBUG = True
 
 # Connect to the database
 SQLALCHEMY_DATABASE_URI = 'postgres://{}@{}/{}'.format(getpass.getuser(), '127.0.0.1:5432', 'fyyur')
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool per worker, sized per deployment through the environment.
+# Set DB_PGBOUNCER=1 when connecting through PgBouncer (transaction pooling):
+# connections are then opened per request and the pool settings are unused.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))  # ms, 0 disables
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '0') == '1'
+
+# Read replicas for the listing, search and detail pages and the JSON API,
+# e.g. DATABASE_REPLICA_URLS=postgres://replica1/fyyur,postgres://replica2/fyyur
+# REPLICA_SELECTION is 'round_robin' or 'least_connections'. Clients read
+# from the primary for REPLICA_STICKY_SECONDS after they write.
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+REPLICA_SELECTION = os.environ.get('REPLICA_SELECTION', 'round_robin')
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+# Cap the shows listed on venue/artist pages (None lists them all)
+PAST_SHOWS_LIMIT = None
+UPCOMING_SHOWS_LIMIT = None
+# How those shows load their artist/venue: 'contains_eager' (same query)
+# or 'selectin' (one extra query); see queries.entity_shows
+SHOW_LOADING = 'contains_eager'
+
+# Per-request query counts and timings: Server-Timing headers, a log line
+# per request and per-endpoint totals on /metrics
+REQUEST_PROFILING = True
+
+# Longest date range and most shows listed by the /shows calendar
+CALENDAR_MAX_DAYS = 31
+CALENDAR_MAX_SHOWS = 500
+
+# Default and largest radius of /api/v1/venues/nearby, in km
+NEARBY_RADIUS_KM = 25
+NEARBY_MAX_RADIUS_KM = 200
+
+# Rendered page cache: 'memory' (per worker LRU), 'redis', 'fakeredis' or 'null'.
+# With replicas, only pages rendered on the primary are stored.
+CACHE_BACKEND = 'memory'
+CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = 'redis://127.0.0.1:6379/0'
+
+# Write-behind show creation: validated submissions are queued and inserted
+# in batches by a background thread. A full queue answers 503.
+SHOW_WRITE_BEHIND = False
+SHOW_QUEUE_SIZE = 10000
+SHOW_BATCH_SIZE = 500
+SHOW_FLUSH_INTERVAL = 0.5  # seconds a batch waits to fill up
+SHOW_RESULT_TTL = 3600  # seconds submission statuses are kept
+
+# Deleted venues and artists are hidden at once; a background thread then
+# removes their shows in batches, pausing between them (see reaper.py)
+REAPER_ENABLED = True
+REAPER_BATCH_SIZE = 1000
+REAPER_PAUSE = 0.05  # seconds between batches
+
+# Rendered show and venue tiles, keyed by id and updated_at (0 disables)
+FRAGMENT_CACHE_MAX_ENTRIES = 10000
+FRAGMENT_CACHE_TTL = 3600
+
+# Compiled templates, shared by every worker on the host (None disables)
+JINJA_BYTECODE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'fyyur-jinja')
+
+# Rows validated and inserted per transaction by the bulk importer
+IMPORT_CHUNK_SIZE = 1000
+
+# Rows fetched per server-side cursor round trip by the exporter
+EXPORT_CHUNK_SIZE = 1000
\ No newline at end of file
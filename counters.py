@@ -0,0 +1,157 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from collections import Counter
+from datetime import datetime
+import click
+from flask.cli import AppGroup
+from models import db, Venue, Artist, Show, UpcomingShowsWatermark
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+# Venue.upcoming_shows_count and Artist.upcoming_shows_count hold the number
+# of shows starting after the watermark. Show inserts, moves and deletes
+# adjust them as they are flushed, and `flask counters rollover` periodically
+# advances the watermark, subtracting the shows that have started since.
+
+def get_watermark(session, read=True):
+  # lock the watermark row so show writes (shared) and rollovers (exclusive)
+  # don't interleave
+  watermark = session.query(UpcomingShowsWatermark).filter_by(id=1).with_for_update(read=read).first()
+  if watermark is None:
+    watermark = UpcomingShowsWatermark(id=1, rolled_over_at=datetime.now())
+    session.add(watermark)
+  return watermark
+
+def apply_deltas(session, model, deltas):
+  for entity_id, delta in deltas.items():
+    if delta:
+      session.query(model).filter(model.id == entity_id).update(
+        {model.upcoming_shows_count: model.upcoming_shows_count + delta},
+        synchronize_session=False
+      )
+
+def count_show_changes(session, flush_context, instances):
+  # runs before each flush, while the pending changes can still be inspected
+  shows = [
+    (show, state)
+    for state, shows in (('new', session.new), ('dirty', session.dirty), ('deleted', session.deleted))
+    for show in shows if isinstance(show, Show)
+  ]
+  if not shows:
+    return
+  rolled_over_at = get_watermark(session).rolled_over_at
+  venue_deltas = Counter()
+  artist_deltas = Counter()
+
+  def count(venue_id, artist_id, start_time, delta):
+    if start_time is not None and start_time > rolled_over_at:
+      venue_deltas[venue_id] += delta
+      artist_deltas[artist_id] += delta
+
+  for show, state in shows:
+    if state != 'new':
+      # remove the show as it was last stored
+      attrs = db.inspect(show).attrs
+      original = [
+        attrs[key].history.deleted[0] if attrs[key].history.deleted else getattr(show, key)
+        for key in ('venue_id', 'artist_id', 'start_time')
+      ]
+      count(*original, -1)
+    if state != 'deleted':
+      count(show.venue_id, show.artist_id, show.start_time, 1)
+
+  apply_deltas(session, Venue, venue_deltas)
+  apply_deltas(session, Artist, artist_deltas)
+
+db.event.listen(db.session, 'before_flush', count_show_changes)
+
+def load_stored_value(target, value, oldvalue, initiator):
+  pass
+
+# have the stored value loaded before an expired show's column is set, so
+# that count_show_changes finds it in the attribute's history
+for attribute in (Show.venue_id, Show.artist_id, Show.start_time):
+  db.event.listen(attribute, 'set', load_stored_value, active_history=True)
+
+def release_shows(show_fk, entity_id):
+  # deleting a venue or artist cascades to its shows in the database, out of
+  # sight of the flush events, so its counterparts' counters are settled here
+  session = db.session
+  rolled_over_at = get_watermark(session).rolled_over_at
+  if show_fk is Show.venue_id:
+    other_fk, other = Show.artist_id, Artist
+  else:
+    other_fk, other = Show.venue_id, Venue
+  deltas = session.query(other_fk, -db.func.count(Show.id)) \
+    .filter(show_fk == entity_id, Show.start_time > rolled_over_at) \
+    .group_by(other_fk)
+  apply_deltas(session, other, dict(deltas))
+
+def live_shows(query):
+  # shows of a deleted venue or artist were released from the counters when
+  # it was deleted (see reaper.py), and are left out until they are reaped
+  return query.join(Venue, Venue.id == Show.venue_id) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+
+def roll_over(now=None):
+  # subtract the shows that started since the last rollover and advance the
+  # watermark. returns the number of shows rolled over.
+  now = now or datetime.now()
+  session = db.session
+  watermark = get_watermark(session, read=False)
+  started = Show.start_time > watermark.rolled_over_at, Show.start_time <= now
+  for fk, model in ((Show.venue_id, Venue), (Show.artist_id, Artist)):
+    deltas = live_shows(session.query(fk, -db.func.count(Show.id))).filter(*started).group_by(fk)
+    apply_deltas(session, model, dict(deltas))
+  rolled_over = live_shows(session.query(db.func.count(Show.id))).filter(*started).scalar()
+  watermark.rolled_over_at = now
+  session.commit()
+  return rolled_over
+
+def find_drift(model, show_fk):
+  # recompute a model's counters from the Show table, returning
+  # (id, stored, actual) for every entity whose stored count is off
+  rolled_over_at = get_watermark(db.session).rolled_over_at
+  other, other_fk = (Artist, Show.artist_id) if model is Venue else (Venue, Show.venue_id)
+  actual = db.func.count(Show.id).filter(Show.start_time > rolled_over_at, other.deleted_at.is_(None))
+  rows = db.session.query(model.id, model.upcoming_shows_count, actual) \
+    .outerjoin(Show, show_fk == model.id) \
+    .outerjoin(other, other.id == other_fk) \
+    .filter(model.deleted_at.is_(None)) \
+    .group_by(model.id) \
+    .having(model.upcoming_shows_count != actual) \
+    .order_by(model.id)
+  return rows.all()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+counters_cli = AppGroup('counters', help='Maintain the upcoming show counters.')
+
+@counters_cli.command('rollover')
+def rollover_command():
+  '''Subtract shows that have started since the last rollover.'''
+  click.echo(f'Rolled over {roll_over()} started shows.')
+
+@counters_cli.command('check')
+@click.option('--fix', is_flag=True, help='Overwrite drifted counters with the recomputed values.')
+def check_command(fix):
+  '''Recompute the counters from scratch and report drift.'''
+  drifted = 0
+  for model, show_fk in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    for entity_id, stored, actual in find_drift(model, show_fk):
+      drifted += 1
+      click.echo(f'{model.__tablename__} {entity_id}: stored {stored}, actual {actual}')
+      if fix:
+        db.session.query(model).filter(model.id == entity_id).update(
+          {model.upcoming_shows_count: actual},
+          synchronize_session=False
+        )
+  db.session.commit()
+  click.echo(f'{drifted} counters drifted{" and were fixed" if fix and drifted else ""}.')
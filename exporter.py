@@ -0,0 +1,123 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+from models import db, Venue, Artist, Show
+from counters import live_shows
+
+#----------------------------------------------------------------------------#
+# Rows.
+#----------------------------------------------------------------------------#
+
+# Exports read each table through a server-side cursor (yield_per) and emit
+# it chunk by chunk, so memory use stays flat however many rows there are.
+
+ENTITIES = {
+  'venues': Venue,
+  'artists': Artist,
+  'shows': Show,
+}
+
+def export_batches(model, chunk_size=1000):
+  # yields (column names, list of row tuples) per chunk, in id order
+  columns = list(model.__table__.columns)
+  names = [column.key for column in columns]
+  query = db.session.query(*columns)
+  if hasattr(model, 'deleted_at'):
+    # deleted venues and artists are on their way out
+    query = query.filter(model.deleted_at.is_(None))
+  if model is Show:
+    # and so are their shows, until the reaper removes them
+    query = live_shows(query)
+  rows = iter(query.order_by(model.id).yield_per(chunk_size))
+  while True:
+    batch = list(islice(rows, chunk_size))
+    if not batch:
+      break
+    yield names, batch
+
+def plain(value):
+  # to the second, in the format ShowForm.start_time reads back
+  if isinstance(value, datetime):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+  return value
+
+#----------------------------------------------------------------------------#
+# Formats.
+#----------------------------------------------------------------------------#
+
+def to_ndjson(batches):
+  # one JSON object per row
+  for names, batch in batches:
+    yield ''.join(
+      json.dumps({name: plain(value) for name, value in zip(names, row)}) + '\n'
+      for row in batch
+    )
+
+def csv_value(value):
+  if isinstance(value, list):
+    return ','.join(value)
+  if isinstance(value, bool):
+    # lowercase, as the form checkboxes read 'false' but not 'False'
+    return 'true' if value else 'false'
+  return plain(value)
+
+def to_csv(batches):
+  # header row first; lists such as genres are comma separated in their
+  # cell, the same layout `flask import` reads
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  header = True
+  for names, batch in batches:
+    if header:
+      writer.writerow(names)
+      header = False
+    for row in batch:
+      writer.writerow([csv_value(value) for value in row])
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+def to_columnar(batches):
+  # one JSON record batch per chunk holding a list of values per column,
+  # the row group layout of Parquet without needing pyarrow to write it
+  for names, batch in batches:
+    columns = zip(*batch)
+    yield json.dumps({
+      'num_rows': len(batch),
+      'columns': {name: [plain(value) for value in column] for name, column in zip(names, columns)}
+    }) + '\n'
+
+FORMATS = {
+  'ndjson': (to_ndjson, 'application/x-ndjson'),
+  'csv': (to_csv, 'text/csv'),
+  'columnar': (to_columnar, 'application/x-ndjson'),
+}
+
+def export(entity, format, chunk_size=1000):
+  # returns (generator of text chunks, mimetype)
+  serializer, mimetype = FORMATS[format]
+  return serializer(export_batches(ENTITIES[entity], chunk_size)), mimetype
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('export')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.option('--format', type=click.Choice(sorted(FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+@with_appcontext
+def export_command(entity, format, output, chunk_size):
+  '''Stream venues, artists or shows as NDJSON, CSV or columnar batches.'''
+  chunks, mimetype = export(entity, format, chunk_size)
+  for chunk in chunks:
+    output.write(chunk)
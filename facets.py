@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from collections import defaultdict
+from models import db
+from tableindex import TableIndexes
+from forms import validate_genres
+
+#----------------------------------------------------------------------------#
+# Genre filters.
+#----------------------------------------------------------------------------#
+
+# Listings and searches take ?genre=Jazz&genre=Blues, matching entities with
+# any of the genres, or all of them with ?match=all. On PostgreSQL they are
+# array overlap (&&) and containment (@>) tests served by the GIN indexes on
+# the genres columns declared in models.py. SQLite has neither, so there
+# the genres are held in memory as bitsets instead: one integer per genre,
+# whose bit n is set when entity n has the genre.
+
+MATCHES = ('any', 'all')
+
+def parse_genres(genres, match=None):
+  # returns (genres, match) from request values, or raises ValueError
+  genres = list(dict.fromkeys(genre.strip() for genre in genres if genre.strip()))
+  if validate_genres.validate(genres) is not None:
+    unknown = [genre for genre in genres if genre not in validate_genres.choices]
+    raise ValueError(f'Unknown genres: {", ".join(unknown)}')
+  match = match or 'any'
+  if match not in MATCHES:
+    raise ValueError(f'match must be one of {", ".join(MATCHES)}')
+  return genres, match
+
+class BitsetIndex:
+
+  def __init__(self):
+    self.bits = defaultdict(int)
+    self.everything = 0
+
+  def load(self, rows):
+    # fill an empty index from (id, genres) rows, one bitset per genre
+    entity_ids = []
+    members = defaultdict(list)
+    for id, genres in rows:
+      entity_ids.append(id)
+      for genre in set(genres or ()):
+        members[genre].append(id)
+    self.everything = bitset(entity_ids)
+    for genre, genre_ids in members.items():
+      self.bits[genre] = bitset(genre_ids)
+
+  def mask(self, genres=(), match='any'):
+    # bitset of the entities matching the genres; all of them without any
+    if not genres:
+      return self.everything
+    masks = [self.bits.get(genre, 0) for genre in genres]
+    result = masks[0]
+    for mask in masks[1:]:
+      result = result & mask if match == 'all' else result | mask
+    return result
+
+  def counts(self, mask):
+    # {genre: entities in mask having it}
+    counts = {}
+    for genre, bits in self.bits.items():
+      count = bin(bits & mask).count('1')
+      if count:
+        counts[genre] = count
+    return counts
+
+def bitset(ids):
+  # the bitset with the bits of ids set
+  bits = bytearray()
+  for id in ids:
+    byte = id >> 3
+    if byte >= len(bits):
+      bits.extend(bytes(byte + 1 - len(bits)))
+    bits[byte] |= 1 << (id & 7)
+  return int.from_bytes(bits, 'little')
+
+def ids(mask):
+  # positions of the set bits, lowest first
+  result = []
+  for position, byte in enumerate(mask.to_bytes((mask.bit_length() + 7) // 8, 'little')):
+    while byte:
+      low = byte & -byte
+      result.append(position * 8 + low.bit_length() - 1)
+      byte ^= low
+  return result
+
+#----------------------------------------------------------------------------#
+# Index maintenance.
+#----------------------------------------------------------------------------#
+
+def build_index(model):
+  index = BitsetIndex()
+  index.load(db.session.query(model.id, model.genres).filter(model.deleted_at.is_(None)))
+  return index
+
+# per model, rebuilt after writes (see tableindex.py)
+indexes = TableIndexes(build_index)
+
+#----------------------------------------------------------------------------#
+# Filters and facets.
+#----------------------------------------------------------------------------#
+
+def filter_genres(query, model, genres=(), match='any'):
+  # restrict query to entities having any/all of the genres
+  if not genres:
+    return query
+  if db.engine.dialect.name == 'postgresql':
+    operator = '@>' if match == 'all' else '&&'
+    return query.filter(model.genres.op(operator, is_comparison=True)(list(genres)))
+  matching = ids(indexes.get(model).mask(genres, match))
+  if not matching:
+    return query.filter(db.false())
+  return query.filter(model.id.in_(matching))
+
+def genre_facets(model, genres=(), match='any', query=None):
+  # [{'genre', 'count'}] of the entities in query (every entity if None),
+  # most common first. With match='any', a further genre widens the results,
+  # so the counts ignore the genre filter; with 'all' they count within it.
+  if match == 'any':
+    genres = ()
+  if db.engine.dialect.name == 'postgresql':
+    base = query.with_entities(model.id) if query is not None \
+      else db.session.query(model.id).filter(model.deleted_at.is_(None))
+    matching = filter_genres(base.order_by(None), model, genres, match) \
+      .with_entities(db.func.unnest(model.genres).label('genre')) \
+      .subquery()
+    # one aggregate query over the unnested genres
+    counts = dict(db.session.query(matching.c.genre, db.func.count()).group_by(matching.c.genre))
+  else:
+    index = indexes.get(model)
+    mask = index.mask(genres, match)
+    if query is not None:
+      mask &= bitset(id for id, in query.with_entities(model.id).order_by(None))
+    counts = index.counts(mask)
+  return [
+    {'genre': genre, 'count': count}
+    for genre, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+  ]
@@ -1,8 +1,10 @@
+from abc import ABC, abstractmethod
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Optional, ValidationError
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, ValidationError, NumberRange
 import re
+from models import DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
 
 state_choices=[
     ('AL', 'AL'),
@@ -81,28 +83,62 @@ genres_choices=[
     ('Other', 'Other'),
 ]
 
-def validate_state(form, field):
-    if field.data:
-        valid_choices = [state[1] for state in state_choices]
-        if field.data not in valid_choices:
-            raise ValidationError('Not a valid State.')
-
-def validate_genres(form, field):
-    if field.data:
-        valid_choices = [genre[1] for genre in genres_choices]
-        for value in field.data:
-            if value not in valid_choices:
-                raise ValidationError('Not a valid genre.')
-
-def validate_phone(form, field):
-    if field.data:
-        if not re.search('^(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}$', field.data):
-            raise ValidationError('Not a valid phone number.')
-
-def validate_facebook_link(form, field):
-    if field.data:
-        if not re.search('((http|https)://)?(www[.])?facebook.com/.+', field.data):
-            raise ValidationError('Not a valid facebook profile.')
+# Each validator is built once: choices become frozensets and patterns are
+# compiled up front. They are WTForms validators, and also check plain
+# values through .validate(value).
+
+class Validator(ABC):
+    message = 'Not valid.'
+
+    def __init__(self, message=None):
+        if message is not None:
+            self.message = message
+
+    @abstractmethod
+    def is_valid(self, value):
+        pass
+
+    def validate(self, value):
+        # returns the error message, or None; empty values are left to
+        # DataRequired/Optional as with the form
+        if value and not self.is_valid(value):
+            return self.message
+        return None
+
+    def __call__(self, form, field):
+        error = self.validate(field.data)
+        if error is not None:
+            raise ValidationError(error)
+
+class Choice(Validator):
+    # a single value out of a fixed set
+
+    def __init__(self, choices, message=None):
+        super().__init__(message)
+        self.choices = frozenset(choices)
+
+    def is_valid(self, value):
+        return value in self.choices
+
+class Choices(Choice):
+    # every value of a list out of a fixed set
+
+    def is_valid(self, values):
+        return isinstance(values, (list, tuple)) and self.choices.issuperset(values)
+
+class Pattern(Validator):
+
+    def __init__(self, pattern, message=None):
+        super().__init__(message)
+        self.pattern = re.compile(pattern)
+
+    def is_valid(self, value):
+        return isinstance(value, str) and self.pattern.search(value) is not None
+
+validate_state = Choice((value for value, label in state_choices), 'Not a valid State.')
+validate_genres = Choices((value for value, label in genres_choices), 'Not a valid genre.')
+validate_phone = Pattern(r'^(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}$', 'Not a valid phone number.')
+validate_facebook_link = Pattern(r'((http|https)://)?(www[.])?facebook.com/.+', 'Not a valid facebook profile.')
 
 class ShowForm(FlaskForm):
     artist_id = StringField(
@@ -116,6 +152,11 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=DEFAULT_SHOW_MINUTES
+    )
 
 class VenueForm(FlaskForm):
     name = StringField(
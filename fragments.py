@@ -0,0 +1,62 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from cache import MemoryCache
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+# Wrapping markup in {% fragment 'show', show.id, show.updated_at %} ...
+# {% endfragment %} renders it once per distinct key and reuses the HTML
+# afterwards. Keys carry the updated_at of everything the fragment displays,
+# so an edit yields a new key instead of needing an invalidation; stale
+# entries simply age out of the LRU.
+
+class FragmentCacheExtension(Extension):
+  tags = {'fragment'}
+
+  def __init__(self, environment):
+    super().__init__(environment)
+    environment.extend(fragment_cache=None)
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    key = [parser.parse_expression()]
+    while parser.stream.skip_if('comma'):
+      key.append(parser.parse_expression())
+    body = parser.parse_statements(['name:endfragment'], drop_needle=True)
+    return nodes.CallBlock(self.call_method('_render', [nodes.List(key)]), [], [], body).set_lineno(lineno)
+
+  def _render(self, key, caller):
+    store = self.environment.fragment_cache
+    if store is None:
+      return caller()
+    key = tuple(key)
+    html = store.get(key)
+    if html is None:
+      html = caller()
+      store.set(key, html)
+    return html
+
+#----------------------------------------------------------------------------#
+# Setup.
+#----------------------------------------------------------------------------#
+
+def init_app(app):
+  env = app.jinja_env
+  env.add_extension(FragmentCacheExtension)
+  max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000)
+  if max_entries:
+    env.fragment_cache = MemoryCache(max_entries, app.config.get('FRAGMENT_CACHE_TTL', 3600))
+
+  # compiled templates are kept on disk, so workers after the first skip
+  # parsing and compiling them
+  directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,223 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import math
+from bisect import bisect_left
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from models import db, Venue
+from tableindex import TableIndexes
+
+#----------------------------------------------------------------------------#
+# Geohashes.
+#----------------------------------------------------------------------------#
+
+# Venues with coordinates carry the geohash of their location: a base32 string
+# naming a grid cell, where every extra character splits the cell into 32 and
+# venues in the same cell share its prefix. A radius query looks up the cell
+# holding the point and its eight neighbours, at the finest precision whose
+# cells are still at least as wide as the radius, so only venues in those
+# nine prefixes are read and measured.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # about 5 m by 5 m
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def encode(latitude, longitude, precision=PRECISION):
+  lat_range = [-90.0, 90.0]
+  lon_range = [-180.0, 180.0]
+  chars = []
+  bits = 0
+  value = 0
+  even = True
+  while len(chars) < precision:
+    # bits alternate between longitude and latitude, longitude first
+    coordinate, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+    middle = (bounds[0] + bounds[1]) / 2
+    value <<= 1
+    if coordinate >= middle:
+      value |= 1
+      bounds[0] = middle
+    else:
+      bounds[1] = middle
+    even = not even
+    bits += 1
+    if bits == 5:
+      chars.append(BASE32[value])
+      bits = 0
+      value = 0
+  return ''.join(chars)
+
+def cell_size(precision):
+  # (height, width) of a cell in degrees
+  lon_bits = (5 * precision + 1) // 2
+  lat_bits = 5 * precision // 2
+  return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+def distance_km(lat1, lon1, lat2, lon2):
+  # great-circle distance (haversine)
+  lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+  a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+  return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def covering_cells(latitude, longitude, radius_km):
+  # geohash prefixes of the cells that together cover the circle
+  # (the circle's highest latitude has the narrowest cells)
+  edge = min(90.0, abs(latitude) + radius_km / KM_PER_DEGREE)
+  km_per_lon_degree = KM_PER_DEGREE * math.cos(math.radians(edge))
+  precision = PRECISION
+  while precision > 1:
+    height, width = cell_size(precision)
+    if height * KM_PER_DEGREE >= radius_km and width * km_per_lon_degree >= radius_km:
+      break
+    precision -= 1
+  height, width = cell_size(precision)
+  cells = set()
+  for dy in (-1, 0, 1):
+    lat = min(90.0, max(-90.0, latitude + dy * height))
+    for dx in (-1, 0, 1):
+      lon = (longitude + dx * width + 180.0) % 360.0 - 180.0
+      cells.add(encode(lat, lon, precision))
+  return sorted(cells)
+
+#----------------------------------------------------------------------------#
+# Grid index.
+#----------------------------------------------------------------------------#
+
+# On PostgreSQL, prefix lookups are served by the ix_Venue_geohash btree
+# declared in models.py. On SQLite, venues are looked up in memory instead:
+# geohashes kept sorted, so each prefix is a contiguous slice found by
+# bisection.
+
+class GridIndex:
+
+  def __init__(self, rows):
+    # from (id, geohash) rows
+    self.entries = sorted((geohash, id) for id, geohash in rows if geohash is not None)
+
+  def search(self, prefixes):
+    # ids whose geohash starts with any of the prefixes
+    ids = []
+    for prefix in prefixes:
+      position = bisect_left(self.entries, (prefix,))
+      while position < len(self.entries) and self.entries[position][0].startswith(prefix):
+        ids.append(self.entries[position][1])
+        position += 1
+    return ids
+
+def build_index(model):
+  return GridIndex(db.session.query(model.id, model.geohash).filter(model.geohash.isnot(None)))
+
+# rebuilt after writes (see tableindex.py)
+indexes = TableIndexes(build_index)
+
+#----------------------------------------------------------------------------#
+# Coordinates.
+#----------------------------------------------------------------------------#
+
+def set_geohash(mapper, connection, target):
+  # a move without new coordinates leaves the old ones wrong, so they are
+  # cleared until the venue is geocoded again
+  state = db.inspect(target)
+  moved = state.attrs.city.history.has_changes() or state.attrs.state.history.has_changes()
+  located = state.attrs.latitude.history.has_changes() or state.attrs.longitude.history.has_changes()
+  if moved and not located and state.persistent:
+    target.latitude = target.longitude = None
+  if target.latitude is None or target.longitude is None:
+    target.geohash = None
+  else:
+    target.geohash = encode(target.latitude, target.longitude)
+
+db.event.listen(Venue, 'before_insert', set_geohash)
+db.event.listen(Venue, 'before_update', set_geohash)
+
+#----------------------------------------------------------------------------#
+# Lookup.
+#----------------------------------------------------------------------------#
+
+def within_cells(query, latitude, longitude, radius_km):
+  # restrict a venue query to the cells around a point; callers measure the
+  # remaining candidates to drop those outside the radius
+  cells = covering_cells(latitude, longitude, radius_km)
+  if db.engine.dialect.name == 'postgresql':
+    # prefix matches are answered from the text_pattern_ops index
+    return query.filter(db.or_(*(Venue.geohash.startswith(cell) for cell in cells)))
+  ids = indexes.get(Venue).search(cells)
+  if not ids:
+    return query.filter(db.false())
+  return query.filter(Venue.id.in_(ids))
+
+#----------------------------------------------------------------------------#
+# Geocoding.
+#----------------------------------------------------------------------------#
+
+# Venues are placed at their city's coordinates, read from a local gazetteer:
+# a CSV file with city, state, latitude and longitude columns (e.g. extracted
+# from the US Census Gazetteer or GeoNames). Nothing is sent over the network.
+
+def place_key(city, state):
+  return ' '.join((city or '').lower().split()), (state or '').strip().upper()
+
+def load_gazetteer(stream):
+  # {(city, state): (latitude, longitude)}
+  places = {}
+  for row in csv.DictReader(stream):
+    try:
+      places[place_key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+    except (KeyError, TypeError, ValueError):
+      continue
+  return places
+
+def geocode_venues(places, overwrite=False, chunk_size=1000):
+  # set the coordinates of venues found in places, chunk by chunk in id
+  # order, one transaction per chunk. yields {'geocoded': n, 'unmatched': n}
+  # per chunk.
+  table = Venue.__table__
+  statement = table.update() \
+    .where(table.c.id == db.bindparam('venue_id')) \
+    .values(
+      latitude=db.bindparam('lat'),
+      longitude=db.bindparam('lon'),
+      geohash=db.bindparam('cell'),
+      updated_at=db.bindparam('written_at')
+    )
+  last_id = 0
+  while True:
+    query = db.session.query(Venue.id, Venue.city, Venue.state).filter(Venue.id > last_id)
+    if not overwrite:
+      query = query.filter(Venue.geohash.is_(None))
+    venues = query.order_by(Venue.id).limit(chunk_size).all()
+    if not venues:
+      break
+    last_id = venues[-1].id
+    values = []
+    # in UTC, like the ORM's updated_at
+    now = datetime.utcnow()
+    for venue in venues:
+      place = places.get(place_key(venue.city, venue.state))
+      if place is not None:
+        values.append({'venue_id': venue.id, 'lat': place[0], 'lon': place[1], 'cell': encode(*place), 'written_at': now})
+    if values:
+      # one executemany per chunk
+      db.session.execute(statement, values)
+    db.session.commit()
+    yield {'geocoded': len(values), 'unmatched': len(venues) - len(values)}
+
+@click.command('geocode')
+@click.argument('gazetteer', type=click.File('r', encoding='utf-8'))
+@click.option('--overwrite', is_flag=True, help='Geocode venues that already have coordinates too.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Venues per transaction.')
+@with_appcontext
+def geocode_command(gazetteer, overwrite, chunk_size):
+  '''Set venue coordinates from a local CSV gazetteer of cities.'''
+  places = load_gazetteer(gazetteer)
+  click.echo(f'Loaded {len(places)} places.')
+  geocoded = unmatched = 0
+  for report in geocode_venues(places, overwrite, chunk_size):
+    geocoded += report['geocoded']
+    unmatched += report['unmatched']
+    click.echo(f'{geocoded} venues geocoded, {unmatched} not found in the gazetteer')
@@ -0,0 +1,212 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+from collections import Counter
+from itertools import islice
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from models import db, Venue, Artist, Show
+from counters import get_watermark, apply_deltas
+from schedule import check_show_conflicts
+
+#----------------------------------------------------------------------------#
+# Readers.
+#----------------------------------------------------------------------------#
+
+# Rows are streamed from CSV (with a header row) or NDJSON (one object per
+# line). In CSV, multi-valued fields such as genres are comma separated
+# within their cell.
+
+FORMATS = ('csv', 'ndjson')
+
+def guess_format(name):
+  # pick the format from a file name or content type
+  return 'ndjson' if name and ('ndjson' in name or 'json' in name) else 'csv'
+
+def read_rows(stream, format):
+  # yields (line number, row dict) from a text stream
+  if format == 'csv':
+    reader = csv.DictReader(stream)
+    for row in reader:
+      yield reader.line_num, row
+  elif format == 'ndjson':
+    for line_num, line in enumerate(stream, 1):
+      if line.strip():
+        try:
+          row = json.loads(line)
+        except ValueError:
+          row = None
+        yield line_num, row if isinstance(row, dict) else None
+  else:
+    raise ValueError(f'Unknown import format: {format}')
+
+def row_formdata(form_class, row):
+  # shape a raw row like a submitted form, so the form validators apply as is
+  formdata = MultiDict()
+  for key, value in row.items():
+    field = getattr(form_class, key, None)
+    if value is None or field is None:
+      continue
+    if isinstance(value, bool):
+      # unchecked checkboxes are simply absent from a submission
+      if value:
+        formdata.add(key, 'y')
+    elif isinstance(value, list):
+      for item in value:
+        formdata.add(key, str(item))
+    elif field.field_class.__name__ == 'SelectMultipleField':
+      for item in str(value).split(','):
+        if item.strip():
+          formdata.add(key, item.strip())
+    else:
+      formdata.add(key, str(value))
+  return formdata
+
+#----------------------------------------------------------------------------#
+# Importers.
+#----------------------------------------------------------------------------#
+
+def validate_row(form_class, row):
+  # returns (values, None) for a valid row or (None, errors)
+  if row is None:
+    return None, {'row': ['Not a valid JSON object.']}
+  form = form_class(formdata=row_formdata(form_class, row), meta={'csrf': False})
+  if not form.validate():
+    return None, form.errors
+  return form.data, None
+
+def check_show_references(values_by_line):
+  # shows may only point at existing venues and artists; look the whole chunk
+  # up at once rather than letting one bad id fail its insert
+  errors = {}
+  ids = {'venue_id': set(), 'artist_id': set()}
+  for line_num, values in values_by_line.items():
+    for key in ids:
+      try:
+        values[key] = int(values[key])
+        ids[key].add(values[key])
+      except ValueError:
+        errors.setdefault(line_num, {})[key] = ['Not a valid id.']
+  existing = {
+    'venue_id': {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(ids['venue_id']), Venue.deleted_at.is_(None))},
+    'artist_id': {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(ids['artist_id']), Artist.deleted_at.is_(None))},
+  }
+  for line_num, values in values_by_line.items():
+    for key in ids:
+      if line_num not in errors and values[key] not in existing[key]:
+        errors.setdefault(line_num, {})[key] = [f'No such {key[:-3]}.']
+  return errors
+
+def count_imported_shows(values):
+  # Core inserts bypass the session events that keep the counters current
+  rolled_over_at = get_watermark(db.session).rolled_over_at
+  venue_deltas = Counter()
+  artist_deltas = Counter()
+  for show in values:
+    if show['start_time'] > rolled_over_at:
+      venue_deltas[show['venue_id']] += 1
+      artist_deltas[show['artist_id']] += 1
+  apply_deltas(db.session, Venue, venue_deltas)
+  apply_deltas(db.session, Artist, artist_deltas)
+
+def insert_each(model, values_by_line):
+  # insert rows one at a time, each in its own SAVEPOINT, so that only the
+  # rows breaking a constraint are left out. returns (values, errors)
+  inserted = []
+  errors = {}
+  for line_num, values in values_by_line.items():
+    try:
+      with db.session.begin_nested():
+        db.session.execute(model.__table__.insert(), values)
+    except IntegrityError as e:
+      errors[line_num] = {'row': [f'Row could not be inserted: {e.orig.__class__.__name__}']}
+    else:
+      inserted.append(values)
+  return inserted, errors
+
+ENTITIES = {
+  'venues': (Venue, VenueForm),
+  'artists': (Artist, ArtistForm),
+  'shows': (Show, ShowForm),
+}
+
+def import_rows(entity, rows, chunk_size=1000):
+  # validate and insert rows chunk by chunk, one transaction per chunk.
+  # invalid rows, and rows the database rejects, are reported and skipped
+  # without aborting their chunk.
+  # yields a report per chunk: {'inserted': n, 'errors': [{'line', 'errors'}]}
+  model, form_class = ENTITIES[entity]
+  columns = set(model.__table__.columns.keys())
+  rows = iter(rows)
+  while True:
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+      break
+    values_by_line = {}
+    errors = {}
+    for line_num, row in chunk:
+      values, row_errors = validate_row(form_class, row)
+      if row_errors:
+        errors[line_num] = row_errors
+      else:
+        values_by_line[line_num] = {key: value for key, value in values.items() if key in columns}
+    if model is Show:
+      errors.update(check_show_references(values_by_line))
+      # checked against the schedule and the chunk's earlier rows at once
+      errors.update(check_show_conflicts({
+        line_num: values for line_num, values in values_by_line.items() if line_num not in errors
+      }))
+    valid = {line_num: values for line_num, values in values_by_line.items() if line_num not in errors}
+    values = list(valid.values())
+    try:
+      if values:
+        try:
+          # one executemany per chunk
+          db.session.execute(model.__table__.insert(), values)
+        except IntegrityError:
+          # a constraint the checks above cannot see, such as a unique index
+          # or a show written meanwhile: find the offending rows one by one
+          db.session.rollback()
+          values, row_errors = insert_each(model, valid)
+          errors.update(row_errors)
+        if model is Show:
+          count_imported_shows(values)
+      db.session.commit()
+    except Exception as e:
+      db.session.rollback()
+      errors.update({
+        line_num: {'row': [f'Chunk could not be inserted: {e.__class__.__name__}']}
+        for line_num in values_by_line if line_num not in errors
+      })
+      values = []
+    yield {
+      'inserted': len(values),
+      'errors': [{'line': line_num, 'errors': errors[line_num]} for line_num in sorted(errors)]
+    }
+
+#----------------------------------------------------------------------------#
+# Command.
+#----------------------------------------------------------------------------#
+
+@click.command('import')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('file', type=click.File('r', encoding='utf-8'))
+@click.option('--format', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def import_command(entity, file, format, chunk_size):
+  '''Bulk import venues, artists or shows from a CSV or NDJSON file.'''
+  rows = read_rows(file, format or guess_format(file.name))
+  inserted = failed = 0
+  for report in import_rows(entity, rows, chunk_size):
+    inserted += report['inserted']
+    failed += len(report['errors'])
+    for error in report['errors']:
+      click.echo(f'line {error["line"]}: {json.dumps(error["errors"])}', err=True)
+  click.echo(f'Imported {inserted} {entity}, {failed} rows rejected.')
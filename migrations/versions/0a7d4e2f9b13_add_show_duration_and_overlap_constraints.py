@@ -0,0 +1,34 @@
+"""add show duration and overlap constraints
+
+Revision ID: 0a7d4e2f9b13
+Revises: f3b6c9e0a1d8
+Create Date: 2026-10-18 23:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7d4e2f9b13'
+down_revision = 'f3b6c9e0a1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing shows are taken to last two hours. adding the constraints
+    # fails if they already overlap; such shows have to be moved first.
+    op.add_column('Show', sa.Column('duration', sa.Integer(), nullable=False, server_default='120'))
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for column in ('venue_id', 'artist_id'):
+        op.execute(
+            f'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{column}_time" EXCLUDE USING gist '
+            f"({column} WITH =, tsrange(start_time, start_time + duration * interval '1 minute') WITH &&)"
+        )
+
+
+def downgrade():
+    for column in ('artist_id', 'venue_id'):
+        op.execute(f'ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS "ex_Show_{column}_time"')
+    op.drop_column('Show', 'duration')
@@ -0,0 +1,29 @@
+"""add trigram name indexes
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the Venue/Artist/Show tables themselves are created by db.create_all();
+    # IF NOT EXISTS keeps this safe on databases that already built the
+    # indexes declared in models.py
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_name_trgm" ON "Venue" USING gin (name gin_trgm_ops)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Artist_name_trgm" ON "Artist" USING gin (name gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Artist_name_trgm"')
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_name_trgm"')
@@ -0,0 +1,28 @@
+"""add updated_at columns
+
+Revision ID: 5b0e8f3a9c62
+Revises: c7d92e41f0a3
+Create Date: 2026-10-18 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b0e8f3a9c62'
+down_revision = 'c7d92e41f0a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing rows are stamped with the migration time
+    for table in ('Venue', 'Artist', 'Show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text("timezone('utc', now())")))
+        op.alter_column(table, 'updated_at', server_default=None)
+
+
+def downgrade():
+    for table in ('Show', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
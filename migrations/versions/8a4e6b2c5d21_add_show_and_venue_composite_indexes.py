@@ -0,0 +1,27 @@
+"""add show and venue composite indexes
+
+Revision ID: 8a4e6b2c5d21
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 19:05:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6b2c5d21'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Show_venue_id_start_time" ON "Show" (venue_id, start_time)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Show_artist_id_start_time" ON "Show" (artist_id, start_time)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_state_city_name" ON "Venue" (state, city, name)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_state_city_name"')
+    op.execute('DROP INDEX IF EXISTS "ix_Show_artist_id_start_time"')
+    op.execute('DROP INDEX IF EXISTS "ix_Show_venue_id_start_time"')
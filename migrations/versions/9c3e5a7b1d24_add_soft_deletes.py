@@ -0,0 +1,38 @@
+"""add soft deletes
+
+Revision ID: 9c3e5a7b1d24
+Revises: 0a7d4e2f9b13
+Create Date: 2026-10-19 01:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e5a7b1d24'
+down_revision = '0a7d4e2f9b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.add_column('Artist', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_table('Deletion',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('requested_at', sa.DateTime(), nullable=False),
+        sa.Column('shows_total', sa.Integer(), nullable=True),
+        sa.Column('shows_deleted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('entity', 'entity_id')
+    )
+
+
+def downgrade():
+    op.drop_table('Deletion')
+    op.drop_column('Artist', 'deleted_at')
+    op.drop_column('Venue', 'deleted_at')
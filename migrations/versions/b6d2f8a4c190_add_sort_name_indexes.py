@@ -0,0 +1,26 @@
+"""add sort name indexes
+
+Revision ID: b6d2f8a4c190
+Revises: 9c3e5a7b1d24
+Create Date: 2026-10-19 02:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2f8a4c190'
+down_revision = '9c3e5a7b1d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the keyset order of the venue and artist listings
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_sort_name_id" ON "Venue" (coalesce(name, \'\'), id)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Artist_sort_name_id" ON "Artist" (coalesce(name, \'\'), id)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Artist_sort_name_id"')
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_sort_name_id"')
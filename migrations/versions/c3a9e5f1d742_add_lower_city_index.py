@@ -0,0 +1,23 @@
+"""add lower city index
+
+Revision ID: c3a9e5f1d742
+Revises: b6d2f8a4c190
+Create Date: 2026-10-19 03:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9e5f1d742'
+down_revision = 'b6d2f8a4c190'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_lower_city" ON "Venue" (lower(city))')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_lower_city"')
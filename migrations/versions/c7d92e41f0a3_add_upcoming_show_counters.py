@@ -0,0 +1,42 @@
+"""add upcoming show counters
+
+Revision ID: c7d92e41f0a3
+Revises: 8a4e6b2c5d21
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d92e41f0a3'
+down_revision = '8a4e6b2c5d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('UpcomingShowsWatermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    # backfill the counters as of now, which becomes the first watermark
+    op.execute('INSERT INTO "UpcomingShowsWatermark" (id, rolled_over_at) VALUES (1, LOCALTIMESTAMP)')
+    op.execute(
+        'UPDATE "Venue" SET upcoming_shows_count = ('
+        'SELECT COUNT(*) FROM "Show" WHERE "Show".venue_id = "Venue".id AND "Show".start_time > LOCALTIMESTAMP)'
+    )
+    op.execute(
+        'UPDATE "Artist" SET upcoming_shows_count = ('
+        'SELECT COUNT(*) FROM "Show" WHERE "Show".artist_id = "Artist".id AND "Show".start_time > LOCALTIMESTAMP)'
+    )
+
+
+def downgrade():
+    op.drop_table('UpcomingShowsWatermark')
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
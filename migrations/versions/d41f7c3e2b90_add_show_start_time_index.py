@@ -0,0 +1,23 @@
+"""add show start_time index
+
+Revision ID: d41f7c3e2b90
+Revises: 5b0e8f3a9c62
+Create Date: 2026-10-18 21:40:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7c3e2b90'
+down_revision = '5b0e8f3a9c62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Show_start_time_id" ON "Show" (start_time, id)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Show_start_time_id"')
@@ -0,0 +1,31 @@
+"""add venue coordinates
+
+Revision ID: e52a8d1f6c47
+Revises: d41f7c3e2b90
+Create Date: 2026-10-18 22:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e52a8d1f6c47'
+down_revision = 'd41f7c3e2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in afterwards by `flask geocode`
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_Venue_geohash', 'Venue', ['geohash'], postgresql_ops={'geohash': 'text_pattern_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_Venue_geohash', table_name='Venue')
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
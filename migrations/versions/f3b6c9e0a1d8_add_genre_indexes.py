@@ -0,0 +1,26 @@
+"""add genre indexes
+
+Revision ID: f3b6c9e0a1d8
+Revises: e52a8d1f6c47
+Create Date: 2026-10-18 23:10:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b6c9e0a1d8'
+down_revision = 'e52a8d1f6c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the default array_ops class answers both && and @>
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_genres" ON "Venue" USING gin (genres)')
+    op.execute('CREATE INDEX IF NOT EXISTS "ix_Artist_genres" ON "Artist" USING gin (genres)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Artist_genres"')
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_genres"')
@@ -2,32 +2,55 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask import Flask
+from datetime import datetime
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from replicas import RoutingSQLAlchemy
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
-
-migrate = Migrate(app, db)
+# bound to the app in create_app() (app.py)
+moment = Moment()
+db = RoutingSQLAlchemy()
+migrate = Migrate()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+# name searches rely on trigram indexes, which need the pg_trgm extension
+db.event.listen(
+    db.metadata,
+    'before_create',
+    db.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+# and the show exclusion constraints on btree_gist
+db.event.listen(
+    db.metadata,
+    'before_create',
+    db.DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
+
+# PostgreSQL arrays; SQLite stores the list as JSON text instead
+GENRES = db.ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # /venues groups by location and orders venues by name
+        db.Index('ix_Venue_state_city_name', 'state', 'city', 'name'),
+        # nearby venue lookups match geohash prefixes (see geo.py)
+        db.Index('ix_Venue_geohash', 'geohash', postgresql_ops={'geohash': 'text_pattern_ops'}),
+        # genre filters test overlap (&&) and containment (@>) (see facets.py)
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(GENRES)
     address = db.Column(db.String(120))
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
@@ -37,16 +60,37 @@ class Venue(db.Model):
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='venue', passive_deletes='all', lazy=True)
+    # set by `flask geocode`; geohash is derived from them by geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+    # shows starting after the rollover watermark, kept up to date by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # last write to the row, in UTC; drives conditional GETs in the API
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # set when the venue is deleted; it is hidden from then on, and removed
+    # with its shows by the reaper (reaper.py)
+    deleted_at = db.Column(db.DateTime)
+    shows = db.relationship('Show', back_populates='venue', passive_deletes='all', lazy=True)
 
     # added fields based on test data
 
+# keyset pages of venues and artists seek on their name, a NULL name as ''
+# (see queries.py), then id
+db.Index('ix_Venue_sort_name_id', db.func.coalesce(Venue.name, db.literal_column("''")), Venue.id)
+# the shows calendar matches cities case-insensitively
+db.Index('ix_Venue_lower_city', db.func.lower(Venue.city))
+
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(GENRES)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -55,16 +99,79 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
     image_link = db.Column(db.String(500))
-    shows = db.relationship('Show', backref='artist', passive_deletes='all', lazy=True)
+    # shows starting after the rollover watermark, kept up to date by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # last write to the row, in UTC; drives conditional GETs in the API
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # set when the artist is deleted; it is hidden from then on, and removed
+    # with its shows by the reaper (reaper.py)
+    deleted_at = db.Column(db.DateTime)
+    shows = db.relationship('Show', back_populates='artist', passive_deletes='all', lazy=True)
 
     # added fields based on test data
 
+db.Index('ix_Artist_sort_name_id', db.func.coalesce(Artist.name, db.literal_column("''")), Artist.id)
+
+# show lengths in minutes
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        # shows are listed per venue/artist and split on start_time
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # date range scans of the calendar and the /shows ordering; btree
+        # rather than BRIN, as shows are not inserted in start_time order
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    # in minutes; a venue or artist can't have overlapping shows (see below)
+    duration = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_MINUTES, server_default=str(DEFAULT_SHOW_MINUTES))
+    # last write to the row, in UTC; drives conditional GETs in the API
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # lazy by default; views needing them pick a loader option per query
+    venue = db.relationship('Venue', back_populates='shows', lazy=True)
+    artist = db.relationship('Artist', back_populates='shows', lazy=True)
+
+    # added fields based on test data
+
+# no two shows of a venue, or of an artist, may overlap in time
+for column in ('venue_id', 'artist_id'):
+    db.event.listen(
+        Show.__table__,
+        'after_create',
+        db.DDL(
+            f'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{column}_time" EXCLUDE USING gist '
+            f"({column} WITH =, tsrange(start_time, start_time + duration * interval '1 minute') WITH &&)"
+        ).execute_if(dialect='postgresql')
+    )
 
-    # added fields based on test data
\ No newline at end of file
+class UpcomingShowsWatermark(db.Model):
+    __tablename__ = 'UpcomingShowsWatermark'
+
+    # single row recording up to when started shows were rolled out of the
+    # venue/artist upcoming_shows_count counters
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+class Deletion(db.Model):
+    __tablename__ = 'Deletion'
+    __table_args__ = (
+        db.UniqueConstraint('entity', 'entity_id'),
+    )
+
+    # a deleted venue or artist whose shows the reaper is removing
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    requested_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # counted by the reaper when it starts on the deletion
+    shows_total = db.Column(db.Integer)
+    shows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    finished_at = db.Column(db.DateTime)
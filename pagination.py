@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from datetime import datetime
+from models import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+# Listings are paged by seeking past the sort key of the last row shown
+# instead of using OFFSET, so every page costs the same regardless of depth.
+# Cursors are opaque to clients: a direction plus the boundary row's keys.
+
+DEFAULT_LIMIT = 30
+MAX_LIMIT = 100
+
+def parse_limit(value):
+  # clamp ?limit= to a sane page size, defaulting on anything unparsable
+  try:
+    limit = int(value)
+  except (TypeError, ValueError):
+    return DEFAULT_LIMIT
+  return max(1, min(limit, MAX_LIMIT))
+
+def encode_cursor(direction, values):
+  payload = json.dumps([direction] + [
+    value.isoformat() if isinstance(value, datetime) else value
+    for value in values
+  ])
+  return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor, keys):
+  # returns (direction, values), or None if the cursor is malformed
+  try:
+    direction, *values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if direction not in ('next', 'prev') or len(values) != len(keys):
+      return None
+    decoded = []
+    for key, value in zip(keys, values):
+      python_type = key.type.python_type
+      if python_type is datetime:
+        decoded.append(datetime.fromisoformat(value))
+      else:
+        decoded.append(python_type(value))
+    return direction, decoded
+  except (ValueError, TypeError):
+    return None
+
+def paginate(query, keys, cursor=None, limit=DEFAULT_LIMIT, descending=False):
+  # keys are the columns the listing is ordered by and must end with a
+  # unique column so that every row has a distinct position.
+  # returns (rows, next_cursor, prev_cursor)
+  decoded = decode_cursor(cursor, keys) if cursor else None
+  direction, values = decoded or ('next', None)
+  backwards = direction == 'prev'
+  # walking back towards earlier pages scans the sort order in reverse
+  reverse = descending != backwards
+
+  if values is not None:
+    position = db.tuple_(*keys)
+    boundary = db.tuple_(*values)
+    query = query.filter(position < boundary if reverse else position > boundary)
+  order = [key.desc() if reverse else key.asc() for key in keys]
+  # fetch one extra row to learn whether another page follows
+  rows = query.order_by(*order).limit(limit + 1).all()
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+  if backwards:
+    rows.reverse()
+
+  def row_keys(row):
+    return [getattr(row, key.key) for key in keys]
+
+  # walking forward, later rows exist if the extra row came back and earlier
+  # ones exist if we started from a cursor; walking back it is the reverse
+  if backwards:
+    has_next, has_prev = values is not None, has_more
+  else:
+    has_next, has_prev = has_more, values is not None
+  next_cursor = prev_cursor = None
+  if rows and has_next:
+    next_cursor = encode_cursor('next', row_keys(rows[-1]))
+  if rows and has_prev:
+    prev_cursor = encode_cursor('prev', row_keys(rows[0]))
+  return rows, next_cursor, prev_cursor
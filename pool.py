@@ -0,0 +1,185 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+from threading import Lock
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, NullPool
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+# Every worker process has its own pools, and each pool (the primary's and
+# each replica's) its own figures. Checkout waits include opening a
+# connection when the pool has none idle.
+
+class PoolMetrics:
+
+  def __init__(self):
+    self.lock = Lock()
+    self.reset()
+
+  def reset(self):
+    with self.lock:
+      self.checkouts = 0
+      self.checked_out = 0
+      self.max_checked_out = 0
+      self.connects = 0
+      self.timeouts = 0
+      self.wait_seconds = 0.0
+      self.max_wait_seconds = 0.0
+
+  def listen(self, pool):
+    event.listen(pool, 'connect', lambda dbapi_connection, record: self.record_connect())
+    event.listen(pool, 'checkout', lambda dbapi_connection, record, proxy: self.record_checkout())
+    event.listen(pool, 'checkin', lambda dbapi_connection, record: self.record_checkin())
+
+  def record_wait(self, seconds, timed_out=False):
+    with self.lock:
+      self.wait_seconds += seconds
+      self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+      if timed_out:
+        self.timeouts += 1
+
+  def record_checkout(self):
+    with self.lock:
+      self.checkouts += 1
+      self.checked_out += 1
+      self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+  def record_checkin(self):
+    with self.lock:
+      self.checked_out -= 1
+
+  def record_connect(self):
+    with self.lock:
+      self.connects += 1
+
+  def snapshot(self, pool=None):
+    # the counters plus, for a QueuePool, its configured size and overflow
+    with self.lock:
+      data = {
+        'checkouts': self.checkouts,
+        'checked_out': self.checked_out,
+        'max_checked_out': self.max_checked_out,
+        'connects': self.connects,
+        'timeouts': self.timeouts,
+        'wait_seconds': self.wait_seconds,
+        'max_wait_seconds': self.max_wait_seconds,
+      }
+    if isinstance(pool, QueuePool):
+      data['size'] = pool.size()
+      data['idle'] = pool.checkedin()
+      # negative while the pool is not yet full
+      data['overflow'] = max(pool.overflow(), 0)
+    return data
+
+class MeteredPool:
+  # records into its own PoolMetrics, and times how long each checkout
+  # waits for a connection
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    if kwargs.get('_dispatch') is None:
+      self.metrics = PoolMetrics()
+      self.metrics.listen(self)
+
+  def recreate(self):
+    # dispose() replaces the pool, handing its listeners to the new one;
+    # the figures they record into carry over with them
+    pool = super().recreate()
+    pool.metrics = self.metrics
+    return pool
+
+  def _do_get(self):
+    start = time.perf_counter()
+    try:
+      connection = super()._do_get()
+    except exc.TimeoutError:
+      self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+      raise
+    self.metrics.record_wait(time.perf_counter() - start)
+    return connection
+
+class MeteredQueuePool(MeteredPool, QueuePool):
+  pass
+
+class MeteredNullPool(MeteredPool, NullPool):
+  pass
+
+PROMETHEUS_METRICS = (
+  ('checkouts', 'fyyur_db_pool_checkouts_total', 'counter'),
+  ('checked_out', 'fyyur_db_pool_checked_out', 'gauge'),
+  ('max_checked_out', 'fyyur_db_pool_max_checked_out', 'gauge'),
+  ('connects', 'fyyur_db_pool_connects_total', 'counter'),
+  ('timeouts', 'fyyur_db_pool_timeouts_total', 'counter'),
+  ('wait_seconds', 'fyyur_db_pool_wait_seconds_total', 'counter'),
+  ('max_wait_seconds', 'fyyur_db_pool_max_wait_seconds', 'gauge'),
+  ('size', 'fyyur_db_pool_size', 'gauge'),
+  ('idle', 'fyyur_db_pool_idle', 'gauge'),
+  ('overflow', 'fyyur_db_pool_overflow', 'gauge'),
+)
+
+def prometheus_lines(pools):
+  # the figures of (label, pool) pairs in the Prometheus text exposition
+  # format, one series per pool labelled engine="<label>". pools that are
+  # not metered (e.g. SQLite's) are left out.
+  snapshots = [(label, pool.metrics.snapshot(pool)) for label, pool in pools if hasattr(pool, 'metrics')]
+  lines = []
+  for key, name, kind in PROMETHEUS_METRICS:
+    values = [(label, data[key]) for label, data in snapshots if key in data]
+    if values:
+      lines.append(f'# TYPE {name} {kind}')
+      lines.extend(f'{name}{{engine="{label}"}} {value}' for label, value in values)
+  return lines
+
+#----------------------------------------------------------------------------#
+# Engine options.
+#----------------------------------------------------------------------------#
+
+# The DB_POOL_* settings in config.py read environment variables, so each
+# deployment sizes its own pool. With DB_PGBOUNCER the app connects through
+# PgBouncer in transaction pooling mode: PgBouncer does the pooling, so
+# connections are not kept open here (NullPool), and settings that would be
+# session state are applied per transaction instead.
+
+def engine_options(config):
+  # SQLALCHEMY_ENGINE_OPTIONS for the configured database
+  uri = config['SQLALCHEMY_DATABASE_URI']
+  if not uri.startswith('postgres'):
+    # SQLite runs in process and has no pool worth sizing
+    return {}
+  if config.get('DB_PGBOUNCER'):
+    # psycopg2 never prepares statements server side, so queries need no
+    # changes to run through PgBouncer
+    return {'poolclass': MeteredNullPool}
+  options = {
+    'poolclass': MeteredQueuePool,
+    'pool_size': config.get('DB_POOL_SIZE', 5),
+    'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+    'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+    'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+    'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+  }
+  timeout = config.get('DB_STATEMENT_TIMEOUT')
+  if timeout:
+    options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+  return options
+
+def init_app(app, db):
+  # call after db.init_app(app); config that sets SQLALCHEMY_ENGINE_OPTIONS
+  # itself takes precedence
+  if not app.config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+  timeout = app.config.get('DB_STATEMENT_TIMEOUT')
+  if app.config.get('DB_PGBOUNCER') and timeout:
+    # PgBouncer rejects startup options and session-level SETs would leak to
+    # other clients, so each transaction sets its own timeout
+    with app.app_context():
+      engine = db.engine
+
+    @event.listens_for(engine, 'begin')
+    def set_statement_timeout(connection):
+      connection.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
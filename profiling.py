@@ -0,0 +1,161 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import json
+import time
+from collections import Counter, defaultdict
+from threading import Lock
+from flask import g, has_app_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Request profiling.
+#----------------------------------------------------------------------------#
+
+# Every request records its queries (count, time, statements run more than
+# once with the same parameters) and its template rendering time. The totals
+# go out as a Server-Timing header and one JSON log line per request, and
+# are summed per endpoint for /metrics.
+
+class RequestStats:
+
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.queries = 0
+    self.db_seconds = 0.0
+    self.render_seconds = 0.0
+    self.statements = Counter()
+
+  def duplicates(self):
+    # statements beyond the first run of each identical query
+    return sum(count - 1 for count in self.statements.values() if count > 1)
+
+  def most_repeated(self):
+    if not self.statements:
+      return None
+    (statement, parameters), count = self.statements.most_common(1)[0]
+    return statement if count > 1 else None
+
+def current_stats():
+  if has_app_context():
+    return g.get('request_stats')
+  return None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def end_query(conn, cursor, statement, parameters, context, executemany):
+  elapsed = time.perf_counter() - conn.info['query_started'].pop()
+  stats = current_stats()
+  if stats is not None:
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    stats.statements[statement, repr(parameters)] += 1
+
+class TimedTemplate(Template):
+  # includes and parent templates render inside the top-level render call
+
+  def render(self, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+      return super().render(*args, **kwargs)
+    finally:
+      stats = current_stats()
+      if stats is not None:
+        stats.render_seconds += time.perf_counter() - started
+
+#----------------------------------------------------------------------------#
+# Metrics.
+#----------------------------------------------------------------------------#
+
+class EndpointMetrics:
+  # per worker process totals for each endpoint
+
+  def __init__(self):
+    self.lock = Lock()
+    self.totals = defaultdict(Counter)
+
+  def record(self, endpoint, stats, seconds):
+    with self.lock:
+      totals = self.totals[endpoint]
+      totals['requests'] += 1
+      totals['request_seconds'] += seconds
+      totals['queries'] += stats.queries
+      totals['db_seconds'] += stats.db_seconds
+      totals['duplicate_queries'] += stats.duplicates()
+      totals['render_seconds'] += stats.render_seconds
+
+  def reset(self):
+    with self.lock:
+      self.totals.clear()
+
+metrics = EndpointMetrics()
+
+PROMETHEUS_METRICS = (
+  ('requests', 'fyyur_requests_total'),
+  ('request_seconds', 'fyyur_request_seconds_total'),
+  ('queries', 'fyyur_db_queries_total'),
+  ('db_seconds', 'fyyur_db_seconds_total'),
+  ('duplicate_queries', 'fyyur_db_duplicate_queries_total'),
+  ('render_seconds', 'fyyur_render_seconds_total'),
+)
+
+def prometheus_lines():
+  with metrics.lock:
+    totals = {endpoint: dict(values) for endpoint, values in metrics.totals.items()}
+  lines = []
+  for key, name in PROMETHEUS_METRICS:
+    lines.append(f'# TYPE {name} counter')
+    for endpoint in sorted(totals):
+      lines.append(f'{name}{{endpoint="{endpoint}"}} {totals[endpoint].get(key, 0)}')
+  return lines
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+
+def server_timing(stats, seconds):
+  return ', '.join((
+    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+    f'render;dur={stats.render_seconds * 1000:.1f}',
+    f'app;dur={seconds * 1000:.1f}',
+  ))
+
+def init_app(app):
+  if not app.config.get('REQUEST_PROFILING', True):
+    return
+  app.jinja_env.template_class = TimedTemplate
+  # goes wherever the app logs, e.g. error.log outside debug mode
+  logger = app.logger.getChild('requests')
+
+  @app.before_request
+  def start_request():
+    g.request_stats = RequestStats()
+
+  @app.after_request
+  def report_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+      return response
+    seconds = time.perf_counter() - stats.started
+    endpoint = request.endpoint or 'none'
+    metrics.record(endpoint, stats, seconds)
+    response.headers['Server-Timing'] = server_timing(stats, seconds)
+    logger.info(json.dumps({
+      'method': request.method,
+      'path': request.path,
+      'endpoint': endpoint,
+      'status': response.status_code,
+      'duration_ms': round(seconds * 1000, 1),
+      'queries': stats.queries,
+      'db_ms': round(stats.db_seconds * 1000, 1),
+      'duplicate_queries': stats.duplicates(),
+      'most_repeated': stats.most_repeated(),
+      'render_ms': round(stats.render_seconds * 1000, 1),
+    }))
+    return response
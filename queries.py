@@ -0,0 +1,360 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from flask import current_app
+from models import db, Venue, Artist, Show
+from search import match_names
+from geo import within_cells, distance_km
+from facets import filter_genres, genre_facets
+from pagination import paginate
+
+#----------------------------------------------------------------------------#
+# Fields.
+#----------------------------------------------------------------------------#
+
+# The data builders below are shared by the HTML pages and the JSON API. Each
+# takes the names of the fields to return and selects only the matching
+# columns, so narrower requests read less from the database.
+
+VENUE_FIELDS = {
+  'id': Venue.id,
+  'name': Venue.name,
+  'genres': Venue.genres,
+  'address': Venue.address,
+  'city': Venue.city,
+  'state': Venue.state,
+  'phone': Venue.phone,
+  'website': Venue.website,
+  'facebook_link': Venue.facebook_link,
+  'seeking_talent': Venue.seeking_talent,
+  'seeking_description': Venue.seeking_description,
+  'image_link': Venue.image_link,
+  'latitude': Venue.latitude,
+  'longitude': Venue.longitude,
+  'num_upcoming_shows': Venue.upcoming_shows_count,
+}
+
+ARTIST_FIELDS = {
+  'id': Artist.id,
+  'name': Artist.name,
+  'genres': Artist.genres,
+  'city': Artist.city,
+  'state': Artist.state,
+  'phone': Artist.phone,
+  'website': Artist.website,
+  'facebook_link': Artist.facebook_link,
+  'seeking_venue': Artist.seeking_venue,
+  'seeking_description': Artist.seeking_description,
+  'image_link': Artist.image_link,
+  'num_upcoming_shows': Artist.upcoming_shows_count,
+}
+
+SHOW_FIELDS = {
+  'id': Show.id,
+  'venue_id': Show.venue_id,
+  'venue_name': Venue.name,
+  'venue_image_link': Venue.image_link,
+  'artist_id': Show.artist_id,
+  'artist_name': Artist.name,
+  'artist_image_link': Artist.image_link,
+  'start_time': Show.start_time,
+  'duration': Show.duration,
+  'updated_at': Show.updated_at,
+  'venue_updated_at': Venue.updated_at,
+  'artist_updated_at': Artist.updated_at,
+}
+
+# detail pages list the entity's shows besides its own columns
+SHOW_LIST_FIELDS = ('past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count')
+
+def detail_fields(fields):
+  # detail pages report exact show counts instead of the counter
+  return tuple(name for name in fields if name != 'num_upcoming_shows') + SHOW_LIST_FIELDS
+
+VENUE_DETAIL_FIELDS = detail_fields(VENUE_FIELDS)
+ARTIST_DETAIL_FIELDS = detail_fields(ARTIST_FIELDS)
+
+def select_fields(available, names):
+  # returns {name: column} for the requested names, in the order given
+  unknown = [name for name in names if name not in available]
+  if unknown:
+    raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+  return {name: available[name] for name in names}
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+def entity_shows(show_fk, entity_id, related, upcoming, limit=None, loading='contains_eager'):
+  # load a venue's or artist's upcoming (soonest first) or past (latest
+  # first) shows together with the related artist/venue, so rendering them
+  # takes a bounded number of queries:
+  #   'contains_eager' fills the relationship from a join in the same query
+  #   'selectin' loads all related rows in one extra IN query
+  # the join leaves out shows of a deleted artist/venue until they are reaped
+  query = Show.query.join(related) \
+    .filter(show_fk == entity_id, related.property.mapper.class_.deleted_at.is_(None))
+  if upcoming:
+    query = query.filter(Show.start_time >= datetime.now()).order_by(Show.start_time, Show.id)
+  else:
+    query = query.filter(Show.start_time < datetime.now()).order_by(Show.start_time.desc(), Show.id.desc())
+  if loading == 'contains_eager':
+    query = query.options(db.contains_eager(related))
+  elif loading == 'selectin':
+    query = query.options(db.selectinload(related))
+  else:
+    raise ValueError(f'Unknown loading strategy: {loading}')
+  if limit is not None:
+    query = query.limit(limit)
+  return query.all()
+
+def entity_show_counts(show_fk, entity_id, related):
+  # count a venue's or artist's past and upcoming shows in one query
+  now = datetime.now()
+  related = related.property.mapper.class_
+  return db.session.query(
+      db.func.count(Show.id).filter(Show.start_time < now),
+      db.func.count(Show.id).filter(Show.start_time >= now)
+    ).join(related).filter(show_fk == entity_id, related.deleted_at.is_(None)).one()
+
+#----------------------------------------------------------------------------#
+# Details.
+#----------------------------------------------------------------------------#
+
+def entity_detail(model, entity_id, fields):
+  # build the data of a venue or artist page, or None if there is no such
+  # entity. shows are only queried when a show field is requested.
+  if model is Venue:
+    available, show_fk, related, other = VENUE_DETAIL_FIELDS, Show.venue_id, Show.artist, 'artist'
+  else:
+    available, show_fk, related, other = ARTIST_DETAIL_FIELDS, Show.artist_id, Show.venue, 'venue'
+  unknown = [name for name in fields if name not in available]
+  if unknown:
+    raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+
+  columns = [getattr(model, name).label(name) for name in fields if name not in SHOW_LIST_FIELDS]
+  entity = db.session.query(model.id, *columns).filter(model.id == entity_id, model.deleted_at.is_(None)).first()
+  if entity is None:
+    return None
+  data = {name: getattr(entity, name) for name in fields if name not in SHOW_LIST_FIELDS}
+  if not any(name in SHOW_LIST_FIELDS for name in fields):
+    return data
+
+  past_limit = current_app.config.get('PAST_SHOWS_LIMIT')
+  upcoming_limit = current_app.config.get('UPCOMING_SHOWS_LIMIT')
+  loading = current_app.config.get('SHOW_LOADING', 'contains_eager')
+  past_shows = []
+  upcoming_shows = []
+
+  for shows, upcoming, limit in ((past_shows, False, past_limit), (upcoming_shows, True, upcoming_limit)):
+    for show in entity_shows(show_fk, entity_id, related, upcoming=upcoming, limit=limit, loading=loading):
+      shows.append({
+        'id': show.id,
+        f'{other}_id': getattr(show, f'{other}_id'),
+        f'{other}_name': getattr(show, other).name,
+        f'{other}_image_link': getattr(show, other).image_link,
+        'start_time': show.start_time,
+        # latest change to anything the show's tile displays
+        'updated_at': max(show.updated_at, getattr(show, other).updated_at)
+      })
+
+  # lists cut short by a limit need their totals counted separately
+  past_shows_count, upcoming_shows_count = len(past_shows), len(upcoming_shows)
+  if len(past_shows) == past_limit or len(upcoming_shows) == upcoming_limit:
+    past_shows_count, upcoming_shows_count = entity_show_counts(show_fk, entity_id, related)
+
+  shows = {
+    'past_shows': past_shows,
+    'upcoming_shows': upcoming_shows,
+    'past_shows_count': past_shows_count,
+    'upcoming_shows_count': upcoming_shows_count,
+  }
+  data.update((name, shows[name]) for name in fields if name in shows)
+  return data
+
+def venue_detail(venue_id, fields=VENUE_DETAIL_FIELDS):
+  return entity_detail(Venue, venue_id, fields)
+
+def artist_detail(artist_id, fields=ARTIST_DETAIL_FIELDS):
+  return entity_detail(Artist, artist_id, fields)
+
+def show_detail(show_id, fields=tuple(SHOW_FIELDS)):
+  # a single show with its venue and artist, or None
+  columns = [column.label(name) for name, column in select_fields(SHOW_FIELDS, fields).items()]
+  show = db.session.query(Show.id, *columns) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .filter(Show.id == show_id, Venue.deleted_at.is_(None), Artist.deleted_at.is_(None)) \
+    .first()
+  if show is None:
+    return None
+  return {name: getattr(show, name) for name in fields}
+
+#----------------------------------------------------------------------------#
+# Listings.
+#----------------------------------------------------------------------------#
+
+def venue_areas(genres=(), match='any'):
+  data = []
+  # retrieve every venue (of the genres, if any) with its upcoming show
+  # counter in one query, ordered by location so areas can be built in a
+  # single pass
+  venues = db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.upcoming_shows_count,
+      Venue.updated_at
+    )
+  venues = filter_genres(venues.filter(Venue.deleted_at.is_(None)), Venue, genres, match) \
+    .order_by(Venue.state, Venue.city, Venue.name) \
+    .all()
+  for venue in venues:
+    # start a new location json object whenever the city/state changes
+    if not data or data[-1]['state'] != venue.state or data[-1]['city'] != venue.city:
+      data.append({
+        'city': venue.city,
+        'state': venue.state,
+        'venues': []
+      })
+    data[-1]['venues'].append({
+      'id': venue.id,
+      'name': venue.name,
+      'num_upcoming_shows': venue.upcoming_shows_count,
+      'updated_at': venue.updated_at
+    })
+  return data
+
+def select_page(fields, keys, cursor, limit, descending=False, joins=(), refine=None):
+  # fetch one keyset page of the given {name: column} fields, optionally
+  # narrowed by refine(query). returns (data, next_cursor, prev_cursor)
+  key_names = {key.key for key in keys}
+  columns = list(keys) + [column.label(name) for name, column in fields.items() if name not in key_names]
+  query = db.session.query(*columns)
+  for target, onclause in joins:
+    query = query.join(target, onclause)
+  if refine is not None:
+    query = refine(query)
+  rows, next_cursor, prev_cursor = paginate(query, keys, cursor, limit, descending)
+  data = [{name: getattr(row, name) for name in fields} for row in rows]
+  return data, next_cursor, prev_cursor
+
+# the sort keys of each listing, which its cursors carry. names may be NULL,
+# which no row comparison matches, so they are sorted and sought as ''. the
+# '' is inlined rather than bound so the ix_*_sort_name_id indexes match
+VENUE_PAGE_KEYS = [db.func.coalesce(Venue.name, db.literal_column("''")).label('sort_name'), Venue.id]
+ARTIST_PAGE_KEYS = [db.func.coalesce(Artist.name, db.literal_column("''")).label('sort_name'), Artist.id]
+SHOW_PAGE_KEYS = [Show.start_time, Show.id]
+
+def venue_page(cursor, limit, fields=tuple(VENUE_FIELDS), genres=(), match='any'):
+  # venues (of the genres, if any) in name order
+  return select_page(select_fields(VENUE_FIELDS, fields), VENUE_PAGE_KEYS, cursor, limit,
+    refine=lambda query: filter_genres(query.filter(Venue.deleted_at.is_(None)), Venue, genres, match))
+
+def artist_page(cursor, limit, fields=('id', 'name'), genres=(), match='any'):
+  # artists (of the genres, if any) in name order
+  return select_page(select_fields(ARTIST_FIELDS, fields), ARTIST_PAGE_KEYS, cursor, limit,
+    refine=lambda query: filter_genres(query.filter(Artist.deleted_at.is_(None)), Artist, genres, match))
+
+def show_page(cursor, limit, fields=('id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time',
+    'updated_at', 'venue_updated_at', 'artist_updated_at')):
+  # shows with their venue and artist, latest first
+  return select_page(
+    select_fields(SHOW_FIELDS, fields),
+    SHOW_PAGE_KEYS,
+    cursor,
+    limit,
+    descending=True,
+    joins=[(Artist, Artist.id == Show.artist_id), (Venue, Venue.id == Show.venue_id)],
+    refine=lambda query: query.filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+  )
+
+#----------------------------------------------------------------------------#
+# Nearby venues.
+#----------------------------------------------------------------------------#
+
+def nearby_venues(latitude, longitude, radius_km, limit, fields=('id', 'name', 'city', 'state', 'num_upcoming_shows')):
+  # venues within radius_km of a point, nearest first, each with its
+  # distance_km. only venues in the grid cells around the point are read.
+  selected = select_fields(VENUE_FIELDS, fields)
+  keys = [Venue.id, Venue.latitude, Venue.longitude]
+  key_names = {key.key for key in keys}
+  columns = keys + [column.label(name) for name, column in selected.items() if name not in key_names]
+  query = db.session.query(*columns).filter(Venue.deleted_at.is_(None))
+  candidates = within_cells(query, latitude, longitude, radius_km).all()
+  nearby = []
+  for venue in candidates:
+    distance = distance_km(latitude, longitude, venue.latitude, venue.longitude)
+    if distance <= radius_km:
+      nearby.append((distance, venue.id, venue))
+  nearby.sort(key=lambda item: item[:2])
+  data = []
+  for distance, id, venue in nearby[:limit]:
+    item = {name: getattr(venue, name) for name in fields}
+    item['distance_km'] = round(distance, 3)
+    data.append(item)
+  return data
+
+#----------------------------------------------------------------------------#
+# Calendar.
+#----------------------------------------------------------------------------#
+
+CALENDAR_FIELDS = ('id', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time',
+  'updated_at', 'venue_updated_at', 'artist_updated_at')
+
+def show_calendar(start, end, city=None, state=None, genre=None, limit=500):
+  # shows starting in [start, end), optionally at venues in a city/state or
+  # by artists of a genre, grouped by day in start order. the range is read
+  # from ix_Show_start_time_id, or, for a location, per venue from
+  # ix_Show_venue_id_start_time. returns (days, truncated)
+  fields = select_fields(SHOW_FIELDS, CALENDAR_FIELDS)
+  query = db.session.query(*(column.label(name) for name, column in fields.items())) \
+    .join(Artist, Artist.id == Show.artist_id) \
+    .join(Venue, Venue.id == Show.venue_id) \
+    .filter(Show.start_time >= start, Show.start_time < end) \
+    .filter(Venue.deleted_at.is_(None), Artist.deleted_at.is_(None))
+  if state:
+    query = query.filter(Venue.state == state)
+  if city:
+    # as typed in the calendar form, whatever its case
+    query = query.filter(db.func.lower(Venue.city) == city.lower())
+  if genre:
+    query = filter_genres(query, Artist, [genre])
+  rows = query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+  days = []
+  for row in rows[:limit]:
+    day = row.start_time.date()
+    if not days or days[-1]['date'] != day:
+      days.append({'date': day, 'shows': []})
+    days[-1]['shows'].append({name: getattr(row, name) for name in CALENDAR_FIELDS})
+  return days, len(rows) > limit
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def search_results(model, search_term, genres=(), match='any'):
+  # fetch matching venues/artists (of the genres, if any) with their
+  # maintained upcoming show counters in a single query, without touching
+  # the Show table
+  matches = db.session.query(model.id, model.name, model.upcoming_shows_count).filter(model.deleted_at.is_(None))
+  # best matches first, served from the name search index
+  matches = match_names(matches, model, search_term)
+  facets = genre_facets(model, genres, match, query=matches)
+  matches = filter_genres(matches, model, genres, match).all()
+  # build json objects containing relevant data for each result
+  data = []
+  for match in matches:
+    data.append({
+      'id': match.id,
+      'name': match.name,
+      'num_upcoming_shows': match.upcoming_shows_count
+    })
+  return {
+    'count': len(data),
+    'data': data,
+    'facets': facets
+  }
@@ -0,0 +1,180 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import atexit
+import threading
+import time
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from background import BackgroundThread
+from models import db, Venue, Artist, Show, Deletion
+from counters import release_shows
+
+#----------------------------------------------------------------------------#
+# Soft deletes.
+#----------------------------------------------------------------------------#
+
+# Deleting a venue or an artist only sets its deleted_at, which hides it and
+# its shows at once, and records a Deletion. The reaper then removes the
+# shows in batches, one short transaction each, so the request never holds
+# locks over years of show history, and finally deletes the row itself.
+
+ENTITIES = {
+  'venue': (Venue, Show.venue_id),
+  'artist': (Artist, Show.artist_id),
+}
+
+def request_deletion(entity, entity_id):
+  # hide a venue or artist and queue its shows for the reaper. returns the
+  # Deletion, or None if there is no such entity. the caller commits.
+  model, show_fk = ENTITIES[entity]
+  target = db.session.query(model) \
+    .filter(model.id == entity_id, model.deleted_at.is_(None)) \
+    .with_for_update() \
+    .first()
+  if target is None:
+    return None
+  target.deleted_at = datetime.utcnow()
+  # the counterparts' counters stop including the hidden shows now
+  release_shows(show_fk, target.id)
+  deletion = Deletion(entity=entity, entity_id=target.id)
+  db.session.add(deletion)
+  return deletion
+
+def deletion_status(deletion):
+  return {
+    'entity': deletion.entity,
+    'entity_id': deletion.entity_id,
+    'status': 'finished' if deletion.finished_at else 'pending',
+    'shows_total': deletion.shows_total,
+    'shows_deleted': deletion.shows_deleted,
+    'requested_at': deletion.requested_at,
+    'finished_at': deletion.finished_at,
+  }
+
+def reap_batch(deletion_id, batch_size):
+  # delete up to batch_size shows of a pending deletion, and the venue or
+  # artist itself once none are left. returns its status, or None if it is
+  # finished or being reaped by another worker.
+  deletion = db.session.query(Deletion) \
+    .filter(Deletion.id == deletion_id, Deletion.finished_at.is_(None)) \
+    .with_for_update(skip_locked=True) \
+    .first()
+  if deletion is None:
+    db.session.rollback()
+    return None
+  model, show_fk = ENTITIES[deletion.entity]
+  if deletion.shows_total is None:
+    deletion.shows_total = db.session.query(db.func.count(Show.id)).filter(show_fk == deletion.entity_id).scalar()
+  batch = db.session.query(Show.id).filter(show_fk == deletion.entity_id).limit(batch_size).subquery()
+  deleted = db.session.query(Show).filter(Show.id.in_(db.select([batch.c.id]))).delete(synchronize_session=False)
+  deletion.shows_deleted += deleted
+  if deleted < batch_size:
+    # nothing is left to cascade
+    db.session.query(model).filter(model.id == deletion.entity_id).delete(synchronize_session=False)
+    deletion.finished_at = datetime.utcnow()
+  status = deletion_status(deletion)
+  db.session.commit()
+  return status
+
+def reap(batch_size, pause=0, stopping=None):
+  # work through every pending deletion, oldest first, yielding the status
+  # after each batch. stops between batches once stopping is set.
+  pending = db.session.query(Deletion.id).filter(Deletion.finished_at.is_(None)).order_by(Deletion.id).all()
+  db.session.commit()
+  for deletion_id, in pending:
+    while True:
+      status = reap_batch(deletion_id, batch_size)
+      if status is None:
+        break
+      yield status
+      if status['status'] == 'finished':
+        break
+      if stopping is not None and stopping.is_set():
+        return
+      time.sleep(pause)
+
+#----------------------------------------------------------------------------#
+# Background reaper.
+#----------------------------------------------------------------------------#
+
+# Each worker runs the reaper on a background thread once it takes a delete,
+# pausing REAPER_PAUSE seconds between batches of REAPER_BATCH_SIZE shows.
+# Deletions left unfinished, e.g. by a restart, are picked up by the next
+# delete or by `flask reaper run`.
+
+class Reaper:
+
+  def __init__(self, app=None):
+    self.app = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.app = app
+    self.enabled = app.config.get('REAPER_ENABLED', True)
+    self.batch_size = app.config.get('REAPER_BATCH_SIZE', 1000)
+    self.pause = app.config.get('REAPER_PAUSE', 0.05)
+    self.wakeup = threading.Event()
+    self.worker = BackgroundThread(self.run, 'reaper')
+    atexit.register(self.stop)
+
+  def wake(self):
+    if not self.enabled:
+      return
+    self.worker.start()
+    self.wakeup.set()
+
+  def stop(self, timeout=10):
+    # finish the current batch before the process exits
+    self.worker.stopping.set()
+    self.wakeup.set()
+    self.worker.join(timeout)
+
+  def run(self):
+    while True:
+      self.wakeup.wait()
+      self.wakeup.clear()
+      if self.worker.stopping.is_set():
+        return
+      with self.app.app_context():
+        try:
+          for status in reap(self.batch_size, self.pause, self.worker.stopping):
+            if status['status'] == 'finished':
+              self.app.logger.info(
+                f'Reaped {status["entity"]} {status["entity_id"]} and {status["shows_deleted"]} shows')
+        except Exception:
+          db.session.rollback()
+          self.app.logger.exception('Reaper could not finish the pending deletions')
+        finally:
+          db.session.remove()
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+reaper_cli = AppGroup('reaper', help='Remove deleted venues and artists with their shows.')
+
+@reaper_cli.command('run')
+@click.option('--batch-size', type=int, help='Shows deleted per transaction; defaults to REAPER_BATCH_SIZE.')
+def run_command(batch_size):
+  '''Finish every pending deletion, reporting progress.'''
+  batch_size = batch_size or current_app.config.get('REAPER_BATCH_SIZE', 1000)
+  finished = 0
+  for status in reap(batch_size, current_app.config.get('REAPER_PAUSE', 0.05)):
+    click.echo(f'{status["entity"]} {status["entity_id"]}: {status["shows_deleted"]}/{status["shows_total"]} shows deleted')
+    finished += status['status'] == 'finished'
+  click.echo(f'Finished {finished} deletions.')
+
+@reaper_cli.command('status')
+def status_command():
+  '''List the pending deletions.'''
+  pending = Deletion.query.filter(Deletion.finished_at.is_(None)).order_by(Deletion.id).all()
+  for deletion in pending:
+    total = '?' if deletion.shows_total is None else deletion.shows_total
+    click.echo(f'{deletion.entity} {deletion.entity_id}: {deletion.shows_deleted}/{total} shows deleted, '
+      f'requested {deletion.requested_at:%Y-%m-%d %H:%M:%S}')
+  click.echo(f'{len(pending)} deletions pending.')
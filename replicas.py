@@ -0,0 +1,120 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import time
+from functools import wraps
+from itertools import cycle
+from threading import Lock
+import sqlalchemy
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+#----------------------------------------------------------------------------#
+# Replica selection.
+#----------------------------------------------------------------------------#
+
+# Views marked with @replica_reads run their queries on one of the
+# SQLALCHEMY_REPLICA_URIS; everything else, and every flush, uses the
+# primary. A client that has just written (any other POST, PATCH or DELETE)
+# reads from the primary for REPLICA_STICKY_SECONDS, long enough for the
+# replicas to catch up, so it always sees its own changes.
+
+class ReplicaSet:
+
+  def __init__(self, uris, selection='round_robin', options=None):
+    if selection not in ('round_robin', 'least_connections'):
+      raise ValueError(f'Unknown REPLICA_SELECTION: {selection}')
+    self.selection = selection
+    self.engines = [sqlalchemy.create_engine(uri, **(options or {})) for uri in uris]
+    self.in_use = {engine: 0 for engine in self.engines}
+    self.lock = Lock()
+    self.order = cycle(self.engines)
+    for engine in self.engines:
+      self.count_connections(engine)
+
+  def count_connections(self, engine):
+    # connections each replica has checked out, for least_connections
+    def checkout(dbapi_connection, record, proxy):
+      with self.lock:
+        self.in_use[engine] += 1
+
+    def checkin(dbapi_connection, record):
+      with self.lock:
+        self.in_use[engine] -= 1
+
+    sqlalchemy.event.listen(engine, 'checkout', checkout)
+    sqlalchemy.event.listen(engine, 'checkin', checkin)
+
+  def pools(self):
+    # (label, pool) of each replica, numbered as listed in the config
+    return [(f'replica-{number}', engine.pool) for number, engine in enumerate(self.engines, 1)]
+
+  def choose(self):
+    with self.lock:
+      if self.selection == 'least_connections':
+        # ties go to the replica listed first
+        return min(self.engines, key=self.in_use.__getitem__)
+      return next(self.order)
+
+def pinned_to_primary():
+  # whether the client wrote within the last REPLICA_STICKY_SECONDS
+  return session.get('primary_until', 0) > time.time()
+
+def reading_from_replica():
+  # whether the current request was marked @replica_reads and its client has
+  # no recent write to read back
+  return has_request_context() and g.get('replica_reads', False) \
+    and 'replicas' in current_app.extensions \
+    and not pinned_to_primary()
+
+def used_replica():
+  # whether the current request has run queries on a replica
+  return 'replica_engine' in g
+
+def replica_reads(view):
+  # serve a read-only view's queries from a replica
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g.replica_reads = True
+    return view(*args, **kwargs)
+  return wrapper
+
+#----------------------------------------------------------------------------#
+# Session.
+#----------------------------------------------------------------------------#
+
+class RoutingSession(SignallingSession):
+
+  def get_bind(self, mapper=None, clause=None):
+    if not self._flushing and reading_from_replica():
+      # one replica per request, so its queries see a consistent state
+      if 'replica_engine' not in g:
+        g.replica_engine = current_app.extensions['replicas'].choose()
+      return g.replica_engine
+    return super().get_bind(mapper, clause)
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+def init_app(app):
+  # call after pool.init_app(app, db), whose engine options replicas share
+  uris = app.config.get('SQLALCHEMY_REPLICA_URIS')
+  if not uris:
+    return
+  app.extensions['replicas'] = ReplicaSet(
+    uris,
+    app.config.get('REPLICA_SELECTION', 'round_robin'),
+    app.config.get('SQLALCHEMY_ENGINE_OPTIONS')
+  )
+  sticky = app.config.get('REPLICA_STICKY_SECONDS', 10)
+
+  @app.after_request
+  def stick_to_primary(response):
+    # read-your-writes: the writing client skips replicas for a while
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and not g.get('replica_reads', False):
+      session['primary_until'] = time.time() + sticky
+    return response
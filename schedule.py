@@ -0,0 +1,141 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import random
+from collections import defaultdict
+from datetime import timedelta
+from models import db, Show, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+
+#----------------------------------------------------------------------------#
+# Interval tree.
+#----------------------------------------------------------------------------#
+
+# A treap of half-open [start, end) intervals ordered by start, where every
+# node also records the latest end in its subtree. Inserting and finding an
+# overlapping interval both take O(log n) expected time.
+
+class Node:
+  __slots__ = ('start', 'end', 'value', 'priority', 'max_end', 'left', 'right')
+
+  def __init__(self, start, end, value):
+    self.start = start
+    self.end = end
+    self.value = value
+    self.priority = random.random()
+    self.max_end = end
+    self.left = None
+    self.right = None
+
+  def update(self):
+    self.max_end = self.end
+    for child in (self.left, self.right):
+      if child is not None and child.max_end > self.max_end:
+        self.max_end = child.max_end
+
+def rotate_left(node):
+  right = node.right
+  node.right, right.left = right.left, node
+  node.update()
+  right.update()
+  return right
+
+def rotate_right(node):
+  left = node.left
+  node.left, left.right = left.right, node
+  node.update()
+  left.update()
+  return left
+
+def insert(node, new):
+  if node is None:
+    return new
+  if new.start < node.start:
+    node.left = insert(node.left, new)
+    if node.left.priority > node.priority:
+      return rotate_right(node)
+  else:
+    node.right = insert(node.right, new)
+    if node.right.priority > node.priority:
+      return rotate_left(node)
+  node.update()
+  return node
+
+class IntervalTree:
+
+  def __init__(self):
+    self.root = None
+
+  def add(self, start, end, value):
+    self.root = insert(self.root, Node(start, end, value))
+
+  def overlapping(self, start, end):
+    # the value of an interval overlapping [start, end), or None. when the
+    # left subtree reaches past start but holds no overlap, its intervals
+    # start at or after end, and so do all those to the right.
+    node = self.root
+    while node is not None:
+      if node.start < end and start < node.end:
+        return node.value
+      if node.left is not None and node.left.max_end > start:
+        node = node.left
+      else:
+        node = node.right
+    return None
+
+#----------------------------------------------------------------------------#
+# Conflicts.
+#----------------------------------------------------------------------------#
+
+# A show books its venue and its artist from start_time for its duration.
+# On PostgreSQL, exclusion constraints (models.py) reject overlapping shows
+# however they are written. Batches are checked up front as well, so each
+# conflicting row gets its own error instead of failing the whole chunk:
+# the existing shows of the batch's venues and artists around its time span
+# are read with one query into an interval tree per venue and per artist,
+# and the rows are then checked, and added, one after the other.
+
+def show_interval(values):
+  start = values['start_time']
+  return start, start + timedelta(minutes=values.get('duration') or DEFAULT_SHOW_MINUTES)
+
+def check_show_conflicts(values_by_key, exclude_id=None):
+  # returns {key: errors} for the shows overlapping an existing show, other
+  # than exclude_id (the show being edited), or an earlier show of the batch.
+  # venue and artist ids must be ints (see importer.check_show_references).
+  if not values_by_key:
+    return {}
+  intervals = {key: show_interval(values) for key, values in values_by_key.items()}
+  venue_ids = {values['venue_id'] for values in values_by_key.values()}
+  artist_ids = {values['artist_id'] for values in values_by_key.values()}
+  # no show runs longer than MAX_SHOW_MINUTES, so earlier ones can't overlap
+  earliest = min(start for start, end in intervals.values()) - timedelta(minutes=MAX_SHOW_MINUTES)
+  latest = max(end for start, end in intervals.values())
+  query = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration) \
+    .filter(Show.start_time > earliest, Show.start_time < latest) \
+    .filter(db.or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)))
+  if exclude_id is not None:
+    query = query.filter(Show.id != exclude_id)
+
+  trees = defaultdict(IntervalTree)
+  for show in query:
+    start, end = show_interval(show._asdict())
+    if show.venue_id in venue_ids:
+      trees['venue', show.venue_id].add(start, end, f'show {show.id}')
+    if show.artist_id in artist_ids:
+      trees['artist', show.artist_id].add(start, end, f'show {show.id}')
+
+  errors = {}
+  for key, values in values_by_key.items():
+    start, end = intervals[key]
+    messages = []
+    for entity in ('venue', 'artist'):
+      booked = trees[entity, values[f'{entity}_id']].overlapping(start, end)
+      if booked is not None:
+        messages.append(f'The {entity} is already booked at that time ({booked}).')
+    if messages:
+      errors[key] = {'start_time': messages}
+      continue
+    for entity in ('venue', 'artist'):
+      trees[entity, values[f'{entity}_id']].add(start, end, 'another show in this batch')
+  return errors
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from collections import defaultdict
+from models import db
+from tableindex import TableIndexes
+
+#----------------------------------------------------------------------------#
+# N-gram index.
+#----------------------------------------------------------------------------#
+
+# On PostgreSQL, name searches are served by the pg_trgm GIN indexes declared
+# in models.py. SQLite has no trigram support, so there the same trigrams are
+# looked up in memory instead.
+
+def ngrams(text, n=3):
+  text = text.lower()
+  return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def similarity(a, b, n=3):
+  # share of trigrams two strings have in common, as ranked by pg_trgm
+  a_grams = ngrams(a, n)
+  b_grams = ngrams(b, n)
+  if not a_grams or not b_grams:
+    return 0.0
+  return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+class NgramIndex:
+
+  def __init__(self, n=3):
+    self.n = n
+    self.names = {}
+    self.postings = defaultdict(set)
+
+  def add(self, id, name):
+    if name is None:
+      return
+    self.names[id] = name
+    for gram in ngrams(name, self.n):
+      self.postings[gram].add(id)
+
+  def search(self, term):
+    # returns ids whose name contains term, best matches first
+    term = term.lower()
+    grams = ngrams(term, self.n)
+    if grams:
+      # only names holding every trigram of the term can contain it
+      candidates = set.intersection(*(self.postings.get(gram, set()) for gram in grams))
+    else:
+      # terms shorter than n have no trigrams to look up
+      candidates = self.names.keys()
+    matches = [id for id in candidates if term in self.names[id].lower()]
+    matches.sort(key=lambda id: (-similarity(term, self.names[id], self.n), self.names[id]))
+    return matches
+
+#----------------------------------------------------------------------------#
+# Index maintenance.
+#----------------------------------------------------------------------------#
+
+def build_index(model):
+  index = NgramIndex()
+  for id, name in db.session.query(model.id, model.name):
+    index.add(id, name)
+  return index
+
+# per searchable model, rebuilt after writes (see tableindex.py)
+indexes = TableIndexes(build_index)
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+def match_names(query, model, search_term):
+  # restrict query to entities whose name contains search_term, ranked by relevance
+  if db.engine.dialect.name == 'postgresql':
+    # ilike is answered from the gin_trgm_ops index
+    return query.filter(model.name.ilike(f'%{search_term}%')) \
+      .order_by(db.func.similarity(model.name, search_term).desc(), model.name)
+  # the SQL query stays the source of truth for anything else it filters on
+  ids = indexes.get(model).search(search_term)
+  if not ids:
+    return query.filter(db.false())
+  rank = db.case({id: position for position, id in enumerate(ids)}, value=model.id)
+  return query.filter(model.id.in_(ids)).order_by(rank)
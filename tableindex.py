@@ -0,0 +1,42 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from models import db
+
+#----------------------------------------------------------------------------#
+# In-memory table indexes.
+#----------------------------------------------------------------------------#
+
+# Where the database lacks an index type (e.g. SQLite has no trigram, array
+# or prefix indexes), search.py, facets.py and geo.py build their own in
+# memory. Each process holds its own copy and rows may be written by other
+# processes or by Core statements, which no session event reports, so a
+# copy is only reused while its table's row count, highest id and latest
+# updated_at are those it was built from. Any write since rebuilds it.
+
+class TableIndexes:
+
+  def __init__(self, build):
+    # build(model) returns a new index over the model's table
+    self.build = build
+    self.entries = {}
+
+  def get(self, model):
+    stamp = table_stamp(model)
+    entry = self.entries.get(model)
+    if entry is None or entry[0] != stamp:
+      # reading the stamp first means a write racing the build is only
+      # picked up on the next lookup, never missed
+      entry = self.entries[model] = (stamp, self.build(model))
+    return entry[1]
+
+  def clear(self):
+    self.entries.clear()
+
+def table_stamp(model):
+  return tuple(db.session.query(
+    db.func.count(model.id),
+    db.func.max(model.id),
+    db.func.max(model.updated_at)
+  ).one())
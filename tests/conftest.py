@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import os
+import re
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+from app import create_app
+from models import db
+
+#----------------------------------------------------------------------------#
+# App.
+#----------------------------------------------------------------------------#
+
+# Tests run on a throwaway SQLite file, or on TEST_DATABASE_URL when set,
+# e.g. TEST_DATABASE_URL=postgres://localhost/fyyur_test for the PostgreSQL
+# only checks. Its tables are dropped and recreated around every test.
+
+def app_settings(**overrides):
+  settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+  settings.update(
+    TESTING=True,
+    SECRET_KEY='test',
+    CACHE_BACKEND='null',
+    REAPER_ENABLED=False,
+    REQUEST_PROFILING=False,
+    JINJA_BYTECODE_CACHE_DIR=None,
+    SQLALCHEMY_REPLICA_URIS=[],
+  )
+  settings.update(overrides)
+  return SimpleNamespace(**settings)
+
+@pytest.fixture
+def database_url(tmp_path):
+  return os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{tmp_path / "test.db"}'
+
+@pytest.fixture
+def make_app(database_url):
+  # builds an app on the test database; tests pass config overrides
+  apps = []
+
+  def make(**overrides):
+    app = create_app(app_settings(SQLALCHEMY_DATABASE_URI=database_url, **overrides))
+    with app.app_context():
+      db.drop_all()
+      db.create_all()
+    apps.append(app)
+    return app
+
+  yield make
+  for app in apps:
+    with app.app_context():
+      db.session.remove()
+      db.drop_all()
+      db.engine.dispose()
+
+@pytest.fixture
+def app(make_app):
+  return make_app()
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+@contextmanager
+def count_queries(engine):
+  # collects the statements run on engine inside the block
+  statements = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+  db.event.listen(engine, 'before_cursor_execute', record)
+  try:
+    yield statements
+  finally:
+    db.event.remove(engine, 'before_cursor_execute', record)
+
+def csrf_token(client):
+  page = client.get('/venues/create').get_data(as_text=True)
+  return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
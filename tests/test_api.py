@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+import pytest
+import api
+from models import db, Venue, Artist, Show
+
+@pytest.fixture
+def client(app):
+  with app.app_context():
+    db.session.add_all([Venue(name=f'Hall {n}', city='Austin', state='TX', genres=['Jazz']) for n in range(3)])
+    db.session.commit()
+  return app.test_client()
+
+def test_listings_are_paged_with_cursors(client):
+  first = client.get('/api/v1/venues?fields=name&limit=2').get_json()
+  assert [venue['name'] for venue in first['data']] == ['Hall 0', 'Hall 1']
+  second = client.get(f'/api/v1/venues?fields=name&limit=2&cursor={first["next_cursor"]}').get_json()
+  assert [venue['name'] for venue in second['data']] == ['Hall 2']
+  assert second['next_cursor'] is None
+
+def test_unchanged_resources_are_not_modified(client):
+  response = client.get('/api/v1/venues/1')
+  assert response.status_code == 200
+  assert client.get('/api/v1/venues/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+@pytest.mark.parametrize('path, error', [
+  ('/api/v1/venues?fields=id,secret', 'Unknown fields: secret'),
+  ('/api/v1/venues?cursor=nonsense', 'Malformed cursor'),
+  ('/api/v1/venues?genre=Polka', 'Unknown genres: Polka'),
+  ('/api/v1/venues/1?fields=past_shows,secret', 'Unknown fields: secret'),
+  ('/api/v1/venues/nearby?lat=100&lon=0', 'lat must be between -90 and 90'),
+])
+def test_bad_arguments_are_rejected_before_the_etag_check(client, path, error):
+  # even a client claiming to hold any version of the resource gets the 400
+  response = client.get(path, headers={'If-None-Match': '*'})
+  assert response.status_code == 400
+  assert response.get_json() == {'error': error}
+
+def test_errors_while_building_are_not_bad_requests(client, monkeypatch):
+  def broken(*args):
+    raise ValueError('a bug')
+  monkeypatch.setattr(api, 'venue_page', broken)
+  with pytest.raises(ValueError):
+    client.get('/api/v1/venues')
+
+def test_deleting_a_listed_artist_changes_the_venue_etag(app):
+  with app.app_context():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artists = [Artist(name=f'Band {n}', genres=['Jazz']) for n in range(2)]
+    db.session.add_all([venue] + artists)
+    db.session.flush()
+    for n, artist in enumerate(artists):
+      db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=n + 1)))
+    db.session.commit()
+    venue_id, older = venue.id, artists[0]
+    # the other artist was written last, so the latest artist write stays put
+    artists[1].updated_at = datetime.utcnow() + timedelta(minutes=1)
+    db.session.commit()
+  client = app.test_client()
+  response = client.get(f'/api/v1/venues/{venue_id}')
+  assert len(response.get_json()['upcoming_shows']) == 2
+
+  with app.app_context():
+    db.session.merge(older).deleted_at = datetime.utcnow()
+    db.session.commit()
+  response = client.get(f'/api/v1/venues/{venue_id}', headers={'If-None-Match': response.headers['ETag']})
+  assert response.status_code == 200
+  assert len(response.get_json()['upcoming_shows']) == 1
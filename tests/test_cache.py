@@ -0,0 +1,48 @@
+from models import db, Venue
+from app import cache
+from cache import MemoryCache, RedisCache, FakeRedis
+
+def test_backends_evict_by_tag():
+  for backend in (MemoryCache(), RedisCache(FakeRedis())):
+    backend.set('/venues', 'listing', ['venues'])
+    backend.set('/venues/1', 'venue', ['venue:1', 'artist:2'])
+    backend.set('/venues/3', 'other venue', ['venue:3'])
+    backend.invalidate('artist:2')
+    assert [backend.get(key) for key in ('/venues', '/venues/1', '/venues/3')] == ['listing', None, 'other venue']
+
+def test_memory_cache_expires_and_evicts_the_least_recent():
+  backend = MemoryCache(max_entries=2, ttl=300)
+  backend.set('a', 1)
+  backend.set('b', 2)
+  backend.get('a')
+  backend.set('c', 3)
+  assert [backend.get(key) for key in 'abc'] == [1, None, 3]
+  backend.ttl = -1
+  backend.set('d', 4)
+  assert backend.get('d') is None
+
+def test_pages_are_cached_until_a_write_evicts_them(make_app):
+  app = make_app(CACHE_BACKEND='memory')
+  with app.app_context():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.commit()
+  client = app.test_client()
+  assert 'The Musical Hop' in client.get('/venues').get_data(as_text=True)
+  assert cache.backend.get('/venues?') is not None
+  with app.app_context():
+    Venue.query.one().name = 'The Musical Hop 2'
+    db.session.commit()
+  # written outside the views: still the cached page
+  assert 'The Musical Hop 2' not in client.get('/venues').get_data(as_text=True)
+  cache.invalidate('venues')
+  assert 'The Musical Hop 2' in client.get('/venues').get_data(as_text=True)
+
+def test_pages_with_flashed_messages_are_not_cached(make_app):
+  app = make_app(CACHE_BACKEND='memory')
+  client = app.test_client()
+  for path in ('/venues?genre=Polka', '/shows?from=yesterday'):
+    page = client.get(path).get_data(as_text=True)
+    assert 'alert' in page
+    assert cache.backend.get(path) is None
+    # another visitor of a valid listing gets no stray message
+    assert 'alert' not in app.test_client().get(path.split('?')[0]).get_data(as_text=True)
@@ -0,0 +1,63 @@
+import re
+from datetime import date, datetime, time, timedelta
+from models import db, Venue, Artist, Show
+from queries import show_calendar
+
+DAY = date(2030, 5, 1)
+
+def at(days, hour=20):
+  return datetime.combine(DAY + timedelta(days=days), time(hour))
+
+def add_shows():
+  # a show a day for ten days, alternating between Austin and Dallas
+  venues = [Venue(name='Austin Hall', city='Austin', state='TX'), Venue(name='Dallas Hall', city='Dallas', state='TX')]
+  artists = [Artist(name='Jazz Band', genres=['Jazz']), Artist(name='Blues Band', genres=['Blues'])]
+  db.session.add_all(venues + artists)
+  db.session.flush()
+  for n in range(10):
+    db.session.add(Show(venue_id=venues[n % 2].id, artist_id=artists[n % 2].id, start_time=at(n)))
+  db.session.commit()
+
+def listed_days(client, query):
+  page = client.get(f'/shows?{query}').get_data(as_text=True)
+  return len(re.findall(r'<h3>\w+day', page)), page.count('tile-show')
+
+def test_show_calendar_filters(app):
+  with app.app_context():
+    add_shows()
+    days, truncated = show_calendar(at(0, 0), at(10, 0))
+    assert [day['date'] for day in days] == [DAY + timedelta(days=n) for n in range(10)] and not truncated
+    assert [show['venue_name'] for day in days for show in day['shows']][:2] == ['Austin Hall', 'Dallas Hall']
+    days, truncated = show_calendar(at(0, 0), at(10, 0), city='Austin', state='TX', genre='Jazz')
+    assert len(days) == 5
+    assert show_calendar(at(0, 0), at(10, 0), genre='Blues', state='CA') == ([], False)
+    days, truncated = show_calendar(at(0, 0), at(10, 0), limit=3)
+    assert sum(len(day['shows']) for day in days) == 3 and truncated
+
+def test_cities_match_in_any_case(app):
+  with app.app_context():
+    add_shows()
+  client = app.test_client()
+  query = f'from={DAY}&to={DAY + timedelta(days=9)}'
+  assert listed_days(client, f'{query}&city=austin') == (5, 5)
+  assert listed_days(client, f'{query}&city=AUSTIN&state=tx') == (5, 5)
+  assert listed_days(client, f'{query}&city=Houston') == (0, 0)
+
+def test_calendar_range_is_capped(make_app):
+  app = make_app(CALENDAR_MAX_DAYS=3, CALENDAR_MAX_SHOWS=2)
+  with app.app_context():
+    add_shows()
+  client = app.test_client()
+  # ten days asked for, three listed, of which only two shows fit
+  days, shows = listed_days(client, f'from={DAY}&to={DAY + timedelta(days=9)}')
+  assert (days, shows) == (2, 2)
+  page = client.get(f'/shows?from={DAY}&to={DAY + timedelta(days=9)}').get_data(as_text=True)
+  assert 'Only the first shows are listed.' in page
+
+  app = make_app(CALENDAR_MAX_DAYS=3)
+  with app.app_context():
+    add_shows()
+  assert listed_days(app.test_client(), f'from={DAY}&to={DAY + timedelta(days=9)}') == (3, 3)
+  # a bad date falls back to the default with a message
+  page = app.test_client().get('/shows?from=someday').get_data(as_text=True)
+  assert 'someday is not a valid date (YYYY-MM-DD).' in page
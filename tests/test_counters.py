@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from models import db, Venue, Artist, Show
+from counters import roll_over, find_drift
+
+def counts(model):
+  return {id: count for id, count in db.session.query(model.id, model.upcoming_shows_count).order_by(model.id)}
+
+def drift():
+  return find_drift(Venue, Show.venue_id) + find_drift(Artist, Show.artist_id)
+
+def add_entities():
+  venues = [Venue(name=f'Hall {n}', city='Austin', state='TX') for n in range(2)]
+  artists = [Artist(name=f'Band {n}') for n in range(2)]
+  db.session.add_all(venues + artists)
+  db.session.commit()
+  return [venue.id for venue in venues], [artist.id for artist in artists]
+
+def test_show_writes_keep_the_counters(app):
+  later = datetime.now() + timedelta(days=7)
+  with app.app_context():
+    (hall, other_hall), (band, other_band) = add_entities()
+    shows = [
+      Show(venue_id=hall, artist_id=band, start_time=later),
+      Show(venue_id=hall, artist_id=other_band, start_time=later + timedelta(days=1)),
+      # already started, so never counted
+      Show(venue_id=other_hall, artist_id=band, start_time=datetime.now() - timedelta(days=1)),
+    ]
+    db.session.add_all(shows)
+    db.session.commit()
+    assert counts(Venue) == {hall: 2, other_hall: 0}
+    assert counts(Artist) == {band: 1, other_band: 1}
+    assert drift() == []
+
+    # moved to the other venue and artist
+    shows[0].venue_id, shows[0].artist_id = other_hall, other_band
+    db.session.commit()
+    assert counts(Venue) == {hall: 1, other_hall: 1}
+    assert counts(Artist) == {band: 0, other_band: 2}
+    assert drift() == []
+
+    # moved into the past, and the past show into the future
+    shows[1].start_time = datetime.now() - timedelta(days=2)
+    shows[2].start_time = later
+    db.session.commit()
+    assert counts(Venue) == {hall: 0, other_hall: 2}
+    assert counts(Artist) == {band: 1, other_band: 1}
+    assert drift() == []
+
+    db.session.delete(shows[0])
+    db.session.commit()
+    assert counts(Venue) == {hall: 0, other_hall: 1}
+    assert counts(Artist) == {band: 1, other_band: 0}
+    assert drift() == []
+
+def test_rollover_subtracts_started_shows(app):
+  with app.app_context():
+    (hall, other_hall), (band, other_band) = add_entities()
+    db.session.add_all([
+      Show(venue_id=hall, artist_id=band, start_time=datetime.now() + timedelta(hours=1)),
+      Show(venue_id=hall, artist_id=other_band, start_time=datetime.now() + timedelta(days=2)),
+    ])
+    db.session.commit()
+    assert counts(Venue)[hall] == 2
+
+    assert roll_over(datetime.now() + timedelta(hours=2)) == 1
+    assert counts(Venue) == {hall: 1, other_hall: 0}
+    assert counts(Artist) == {band: 0, other_band: 1}
+    assert drift() == []
+    # nothing else has started since
+    assert roll_over(datetime.now() + timedelta(hours=3)) == 0
+    assert counts(Venue)[hall] == 1
+
+def test_drift_is_found_and_fixed(app):
+  with app.app_context():
+    (hall, other_hall), (band, other_band) = add_entities()
+    db.session.add(Show(venue_id=hall, artist_id=band, start_time=datetime.now() + timedelta(days=1)))
+    db.session.commit()
+    # written around the flush events
+    db.session.query(Venue).filter(Venue.id == other_hall).update({Venue.upcoming_shows_count: 5})
+    db.session.commit()
+    assert drift() == [(other_hall, 5, 0)]
+
+  result = app.test_cli_runner().invoke(args=['counters', 'check', '--fix'])
+  assert 'Venue 2: stored 5, actual 0' in result.output
+  with app.app_context():
+    assert drift() == []
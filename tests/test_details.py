@@ -0,0 +1,54 @@
+import re
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Show
+from conftest import count_queries
+
+# most statements a detail page may run, whatever the number of shows: the
+# entity, its past and upcoming shows, their show counts when a limit cuts
+# the lists short, and with selectin the related rows of each list
+MAX_QUERIES = {'contains_eager': 4, 'selectin': 6}
+
+def add_shows(venue_id, artist_id, start, stop):
+  # shows at the venue by new artists, and shows of the artist at new
+  # venues, half of them past and half upcoming
+  artists = [Artist(name=f'Band {n}') for n in range(start, stop)]
+  venues = [Venue(name=f'Hall {n}', city='Austin', state='TX') for n in range(start, stop)]
+  db.session.add_all(artists + venues)
+  db.session.flush()
+  for n, artist, venue in zip(range(start, stop), artists, venues):
+    days = n + 1 if n % 2 else -n - 1
+    db.session.add(Show(venue_id=venue_id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=days)))
+    db.session.add(Show(venue_id=venue.id, artist_id=artist_id, start_time=datetime.now() + timedelta(days=days, hours=3)))
+  db.session.commit()
+
+def page_queries(app, path, listed):
+  with app.app_context():
+    with count_queries(db.engine) as statements:
+      response = app.test_client().get(path)
+  assert response.status_code == 200
+  # statements run, and the other venues/artists listed with their shows
+  return len(statements), len(set(re.findall(rf'{listed} \d+', response.get_data(as_text=True))))
+
+@pytest.mark.parametrize('limit', [None, 5])
+@pytest.mark.parametrize('loading', ['contains_eager', 'selectin'])
+def test_detail_pages_run_a_bounded_number_of_queries(make_app, loading, limit):
+  app = make_app(SHOW_LOADING=loading, PAST_SHOWS_LIMIT=limit, UPCOMING_SHOWS_LIMIT=limit)
+  with app.app_context():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artist = Artist(name='Guns N Petals', genres=['Jazz'])
+    db.session.add_all([venue, artist])
+    db.session.commit()
+    venue_id, artist_id = venue.id, artist.id
+    add_shows(venue_id, artist_id, 0, 12)
+  venue_path, artist_path = f'/venues/{venue_id}', f'/artists/{artist_id}'
+  few = [page_queries(app, venue_path, 'Band'), page_queries(app, artist_path, 'Hall')]
+  with app.app_context():
+    add_shows(venue_id, artist_id, 12, 200)
+  many = [page_queries(app, venue_path, 'Band'), page_queries(app, artist_path, 'Hall')]
+
+  # both volumes are past the limit, if any
+  assert [shows for queries, shows in few] == 2 * [12 if limit is None else 2 * limit]
+  assert [shows for queries, shows in many] == 2 * [200 if limit is None else 2 * limit]
+  for (few_queries, few_shows), (many_queries, many_shows) in zip(few, many):
+    assert few_queries == many_queries <= MAX_QUERIES[loading]
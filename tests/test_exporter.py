@@ -0,0 +1,55 @@
+import io
+import json
+from datetime import datetime, timedelta
+from models import db, Venue, Artist, Show
+from exporter import export
+from importer import read_rows, import_rows
+
+def exported(entity, format='ndjson'):
+  chunks, mimetype = export(entity, format, chunk_size=2)
+  return ''.join(chunks)
+
+def test_deleted_entities_and_their_shows_are_left_out(app):
+  with app.app_context():
+    venues = [Venue(name=f'Hall {n}', city='Austin', state='TX', genres=['Jazz']) for n in range(3)]
+    artists = [Artist(name=f'Band {n}', genres=['Jazz']) for n in range(3)]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+    for n, (venue, artist) in enumerate(zip(venues, artists)):
+      db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=n + 1)))
+    db.session.commit()
+    # soft deleted, and not yet reaped
+    venues[1].deleted_at = artists[2].deleted_at = datetime.utcnow()
+    db.session.commit()
+    live_venue_ids = [venues[0].id, venues[2].id]
+
+    shows = [json.loads(line) for line in exported('shows').splitlines()]
+    assert [show['venue_id'] for show in shows] == [venues[0].id]
+    assert [json.loads(line)['id'] for line in exported('venues').splitlines()] == live_venue_ids
+    csv = exported('artists', 'csv').splitlines()
+    assert csv[0].startswith('id,name') and [line.split(',')[1] for line in csv[1:]] == ['Band 0', 'Band 1']
+
+def test_csv_exports_import_back(app):
+  with app.app_context():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', address='1015 Folsom Street',
+      phone='123-123-1234', genres=['Jazz', 'Reggae'], facebook_link='https://www.facebook.com/TheMusicalHop',
+      seeking_talent=True)
+    artist = Artist(name='Guns N Petals', genres=['Rock n Roll'])
+    db.session.add_all([venue, artist])
+    db.session.flush()
+    # stored with microseconds, as datetime.now() gives them
+    start_time = datetime.now().replace(microsecond=123456) + timedelta(days=3)
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=start_time, duration=90))
+    db.session.commit()
+    venues, shows = exported('venues', 'csv'), exported('shows', 'csv')
+    Show.query.delete()
+    db.session.commit()
+
+    for entity, text in (('venues', venues), ('shows', shows)):
+      reports = list(import_rows(entity, read_rows(io.StringIO(text), 'csv')))
+      assert [report['errors'] for report in reports] == [[]]
+    copy = Venue.query.filter(Venue.id != venue.id).one()
+    assert (copy.name, copy.genres, copy.phone, copy.seeking_talent) == \
+      ('The Musical Hop', ['Jazz', 'Reggae'], '123-123-1234', True)
+    show = Show.query.one()
+    assert (show.venue_id, show.start_time, show.duration) == (venue.id, start_time.replace(microsecond=0), 90)
@@ -0,0 +1,71 @@
+import random
+from collections import Counter
+from datetime import datetime
+import pytest
+from models import db, Venue, Artist
+from facets import BitsetIndex, bitset, ids, parse_genres, filter_genres, genre_facets
+from importer import import_rows
+
+GENRES = ['Jazz', 'Blues', 'Folk', 'Soul', 'Funk']
+
+def test_bitset_round_trip():
+  assert ids(bitset([])) == []
+  assert ids(bitset([0, 7, 8, 63, 64, 1000])) == [0, 7, 8, 63, 64, 1000]
+
+def test_bitset_index():
+  index = BitsetIndex()
+  index.load([(1, ['Jazz', 'Blues']), (2, ['Jazz']), (3, None), (4, ['Folk', 'Jazz'])])
+  assert ids(index.mask()) == [1, 2, 3, 4]
+  assert ids(index.mask(['Blues', 'Folk'])) == [1, 4]
+  assert ids(index.mask(['Jazz', 'Folk'], 'all')) == [4]
+  assert index.counts(index.mask(['Jazz'])) == {'Jazz': 3, 'Blues': 1, 'Folk': 1}
+
+def test_parse_genres():
+  assert parse_genres([' Jazz', 'Jazz', '', 'Blues'], None) == (['Jazz', 'Blues'], 'any')
+  with pytest.raises(ValueError):
+    parse_genres(['Polka'])
+  with pytest.raises(ValueError):
+    parse_genres(['Jazz'], 'some')
+
+def matching(model, genres, match):
+  query = db.session.query(model.id).filter(model.deleted_at.is_(None))
+  return sorted(id for id, in filter_genres(query, model, genres, match))
+
+def test_filters_and_facets_match_a_brute_force_count(app):
+  rng = random.Random(3)
+  with app.app_context():
+    for n in range(200):
+      db.session.add(Artist(name=f'Artist {n}', genres=rng.sample(GENRES, rng.randint(0, 3)),
+        deleted_at=datetime.utcnow() if n % 10 == 0 else None))
+    db.session.commit()
+    artists = {artist.id: set(artist.genres) for artist in Artist.query.filter(Artist.deleted_at.is_(None))}
+
+    for genres in (['Jazz'], ['Jazz', 'Soul'], ['Folk', 'Funk', 'Blues']):
+      for match, test in (('any', set.intersection), ('all', set.issuperset)):
+        expected = sorted(id for id, have in artists.items() if test(have, set(genres)))
+        assert matching(Artist, genres, match) == expected
+        # with 'all' facets count within the filter, with 'any' across every artist
+        counted = [have for id, have in artists.items() if match == 'any' or id in expected]
+        counts = Counter(genre for have in counted for genre in have)
+        assert {facet['genre']: facet['count'] for facet in genre_facets(Artist, genres, match)} == counts
+
+def test_filters_see_rows_written_outside_the_session(app):
+  with app.app_context():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.commit()
+    assert len(matching(Venue, ['Jazz'], 'any')) == 1
+
+    # imported through Core inserts
+    rows = [(1, {
+      'name': 'Hop Hall', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '512-555-0100',
+      'genres': ['Jazz', 'Soul'], 'facebook_link': 'https://www.facebook.com/hophall',
+    })]
+    assert list(import_rows('venues', rows))[0]['inserted'] == 1
+    assert len(matching(Venue, ['Jazz'], 'any')) == 2
+    assert genre_facets(Venue) == [{'genre': 'Jazz', 'count': 2}, {'genre': 'Soul', 'count': 1}]
+
+    # soft-deleted
+    Venue.query.filter_by(name='The Musical Hop').one().deleted_at = datetime.utcnow()
+    db.session.commit()
+    assert len(matching(Venue, ['Jazz'], 'any')) == 1
+    assert genre_facets(Venue) == [{'genre': 'Jazz', 'count': 1}, {'genre': 'Soul', 'count': 1}]
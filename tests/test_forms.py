@@ -0,0 +1,35 @@
+import pytest
+from types import SimpleNamespace
+from wtforms.validators import ValidationError
+from forms import Validator, validate_state, validate_genres, validate_phone, validate_facebook_link
+
+def test_validator_is_abstract():
+  with pytest.raises(TypeError):
+    Validator()
+
+def test_choice():
+  assert validate_state.validate('CA') is None
+  assert validate_state.validate('XX') == 'Not a valid State.'
+
+def test_choices_need_a_list_of_known_values():
+  assert validate_genres.validate(['Jazz', 'Blues']) is None
+  assert validate_genres.validate(('Jazz',)) is None
+  assert validate_genres.validate(['Jazz', 'Polka']) == 'Not a valid genre.'
+  for value in ('Jazz', {'Jazz': 1}, 7):
+    assert validate_genres.validate(value) == 'Not a valid genre.'
+
+def test_patterns_need_a_string():
+  assert validate_phone.validate('512-555-0100') is None
+  assert validate_phone.validate('12-34') == 'Not a valid phone number.'
+  for value in (5125550100, ['512-555-0100']):
+    assert validate_phone.validate(value) == 'Not a valid phone number.'
+  assert validate_facebook_link.validate('https://www.facebook.com/band') is None
+
+def test_empty_values_are_left_to_required_or_optional():
+  assert [validator.validate(value) for validator, value in
+    ((validate_state, ''), (validate_genres, []), (validate_phone, None))] == [None, None, None]
+
+def test_as_wtforms_validators():
+  validate_phone(None, SimpleNamespace(data='512-555-0100'))
+  with pytest.raises(ValidationError, match='Not a valid phone number.'):
+    validate_phone(None, SimpleNamespace(data='12-34'))
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+TEMPLATE = "{% fragment 'show', show.id, show.updated_at %}{{ render(show) }}{% endfragment %}"
+
+def test_fragments_render_once_per_key(app):
+  rendered = []
+
+  def render(show):
+    rendered.append(show['id'])
+    return show['name']
+
+  template = app.jinja_env.from_string(TEMPLATE)
+  show = {'id': 1, 'name': 'Guns N Petals', 'updated_at': datetime(2030, 5, 1)}
+  assert template.render(show=show, render=render) == 'Guns N Petals'
+  # unchanged: the stored HTML, even if the data were to differ
+  assert template.render(show=dict(show, name='Other'), render=render) == 'Guns N Petals'
+  assert rendered == [1]
+  # an edit moves updated_at, and so the key
+  edited = dict(show, name='Guns N Roses', updated_at=show['updated_at'] + timedelta(seconds=1))
+  assert template.render(show=edited, render=render) == 'Guns N Roses'
+  assert template.render(show=dict(show, id=2), render=render) == 'Guns N Petals'
+  assert rendered == [1, 1, 2]
+
+def test_fragment_cache_can_be_disabled(make_app):
+  app = make_app(FRAGMENT_CACHE_MAX_ENTRIES=0)
+  rendered = []
+  template = app.jinja_env.from_string(TEMPLATE)
+  show = {'id': 1, 'updated_at': datetime(2030, 5, 1)}
+  for n in range(2):
+    template.render(show=show, render=lambda show: rendered.append(show['id']) or '')
+  assert rendered == [1, 1]
@@ -0,0 +1,62 @@
+import io
+import math
+import random
+from datetime import datetime
+from models import db, Venue
+from geo import encode, covering_cells, distance_km, load_gazetteer, geocode_venues
+
+def test_encode():
+  assert encode(57.64911, 10.40744) == 'u4pruydqq'
+  assert encode(57.64911, 10.40744, precision=5) == 'u4pru'
+
+def test_covering_cells_hold_every_point_within_the_radius():
+  rng = random.Random(1)
+  for trial in range(200):
+    latitude, longitude = rng.uniform(-80, 80), rng.uniform(-180, 180)
+    radius = rng.choice([0.05, 1, 10, 200])
+    cells = covering_cells(latitude, longitude, radius)
+    for point in range(20):
+      # a random point within the radius
+      bearing = rng.uniform(0, 2 * math.pi)
+      km = radius * rng.random()
+      lat = latitude + km * math.cos(bearing) / 111.195
+      lon = longitude + km * math.sin(bearing) / (111.195 * math.cos(math.radians(lat)))
+      if distance_km(latitude, longitude, lat, lon) > radius:
+        continue
+      assert encode(lat, lon, len(cells[0])) in cells
+
+def nearby(client, radius):
+  response = client.get(f'/api/v1/venues/nearby?lat=30.27&lon=-97.74&radius={radius}')
+  assert response.status_code == 200
+  return [venue['name'] for venue in response.get_json()['data']]
+
+def test_nearby_venues(app, client):
+  with app.app_context():
+    db.session.add_all([
+      Venue(name='Congress', city='Austin', state='TX', latitude=30.27, longitude=-97.745),
+      Venue(name='Round Rock', city='Round Rock', state='TX', latitude=30.51, longitude=-97.68),
+      Venue(name='Dallas', city='Dallas', state='TX', latitude=32.78, longitude=-96.80),
+      Venue(name='Gone', city='Austin', state='TX', latitude=30.27, longitude=-97.74, deleted_at=datetime.utcnow()),
+      Venue(name='Unplaced', city='San Marcos', state='TX'),
+    ])
+    db.session.commit()
+  assert nearby(client, 10) == ['Congress']
+  assert nearby(client, 50) == ['Congress', 'Round Rock']
+
+  # geocoding writes through Core, past any session event
+  with app.app_context():
+    places = load_gazetteer(io.StringIO('city,state,latitude,longitude\nSan Marcos,TX,29.88,-97.94\n'))
+    assert list(geocode_venues(places)) == [{'geocoded': 1, 'unmatched': 0}]
+  assert nearby(client, 50) == ['Congress', 'Round Rock', 'Unplaced']
+  assert nearby(client, 200) == ['Congress', 'Round Rock', 'Unplaced']
+
+def test_moving_a_venue_clears_its_coordinates(app, client):
+  with app.app_context():
+    db.session.add(Venue(name='Congress', city='Austin', state='TX', latitude=30.27, longitude=-97.745))
+    db.session.commit()
+    assert nearby(client, 10) == ['Congress']
+    venue = Venue.query.one()
+    venue.city = 'Dallas'
+    db.session.commit()
+    assert venue.geohash is None
+  assert nearby(client, 10) == []
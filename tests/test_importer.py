@@ -0,0 +1,37 @@
+import io
+from models import db, Artist
+from importer import read_rows, import_rows
+
+ARTISTS = '''name,city,state,phone,genres
+Guns N Petals,San Francisco,CA,326-123-5000,"Rock n Roll"
+The Wild Sax Band,San Francisco,CA,432-325-5432,"Jazz,Classical"
+Matt Quevedo,New York,NY,300-400-5000,Jazz
+,Austin,TX,512-555-0100,Jazz
+Guns N Petals,Austin,TX,512-555-0101,Blues
+The Wild Sax Band,Austin,TX,512-555-0102,Jazz
+'''
+
+def import_artists(chunk_size):
+  return list(import_rows('artists', read_rows(io.StringIO(ARTISTS), 'csv'), chunk_size))
+
+def test_import_reports_invalid_rows(app):
+  with app.app_context():
+    reports = import_artists(chunk_size=3)
+    assert [report['inserted'] for report in reports] == [3, 2]
+    assert [error['line'] for error in reports[1]['errors']] == [5]
+    assert reports[1]['errors'][0]['errors']['name']
+    assert Artist.query.count() == 5
+    assert Artist.query.filter_by(name='The Wild Sax Band').first().genres == ['Jazz', 'Classical']
+
+def test_rows_breaking_a_constraint_fail_alone(app):
+  with app.app_context():
+    # a constraint the form validators cannot check
+    db.session.execute('CREATE UNIQUE INDEX "ix_Artist_name_unique" ON "Artist" (name)')
+    db.session.commit()
+    reports = import_artists(chunk_size=10)
+    # the duplicate names are singled out, the rest of their chunk is kept
+    assert reports[0]['inserted'] == 3
+    assert [error['line'] for error in reports[0]['errors']] == [5, 6, 7]
+    assert reports[0]['errors'][1]['errors'] == {'row': ['Row could not be inserted: IntegrityError']}
+    assert sorted(name for name, in db.session.query(Artist.name)) == ['Guns N Petals', 'Matt Quevedo', 'The Wild Sax Band']
+    assert {city for city, in db.session.query(Artist.city)} == {'San Francisco', 'New York'}
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Show
+
+# The listing and detail queries must be answerable from the indexes that
+# models.py declares for them. Only PostgreSQL plans are checked, so these
+# tests are skipped unless TEST_DATABASE_URL points at one.
+
+VENUES = 2000
+ARTISTS = 2000
+SHOWS = 20000
+
+@pytest.fixture
+def seeded_app(app):
+  with app.app_context():
+    if db.engine.dialect.name != 'postgresql':
+      pytest.skip('EXPLAIN checks need PostgreSQL')
+    cities = [('Austin', 'TX'), ('Dallas', 'TX'), ('San Francisco', 'CA'), ('New York', 'NY'), ('Chicago', 'IL')]
+    db.session.execute(Venue.__table__.insert(), [
+      {'name': f'Hall {n}', 'city': cities[n % 5][0], 'state': cities[n % 5][1], 'genres': ['Jazz']}
+      for n in range(VENUES)
+    ])
+    db.session.execute(Artist.__table__.insert(), [{'name': f'Band {n}', 'genres': ['Jazz']} for n in range(ARTISTS)])
+    # one show every three hours, so none overlap
+    start = datetime.now() - timedelta(days=SHOWS // 16)
+    db.session.execute(Show.__table__.insert(), [
+      {'venue_id': n % VENUES + 1, 'artist_id': n * 7 % ARTISTS + 1, 'start_time': start + timedelta(hours=3 * n)}
+      for n in range(SHOWS)
+    ])
+    db.session.commit()
+    db.session.execute('ANALYZE')
+    db.session.commit()
+  return app
+
+def plans(app, path):
+  # the query plans of the statements run to render path
+  statements = []
+
+  def record(conn, cursor, statement, parameters, context, executemany):
+    statements.append((statement, parameters))
+
+  with app.app_context():
+    db.event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+      assert app.test_client().get(path).status_code == 200
+    finally:
+      db.event.remove(db.engine, 'before_cursor_execute', record)
+
+    with db.engine.connect() as connection:
+      # whether the index can serve the query, rather than whether the
+      # planner prefers it at this table size
+      connection.execute('SET enable_seqscan = off')
+      return [
+        '\n'.join(row[0] for row in connection.execute('EXPLAIN ' + statement, parameters))
+        for statement, parameters in statements if statement.lstrip().upper().startswith('SELECT')
+      ]
+
+@pytest.mark.parametrize('path, index', [
+  ('/venues/1', 'ix_Show_venue_id_start_time'),
+  ('/artists/1', 'ix_Show_artist_id_start_time'),
+  ('/venues', 'ix_Venue_state_city_name'),
+  ('/artists', 'ix_Artist_sort_name_id'),
+  ('/api/v1/venues', 'ix_Venue_sort_name_id'),
+])
+def test_pages_use_their_indexes(seeded_app, path, index):
+  # an index only appears in a plan as the target of an (index, index only
+  # or bitmap index) scan
+  found = plans(seeded_app, path)
+  assert any(index in plan for plan in found), '\n\n'.join(found)
@@ -0,0 +1,40 @@
+import pytest
+from models import db, Venue, Artist
+from pagination import parse_limit, encode_cursor, decode_cursor
+from queries import artist_page, venue_page, ARTIST_PAGE_KEYS, SHOW_PAGE_KEYS
+
+def test_parse_limit():
+  assert [parse_limit(value) for value in (None, 'ten', '0', '7', '1000')] == [30, 30, 1, 7, 100]
+
+def test_cursors_round_trip():
+  cursor = encode_cursor('next', ['Band', 3])
+  assert decode_cursor(cursor, ARTIST_PAGE_KEYS) == ('next', ['Band', 3])
+  # wrong direction, number of keys or encoding
+  assert decode_cursor(encode_cursor('up', ['Band', 3]), ARTIST_PAGE_KEYS) is None
+  assert decode_cursor(cursor, ARTIST_PAGE_KEYS[:1]) is None
+  assert decode_cursor(cursor, SHOW_PAGE_KEYS) is None
+  assert decode_cursor('nonsense', ARTIST_PAGE_KEYS) is None
+
+@pytest.mark.parametrize('model, page', [(Artist, artist_page), (Venue, venue_page)])
+def test_pages_walk_every_row_including_unnamed_ones(app, model, page):
+  names = ['Delta', None, 'Alpha', None, 'Charlie', 'Bravo', None]
+  with app.app_context():
+    db.session.add_all([model(name=name, city='Austin', state='TX') for name in names])
+    db.session.commit()
+    expected = [row.id for row in model.query.order_by(db.func.coalesce(model.name, ''), model.id)]
+
+    forward, cursor = [], None
+    while True:
+      data, cursor, prev_cursor = page(cursor, 2, ('id', 'name'))
+      forward.append([item['id'] for item in data])
+      if cursor is None:
+        break
+    # and back again from the last page
+    backward = [forward[-1]]
+    while prev_cursor is not None:
+      data, next_cursor, prev_cursor = page(prev_cursor, 2, ('id', 'name'))
+      backward.insert(0, [item['id'] for item in data])
+
+  assert sum(forward, []) == expected
+  assert len(expected) == len(names)
+  assert backward == forward
@@ -0,0 +1,55 @@
+import re
+import pytest
+from models import db, Venue
+from pool import MeteredQueuePool, engine_options, prometheus_lines
+
+def series(lines):
+  # {(name, engine): value} of the engine-labelled lines
+  values = {}
+  for line in lines:
+    match = re.match(r'(\w+)\{engine="([\w-]+)"\} (\S+)$', line)
+    if match:
+      values[match.group(1), match.group(2)] = float(match.group(3))
+  return values
+
+def test_engine_options():
+  assert engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}) == {}
+  assert engine_options({'SQLALCHEMY_DATABASE_URI': 'postgres://db/fyyur', 'DB_PGBOUNCER': True})['poolclass'].__name__ == 'MeteredNullPool'
+  options = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgres://db/fyyur', 'DB_POOL_SIZE': 3, 'DB_STATEMENT_TIMEOUT': 500})
+  assert options['poolclass'] is MeteredQueuePool and options['pool_size'] == 3
+  assert options['connect_args'] == {'options': '-c statement_timeout=500'}
+
+def test_pools_report_separately(make_app, database_url, tmp_path):
+  if not database_url.startswith('sqlite'):
+    pytest.skip('replicas are local SQLite files here')
+  app = make_app(
+    SQLALCHEMY_ENGINE_OPTIONS={'poolclass': MeteredQueuePool, 'pool_size': 2},
+    SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{tmp_path / "replica.db"}'],
+  )
+  replica = app.extensions['replicas'].engines[0]
+  db.metadata.create_all(replica)
+  client = app.test_client()
+  with app.app_context():
+    db.engine.dispose()
+    db.session.add(Venue(name='Primary Hall', city='Austin', state='TX'))
+    db.session.commit()
+    db.session.remove()
+  assert client.get('/venues').status_code == 200
+  assert client.get('/venues').status_code == 200
+
+  page = client.get('/metrics').get_data(as_text=True)
+  values = series(page.splitlines())
+  # the primary connected to create the tables and again after dispose(),
+  # which swaps its pool but keeps its figures
+  assert values['fyyur_db_pool_connects_total', 'primary'] == 2
+  # the replica created its tables, then served both listings
+  assert values['fyyur_db_pool_connects_total', 'replica-1'] == 1
+  assert values['fyyur_db_pool_checkouts_total', 'replica-1'] == 3
+  assert values['fyyur_db_pool_checked_out', 'replica-1'] == 0
+  assert values['fyyur_db_pool_size', 'primary'] == values['fyyur_db_pool_size', 'replica-1'] == 2
+  assert page.count('# TYPE fyyur_db_pool_connects_total counter') == 1
+  db.metadata.drop_all(replica)
+
+def test_unmetered_pools_are_left_out(app):
+  with app.app_context():
+    assert prometheus_lines([('primary', db.engine.pool)]) == []
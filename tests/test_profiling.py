@@ -0,0 +1,36 @@
+import re
+from models import db, Venue
+import profiling
+from conftest import count_queries
+
+def test_requests_report_their_queries(make_app):
+  app = make_app(REQUEST_PROFILING=True)
+  profiling.metrics.reset()
+  with app.app_context():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.commit()
+  client = app.test_client()
+  counted = []
+  for n in range(2):
+    with app.app_context():
+      with count_queries(db.engine) as statements:
+        response = client.get('/venues')
+    # each request reports the statements it ran
+    assert f'desc="{len(statements)} queries"' in response.headers['Server-Timing']
+    assert 'render;dur=' in response.headers['Server-Timing']
+    counted.append(len(statements))
+  assert counted[-1] > 0
+
+  page = client.get('/metrics').get_data(as_text=True)
+  assert 'fyyur_requests_total{endpoint="main.venues"} 2' in page
+  assert f'fyyur_db_queries_total{{endpoint="main.venues"}} {sum(counted)}' in page
+  assert re.search(r'fyyur_render_seconds_total\{endpoint="main.venues"\} [0-9.]+', page)
+
+def test_repeated_statements_are_counted():
+  stats = profiling.RequestStats()
+  assert stats.duplicates() == 0 and stats.most_repeated() is None
+  stats.statements['SELECT a', '(1,)'] += 3
+  stats.statements['SELECT a', '(2,)'] += 1
+  stats.statements['SELECT b', '()'] += 2
+  assert stats.duplicates() == 3
+  assert stats.most_repeated() == 'SELECT a'
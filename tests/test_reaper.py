@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timedelta
+from models import db, Venue, Artist, Show, Deletion
+from counters import find_drift
+from reaper import reap
+from app import reaper
+from conftest import csrf_token
+
+def add_shows(count):
+  # a venue and an artist with count upcoming shows, and another artist
+  # with a show elsewhere
+  venue, other_venue = Venue(name='The Musical Hop', city='San Francisco', state='CA'), Venue(name='Other Hall', city='Austin', state='TX')
+  artist, other_artist = Artist(name='Guns N Petals'), Artist(name='Matt Quevedo')
+  db.session.add_all([venue, other_venue, artist, other_artist])
+  db.session.flush()
+  for n in range(count):
+    db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=n + 1)))
+  db.session.add(Show(venue_id=other_venue.id, artist_id=other_artist.id, start_time=datetime.now() + timedelta(days=1)))
+  db.session.commit()
+  return venue.id, artist.id
+
+def delete_venue(app, venue_id):
+  client = app.test_client()
+  response = client.delete(f'/venues/{venue_id}', headers={'X-CSRFToken': csrf_token(client)})
+  assert response.get_json()['deletion'] == f'/venues/{venue_id}/deletion'
+  return client
+
+def test_reap_removes_the_shows_then_the_venue(app):
+  with app.app_context():
+    venue_id, artist_id = add_shows(5)
+  client = delete_venue(app, venue_id)
+  with app.app_context():
+    # hidden at once, and released from the artist's counter
+    assert Artist.query.get(artist_id).upcoming_shows_count == 0
+    assert find_drift(Artist, Show.artist_id) == []
+    assert Show.query.count() == 6
+
+    statuses = list(reap(batch_size=2))
+  assert [status['shows_deleted'] for status in statuses] == [2, 4, 5]
+  assert [status['status'] for status in statuses] == ['pending', 'pending', 'finished']
+  assert statuses[0]['shows_total'] == 5
+
+  with app.app_context():
+    assert Venue.query.get(venue_id) is None
+    assert Show.query.filter_by(venue_id=venue_id).count() == 0 and Show.query.count() == 1
+    deletion = Deletion.query.one()
+    assert (deletion.shows_total, deletion.shows_deleted) == (5, 5) and deletion.finished_at is not None
+    assert find_drift(Venue, Show.venue_id) == find_drift(Artist, Show.artist_id) == []
+    # nothing is left pending
+    assert list(reap(batch_size=2)) == []
+  assert client.get(f'/venues/{venue_id}/deletion').get_json()['status'] == 'finished'
+
+def test_the_background_reaper(make_app):
+  app = make_app(REAPER_ENABLED=True, REAPER_PAUSE=0, REAPER_BATCH_SIZE=2)
+  with app.app_context():
+    venue_id, artist_id = add_shows(3)
+  delete_venue(app, venue_id)
+  try:
+    deadline = time.monotonic() + 5
+    with app.app_context():
+      while Deletion.query.one().finished_at is None and time.monotonic() < deadline:
+        db.session.remove()
+        time.sleep(0.01)
+      assert Deletion.query.one().shows_deleted == 3
+      assert Venue.query.get(venue_id) is None
+  finally:
+    reaper.stop()
+  assert not reaper.worker.running()
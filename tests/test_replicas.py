@@ -0,0 +1,93 @@
+import pytest
+from models import db, Venue
+from replicas import ReplicaSet
+from app import cache
+from conftest import csrf_token
+
+VENUE_FORM = {
+  'name': 'New Hall',
+  'city': 'Austin',
+  'state': 'TX',
+  'address': '1 Main St',
+  'phone': '512-555-0100',
+  'genres': ['Jazz'],
+  'facebook_link': 'https://www.facebook.com/newhall',
+}
+
+@pytest.fixture
+def make_replicated_app(make_app, database_url, tmp_path):
+  if not database_url.startswith('sqlite'):
+    pytest.skip('replicas are two local SQLite files here')
+  replicas = []
+
+  def make(**overrides):
+    app = make_app(SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{tmp_path / "replica.db"}'], REPLICA_STICKY_SECONDS=60, **overrides)
+    replica = app.extensions['replicas'].engines[0]
+    db.metadata.create_all(replica)
+    replicas.append(replica)
+    # the replica lags behind: it has yet to see the primary's venue
+    replica.execute(Venue.__table__.insert(), [{'name': 'Replica Hall', 'city': 'Austin', 'state': 'TX'}])
+    with app.app_context():
+      db.session.add(Venue(name='Primary Hall', city='Austin', state='TX'))
+      db.session.commit()
+    return app
+
+  yield make
+  for replica in replicas:
+    db.metadata.drop_all(replica)
+
+@pytest.fixture
+def replicated_app(make_replicated_app):
+  return make_replicated_app()
+
+def listed(client):
+  page = client.get('/venues').get_data(as_text=True)
+  return [name for name in ('Primary Hall', 'Replica Hall', 'New Hall') if name in page]
+
+def test_reads_go_to_the_replica_until_the_client_writes(replicated_app):
+  client = replicated_app.test_client()
+  other = replicated_app.test_client()
+  assert listed(client) == ['Replica Hall']
+
+  data = dict(VENUE_FORM, csrf_token=csrf_token(client))
+  assert client.post('/venues/create', data=data).status_code == 200
+  # the writer reads its own write from the primary, everyone else the replica
+  assert listed(client) == ['Primary Hall', 'New Hall']
+  assert listed(other) == ['Replica Hall']
+
+def test_cached_pages_do_not_hide_the_clients_writes(make_replicated_app):
+  app = make_replicated_app(CACHE_BACKEND='memory')
+  client = app.test_client()
+  other = app.test_client()
+  assert listed(other) == ['Replica Hall']
+  data = dict(VENUE_FORM, csrf_token=csrf_token(client))
+  assert client.post('/venues/create', data=data).status_code == 200
+
+  # the replica's page is not kept, and the writer skips the cache
+  assert listed(other) == ['Replica Hall']
+  assert cache.backend.get('/venues?') is None
+  assert listed(client) == ['Primary Hall', 'New Hall']
+  # pages rendered on the primary are, and are as fresh as any
+  assert cache.backend.get('/venues?') is not None
+  assert listed(other) == ['Primary Hall', 'New Hall']
+
+def test_api_reads_go_to_the_replica(replicated_app):
+  client = replicated_app.test_client()
+  names = [venue['name'] for venue in client.get('/api/v1/venues?fields=id,name').get_json()['data']]
+  assert names == ['Replica Hall']
+
+def test_replica_selection(tmp_path):
+  uris = [f'sqlite:///{tmp_path / name}' for name in ('a.db', 'b.db')]
+  round_robin = ReplicaSet(uris)
+  first, second = round_robin.engines
+  assert [round_robin.choose() for n in range(3)] == [first, second, first]
+
+  least = ReplicaSet(uris, 'least_connections')
+  first, second = least.engines
+  assert least.choose() is first
+  with first.connect():
+    assert least.choose() is second
+  assert least.choose() is first
+
+  with pytest.raises(ValueError):
+    ReplicaSet(uris, 'random')
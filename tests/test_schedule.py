@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Show
+from schedule import IntervalTree, check_show_conflicts
+from conftest import csrf_token
+
+START = datetime(2030, 5, 1, 20, 0)
+
+def at(hours):
+  return START + timedelta(hours=hours)
+
+def test_touching_intervals_do_not_overlap():
+  tree = IntervalTree()
+  tree.add(at(0), at(2), 'first')
+  assert tree.overlapping(at(2), at(4)) is None
+  assert tree.overlapping(at(-2), at(0)) is None
+  assert tree.overlapping(at(1), at(3)) == 'first'
+  assert tree.overlapping(at(-1), at(5)) == 'first'
+  assert tree.overlapping(at(0.5), at(1)) == 'first'
+
+def test_tree_matches_a_linear_scan():
+  # enough intervals, in random order, to rotate the treap many times over
+  rng = random.Random(0)
+  intervals = [(start, start + rng.randint(1, 30)) for start in (rng.randint(0, 5000) for n in range(2000))]
+  tree = IntervalTree()
+  for number, (start, end) in enumerate(intervals):
+    tree.add(start, end, number)
+  for n in range(2000):
+    start = rng.randint(-50, 5050)
+    end = start + rng.randint(1, 20)
+    found = tree.overlapping(start, end)
+    overlaps = [number for number, (s, e) in enumerate(intervals) if s < end and start < e]
+    if overlaps:
+      assert found in overlaps
+    else:
+      assert found is None
+
+@pytest.fixture
+def booked(app):
+  # a venue and two artists, the first playing there at START for two hours
+  with app.app_context():
+    venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz'])
+    artists = [Artist(name=f'Band {n}', genres=['Jazz']) for n in range(2)]
+    db.session.add_all([venue] + artists)
+    db.session.flush()
+    show = Show(venue_id=venue.id, artist_id=artists[0].id, start_time=START, duration=120)
+    db.session.add(show)
+    db.session.commit()
+    return venue.id, artists[0].id, artists[1].id, show.id
+
+def test_conflicts_with_stored_shows(app, booked):
+  venue_id, artist_id, other_artist_id, show_id = booked
+  with app.app_context():
+    errors = check_show_conflicts({
+      'overlapping': {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': at(1), 'duration': 60},
+      'touching': {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': at(2), 'duration': 60},
+      'before': {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': at(-1), 'duration': 60},
+    })
+  assert errors == {'overlapping': {'start_time': [f'The venue is already booked at that time (show {show_id}).']}}
+
+def test_a_batch_conflicting_with_itself(app, booked):
+  venue_id, artist_id, other_artist_id, show_id = booked
+  with app.app_context():
+    errors = check_show_conflicts({
+      1: {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': at(5), 'duration': 120},
+      2: {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': at(6), 'duration': 120},
+      3: {'venue_id': venue_id, 'artist_id': other_artist_id, 'start_time': at(7), 'duration': 60},
+    })
+  # the second row clashes with the first; the third only with the second,
+  # which was rejected and so does not book anything
+  assert errors == {2: {'start_time': [
+    'The venue is already booked at that time (another show in this batch).',
+    'The artist is already booked at that time (another show in this batch).',
+  ]}}
+
+def test_an_edited_show_does_not_conflict_with_itself(app, booked):
+  venue_id, artist_id, other_artist_id, show_id = booked
+  moved = {'venue_id': venue_id, 'artist_id': artist_id, 'start_time': at(1), 'duration': 120}
+  with app.app_context():
+    assert check_show_conflicts({'show': moved}, exclude_id=show_id) == {}
+    assert check_show_conflicts({'show': moved}) != {}
+
+  client = app.test_client()
+  data = dict(moved, start_time=moved['start_time'].strftime('%Y-%m-%d %H:%M:%S'), csrf_token=csrf_token(client))
+  assert client.post(f'/shows/{show_id}/edit', data=data).status_code == 302
+  with app.app_context():
+    assert Show.query.get(show_id).start_time == at(1)
+
+def test_creating_a_show_at_a_booked_time(app, booked):
+  venue_id, artist_id, other_artist_id, show_id = booked
+  client = app.test_client()
+  data = {
+    'venue_id': venue_id,
+    'artist_id': other_artist_id,
+    'start_time': at(1).strftime('%Y-%m-%d %H:%M:%S'),
+    'duration': 60,
+    'csrf_token': csrf_token(client),
+  }
+  page = client.post('/shows/create', data=data).get_data(as_text=True)
+  assert f'The venue is already booked at that time (show {show_id}).' in page
+  with app.app_context():
+    assert Show.query.count() == 1
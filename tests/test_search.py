@@ -0,0 +1,39 @@
+import sqlalchemy
+from models import db, Venue, Artist
+from queries import search_results
+from search import NgramIndex
+
+def test_ngram_index_ranks_closest_names_first():
+  index = NgramIndex()
+  for id, name in enumerate(['The Musical Hop', 'Park Square Live Music & Coffee', 'The Dueling Pianos Bar', 'Musical']):
+    index.add(id, name)
+  assert index.search('musical') == [3, 0]
+  assert index.search('MUSIC') == [3, 0, 1]
+  # shorter than a trigram: every name is a candidate
+  assert index.search('ba') == [2]
+  assert index.search('opera') == []
+
+def test_search_finds_rows_written_outside_the_session(app, database_url):
+  with app.app_context():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA'))
+    db.session.add(Artist(name='Guns N Petals'))
+    db.session.commit()
+    assert [venue['name'] for venue in search_results(Venue, 'hop')['data']] == ['The Musical Hop']
+
+    # a Core insert, as the importer does, and a write by another process
+    db.session.execute(Venue.__table__.insert(), [{'name': 'Hop Hall', 'city': 'Austin', 'state': 'TX'}])
+    db.session.commit()
+    other = sqlalchemy.create_engine(database_url)
+    other.execute(Venue.__table__.delete().where(Venue.__table__.c.name == 'The Musical Hop'))
+    other.execute(Artist.__table__.insert(), [{'name': 'Hop Along'}])
+    other.dispose()
+
+    assert [venue['name'] for venue in search_results(Venue, 'hop')['data']] == ['Hop Hall']
+    assert [artist['name'] for artist in search_results(Artist, 'hop')['data']] == ['Hop Along']
+
+def test_search_ignores_deleted_entities(app):
+  with app.app_context():
+    db.session.add(Venue(name='Hop Hall', city='Austin', state='TX'))
+    db.session.add(Venue(name='Hop House', city='Austin', state='TX', deleted_at=db.func.now()))
+    db.session.commit()
+    assert [venue['name'] for venue in search_results(Venue, 'hop')['data']] == ['Hop Hall']
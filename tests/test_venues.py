@@ -0,0 +1,55 @@
+import re
+from datetime import datetime, timedelta
+from models import db, Venue, Artist, Show
+from queries import venue_areas
+from conftest import count_queries
+
+CITIES = [('Austin', 'TX'), ('Dallas', 'TX'), ('San Francisco', 'CA'), ('New York', 'NY')]
+
+def add_venues(start, stop):
+  artist = Artist(name=f'Band {start}', genres=['Jazz'])
+  db.session.add(artist)
+  venues = []
+  for n in range(start, stop):
+    city, state = CITIES[n % len(CITIES)]
+    venues.append(Venue(name=f'Hall {n}', city=city, state=state, genres=['Jazz' if n % 2 else 'Blues']))
+  db.session.add_all(venues)
+  # the counters are kept by id, so shows follow their venue
+  db.session.flush()
+  for n, venue in enumerate(venues, start):
+    # a past and an upcoming show each, an hour apart per venue
+    for days in (-7, 7):
+      db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=days, hours=n)))
+  db.session.commit()
+
+def listing_queries(app, path):
+  # statements run to render path, and the venues it lists
+  with app.app_context():
+    with count_queries(db.engine) as statements:
+      response = app.test_client().get(path)
+  assert response.status_code == 200
+  return len(statements), len(re.findall(r'<h5>Hall \d+</h5>', response.get_data(as_text=True)))
+
+def test_venues_listing_runs_a_constant_number_of_queries(app):
+  paths = ('/venues', '/venues?genre=Jazz')
+  with app.app_context():
+    add_venues(0, 4)
+  few = {path: listing_queries(app, path) for path in paths}
+  with app.app_context():
+    add_venues(4, 80)
+  many = {path: listing_queries(app, path) for path in paths}
+
+  assert [listed for queries, listed in few.values()] == [4, 2]
+  assert [listed for queries, listed in many.values()] == [80, 40]
+  for path in paths:
+    assert 0 < few[path][0] == many[path][0], path
+
+def test_venue_areas(app):
+  with app.app_context():
+    add_venues(0, 8)
+    areas = venue_areas()
+  # areas in state, city order, venues by name within each
+  assert [(area['state'], area['city']) for area in areas] == \
+    [('CA', 'San Francisco'), ('NY', 'New York'), ('TX', 'Austin'), ('TX', 'Dallas')]
+  assert [venue['name'] for venue in areas[2]['venues']] == ['Hall 0', 'Hall 4']
+  assert all(venue['num_upcoming_shows'] == 1 for area in areas for venue in area['venues'])
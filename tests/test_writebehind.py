@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import pytest
+from models import db, Venue, Artist, Show
+from app import show_writer
+from writebehind import QueueFull, KeyReused
+from conftest import csrf_token
+
+START = datetime(2030, 5, 1, 20, 0)
+
+@pytest.fixture
+def writer_app(make_app, monkeypatch):
+  # batches are written by calling flush(), not by the background thread
+  monkeypatch.setattr(show_writer, 'start', lambda: None)
+  app = make_app(SHOW_WRITE_BEHIND=True, SHOW_BATCH_SIZE=2, SHOW_FLUSH_INTERVAL=0, SHOW_QUEUE_SIZE=3)
+  with app.app_context():
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=['Jazz']))
+    db.session.add_all([Artist(name=f'Band {n}', genres=['Jazz']) for n in range(3)])
+    db.session.commit()
+  return app
+
+def show(artist_id, hours=0):
+  return {'venue_id': 1, 'artist_id': artist_id, 'start_time': START + timedelta(hours=hours), 'duration': 60}
+
+def test_submissions_are_written_in_batches(writer_app, monkeypatch):
+  batches = []
+  write = show_writer.write
+  monkeypatch.setattr(show_writer, 'write', lambda batch: batches.append(len(batch)) or write(batch))
+  for n in range(3):
+    assert show_writer.submit(f'key-{n}', show(n + 1, hours=2 * n))['status'] == 'queued'
+  show_writer.flush()
+  assert batches == [2, 1]
+  statuses = [show_writer.status(f'key-{n}') for n in range(3)]
+  assert [status['status'] for status in statuses] == ['created'] * 3
+  with writer_app.app_context():
+    assert sorted(id for id, in db.session.query(Show.id)) == sorted(status['show_id'] for status in statuses)
+    assert Venue.query.get(1).upcoming_shows_count == 3
+
+def test_conflicting_submissions_fail_alone(writer_app):
+  show_writer.submit('first', show(1))
+  show_writer.submit('clash', show(2, hours=0.5))
+  show_writer.flush()
+  assert show_writer.status('first')['status'] == 'created'
+  clash = show_writer.status('clash')
+  assert clash['status'] == 'failed' and clash['show_id'] is None
+  assert clash['errors']['start_time'] == ['The venue is already booked at that time (another show in this batch).']
+
+def test_resubmitted_keys_are_not_queued_again(writer_app):
+  queued = show_writer.submit('key', show(1))
+  assert show_writer.submit('key', show(1)) == queued
+  show_writer.flush()
+  created = show_writer.submit('key', show(1))
+  assert created['status'] == 'created'
+  with pytest.raises(KeyReused):
+    show_writer.submit('key', show(2))
+  with writer_app.app_context():
+    assert Show.query.count() == 1
+
+def test_a_full_queue_is_refused(writer_app):
+  for n in range(3):
+    show_writer.submit(f'key-{n}', show(n + 1, hours=2 * n))
+  with pytest.raises(QueueFull):
+    show_writer.submit('one too many', show(1, hours=10))
+  assert show_writer.status('one too many') is None
+
+def post_show(client, key, **values):
+  data = dict(venue_id=1, artist_id=1, start_time='2030-05-01 20:00:00', duration=60, csrf_token=csrf_token(client))
+  data.update(values)
+  return client.post('/shows/create', data=data, headers={'Accept': 'application/json', 'Idempotency-Key': key})
+
+def test_submission_views(writer_app):
+  client = writer_app.test_client()
+  assert client.get('/shows/submissions/key-0').status_code == 404
+  response = post_show(client, 'key-0')
+  assert response.status_code == 202
+  status_url = response.get_json()['status_url']
+  assert client.get(status_url).get_json()['status'] == 'queued'
+  # the same key from another client, for another show
+  assert post_show(writer_app.test_client(), 'key-0', artist_id=2).status_code == 409
+
+  for n in range(1, 3):
+    assert post_show(client, f'key-{n}', artist_id=n + 1, start_time=f'2030-05-0{n + 1} 20:00:00').status_code == 202
+  response = post_show(client, 'key-3', start_time='2030-05-09 20:00:00')
+  assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+
+  show_writer.flush()
+  status = client.get(status_url).get_json()
+  assert status['status'] == 'created' and status['show_id'] is not None
@@ -0,0 +1,185 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+from background import BackgroundThread
+from models import db, Show
+from importer import check_show_references
+from schedule import check_show_conflicts
+
+#----------------------------------------------------------------------------#
+# Write-behind show creation.
+#----------------------------------------------------------------------------#
+
+# With SHOW_WRITE_BEHIND on, validated show submissions are queued and a
+# background thread inserts them in batches, one transaction per batch,
+# instead of committing each in its own request. Every submission has an
+# idempotency key; resubmitting a key returns the first submission's status
+# rather than queueing it again. The queue, the results and the keys are per
+# worker process, and keys are shared by every client of the process: they
+# should be random (e.g. UUIDs), and a key resubmitted with different values
+# is refused rather than answered with another submission's status.
+
+class QueueFull(Exception):
+  pass
+
+class KeyReused(Exception):
+  pass
+
+class ShowWriter:
+
+  def __init__(self, app=None, cache=None):
+    self.app = None
+    if app is not None:
+      self.init_app(app, cache)
+
+  def init_app(self, app, cache=None):
+    self.app = app
+    self.cache = cache
+    self.batch_size = app.config.get('SHOW_BATCH_SIZE', 500)
+    self.flush_interval = app.config.get('SHOW_FLUSH_INTERVAL', 0.5)
+    self.result_ttl = app.config.get('SHOW_RESULT_TTL', 3600)
+    self.queue = queue.Queue(app.config.get('SHOW_QUEUE_SIZE', 10000))
+    self.results = OrderedDict()
+    # the values submitted under each key of results
+    self.values = {}
+    self.lock = threading.Lock()
+    self.worker = BackgroundThread(self.run, 'show-writer')
+    atexit.register(self.stop)
+
+  def submit(self, key, values):
+    # queue {'venue_id', 'artist_id', 'start_time'} under key and return its
+    # status. raises QueueFull when the worker is too far behind, and
+    # KeyReused when key was submitted with other values.
+    values = dict(values)
+    with self.lock:
+      self.prune()
+      if key in self.results:
+        if self.values[key] != values:
+          raise KeyReused()
+        return dict(self.results[key])
+      result = {'key': key, 'status': 'queued', 'show_id': None, 'errors': None, 'at': time.time()}
+      try:
+        self.queue.put_nowait((key, values))
+      except queue.Full:
+        raise QueueFull()
+      self.results[key] = result
+      self.values[key] = values
+    self.start()
+    return dict(result)
+
+  def status(self, key):
+    with self.lock:
+      result = self.results.get(key)
+      return dict(result) if result is not None else None
+  def prune(self):
+    # results are kept for result_ttl seconds after they were last updated
+    expired = time.time() - self.result_ttl
+    while self.results:
+      key, result = next(iter(self.results.items()))
+      if result['status'] == 'queued' or result['at'] > expired:
+        break
+      del self.results[key]
+      del self.values[key]
+
+  def finish(self, key, status, show_id=None, errors=None):
+    with self.lock:
+      result = self.results.pop(key)
+      result.update(status=status, show_id=show_id, errors=errors, at=time.time())
+      # finished results move to the end, so prune() finds the oldest first
+      self.results[key] = result
+
+  #  Worker
+  #  ----------------------------------------------------------------
+
+  def start(self):
+    self.worker.start()
+
+  def stop(self, timeout=10):
+    # let the worker drain the queue before the process exits
+    self.worker.stopping.set()
+    self.worker.join(timeout)
+
+  def next_batch(self):
+    # wait for a first submission, then gather more for up to flush_interval
+    try:
+      batch = [self.queue.get(timeout=self.flush_interval)]
+    except queue.Empty:
+      return []
+    deadline = time.monotonic() + self.flush_interval
+    while len(batch) < self.batch_size:
+      remaining = deadline - time.monotonic()
+      try:
+        batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+      except queue.Empty:
+        break
+    return batch
+
+  def run(self):
+    while not (self.worker.stopping.is_set() and self.queue.empty()):
+      self.write_batch(self.next_batch())
+
+  def flush(self):
+    # write everything queued so far on the calling thread
+    while not self.queue.empty():
+      self.write_batch(self.next_batch())
+
+  def write_batch(self, batch):
+    if not batch:
+      return
+    with self.app.app_context():
+      try:
+        self.write(batch)
+      except Exception as e:
+        # e.g. the database is unreachable; the batch fails, the thread
+        # carries on with the next one
+        db.session.rollback()
+        self.app.logger.exception('Show writer could not write a batch')
+        for key, values in batch:
+          if self.status(key)['status'] == 'queued':
+            self.finish(key, 'failed', errors={'show': [f'Show could not be listed: {e.__class__.__name__}']})
+      finally:
+        db.session.remove()
+
+  def write(self, batch):
+    submissions = dict(batch)
+    errors = check_show_references(submissions)
+    errors.update(check_show_conflicts({key: values for key, values in submissions.items() if key not in errors}))
+    for key, key_errors in errors.items():
+      self.finish(key, 'failed', errors=key_errors)
+    valid = [(key, values) for key, values in submissions.items() if key not in errors]
+    if not valid:
+      return
+    try:
+      self.insert(valid)
+    except Exception:
+      db.session.rollback()
+      # find the offending rows by inserting the rest one at a time
+      for key, values in valid:
+        try:
+          self.insert([(key, values)])
+        except Exception as e:
+          db.session.rollback()
+          self.finish(key, 'failed', errors={'show': [f'Show could not be listed: {e.__class__.__name__}']})
+
+  def insert(self, submissions):
+    # ORM inserts, so the upcoming show counters are updated on flush
+    shows = [(key, Show(**values)) for key, values in submissions]
+    db.session.add_all(show for key, show in shows)
+    db.session.flush()
+    # read the ids before commit expires them
+    ids = [(key, show.id) for key, show in shows]
+    db.session.commit()
+    for key, show_id in ids:
+      self.finish(key, 'created', show_id=show_id)
+    if self.cache is not None:
+      self.cache.invalidate('shows', 'venues', *{
+        tag
+        for key, values in submissions
+        for tag in (f'venue:{values["venue_id"]}', f'artist:{values["artist_id"]}')
+      })